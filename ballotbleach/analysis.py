@@ -1,13 +1,19 @@
 from collections import defaultdict, OrderedDict
+import json
 from logging import getLogger
+from math import ceil, sqrt
 import os
 import re
-from statistics import mean, median_low
 from matplotlib import pyplot as plt
 from matplotlib import ticker
 from scipy.misc import imread
 from textwrap import wrap
 from wordcloud import WordCloud, STOPWORDS, ImageColorGenerator
+from .cache import ChartCache, get_cache_key, get_feedback_digest, get_file_digest
+from .columns import BallotColumns
+from .sketch import count_feedback_words
+from .stats import (count_actors, count_ratings, count_ratings_by_actor, get_rating_values, get_top_actors,
+                    summarize_rating_counts)
 
 
 logger = getLogger(__name__)
@@ -32,10 +38,16 @@ def build_summary_data_text(summary_data):
 
 
 def create_category_bar_chart(image_save_path, categories, values,
-                              summary_data=None, title_text=None, tick_format=None):
+                              summary_data=None, title_text=None, tick_format=None, chart_cache=None):
     """
-    Generates bar chart images.
+    Generates bar chart images. If a :class:`~ballotbleach.cache.ChartCache` is passed and holds an
+    image for the same categories, values, summary data, title and tick format, it is reused.
     """
+    if chart_cache is not None:
+        cache_key = get_cache_key('bar-chart', categories, values, summary_data, title_text, tick_format)
+        if chart_cache.restore(cache_key, image_save_path):
+            logger.info('...reusing cached bar chart for {0}'.format(image_save_path))
+            return
     figure, axes1 = plt.subplots(figsize=(5, 5), tight_layout=True)
     figure.subplots_adjust(left=0.2, right=0.85)
     y_coordinates = list()
@@ -79,71 +91,209 @@ def create_category_bar_chart(image_save_path, categories, values,
     logger.info('...saving bar chart at {0}'.format(image_save_path))
     figure.savefig(image_save_path)
     plt.close()
+    if chart_cache is not None:
+        chart_cache.save(cache_key, image_save_path)
 
 
-def create_rating_histogram(ballots, rating_range, chart_title, image_save_path):
+def create_rating_count_chart(counts, rating_values, chart_title, image_save_path, chart_cache=None):
     """
-    Generates a histogram (bar chart) image from ballot data for the subject rating.
+    Generates a histogram (bar chart) image from a row of rating counts produced by
+    :func:`~ballotbleach.stats.count_ratings_by_actor`.
     """
-    all_values = list()
-    rating_histogram = {'0': 0}
-    for value in rating_range:
-        rating_histogram[str(value)] = 0
-    for ballot in ballots:
-        if ballot.subject_rating and str(ballot.subject_rating) in rating_histogram:
-            rating_histogram[str(ballot.subject_rating)] += 1
-            all_values.append(ballot.subject_rating)
-        else:
-            rating_histogram['0'] += 1
-            all_values.append(0)
-    total_submissions = 0
-    for rating in rating_histogram:
-        total_submissions += rating_histogram[rating]
-    sorted_ratings = OrderedDict(sorted(rating_histogram.items(),
-                                        key=lambda rating_data: int(rating_data[0])))
-    categories = list()
+    summary_data = summarize_rating_counts(counts, rating_values)
+    total_submissions = summary_data.get('n', 0)
+    categories_with_none = ['None'] + [str(value) for value in rating_values]
     values = list()
-    for rating in sorted_ratings:
-        categories.append(rating)
-        values.append(round(sorted_ratings[rating] / total_submissions * 100))
+    for count in counts:
+        values.append(round(int(count) / total_submissions * 100) if total_submissions else 0)
     chart_tick_format = '%d%%'
-    categories_with_none = [x if x != '0' else "None" for x in categories]
-    summary_data = {
-        'n': total_submissions,
-        'average': round(mean(all_values), 1),
-        'median': median_low(all_values)
-    }
     create_category_bar_chart(image_save_path, categories_with_none, values, summary_data,
-                              chart_title, chart_tick_format)
+                              chart_title, chart_tick_format, chart_cache)
 
 
-def create_rating_by_selected_actor(ballots, rating_range, chart_directory, subject_rating_title):
+def create_rating_histogram(ballots, rating_range, chart_title, image_save_path, chart_cache=None):
     """
-    Create images of the subject rating for ballots that selected an actor.
+    Generates a histogram (bar chart) image from ballot data for the subject rating.
     """
-    ballots_by_actor = defaultdict(list)
-    for ballot in ballots:
-        ballots_by_actor[ballot.selected_actor].append(ballot)
-    for actor in ballots_by_actor:
+    rating_values = get_rating_values(rating_range)
+    counts = count_ratings(ballots, rating_range)
+    create_rating_count_chart(counts, rating_values, chart_title, image_save_path, chart_cache)
+
+
+def create_rating_by_selected_actor(ballots, rating_range, chart_directory, subject_rating_title,
+                                    selected_actors=None, chart_cache=None, progress=None):
+    """
+    Create images of the subject rating for ballots that selected an actor. Rating counts for
+    every actor are computed in one pass. If a collection of selected actors is passed, only
+    their images are created. ``ballots`` may also be shared
+    :class:`~ballotbleach.columns.BallotColumns`, so chart workers can run on attached views.
+    If a :class:`~ballotbleach.progress.ProgressReporter` is passed, each image advances its
+    ``charts`` stage.
+    """
+    rating_values = get_rating_values(rating_range)
+    if isinstance(ballots, BallotColumns):
+        actors, counts = ballots.count_ratings_by_actor(rating_range)
+    else:
+        actors, counts = count_ratings_by_actor(ballots, rating_range)
+    for actor_index, actor in enumerate(actors):
+        if selected_actors is not None and actor not in selected_actors:
+            continue
         chart_title = "{0} by {1} votes".format(subject_rating_title, actor)
         simplified_actor_name = re.sub(r'[^a-zA-Z0-9]+', '', actor)
         image_name = ''.join((simplified_actor_name.lower(), '-ratings.png',))
         image_save_path = os.path.join(chart_directory, image_name)
-        create_rating_histogram(ballots_by_actor[actor], rating_range, chart_title, image_save_path)
+        create_rating_count_chart(counts[actor_index], rating_values, chart_title, image_save_path,
+                                  chart_cache)
+        if progress is not None:
+            progress.advance('charts')
+
+
+def get_rating_grid_layout_path(chart_directory, image_name='rating'):
+    """
+    Returns the path of the file listing the actors on each page of a rating grid.
+    """
+    return os.path.join(chart_directory, '{0}-by-actor.json'.format(image_name))
+
+
+def load_rating_grid_layout(chart_directory, image_name='rating'):
+    """
+    Returns the list of actor names per page of the rating grid last drawn in a directory, or
+    None if there is no readable layout file.
+    """
+    try:
+        with open(get_rating_grid_layout_path(chart_directory, image_name)) as layout_file:
+            return json.load(layout_file)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_rating_grid_pages(chart_directory, image_name, page_total):
+    """
+    Deletes the rating grid page images numbered above ``page_total``.
+    """
+    pattern = re.compile(r'^{0}-by-actor-(\d+)\.png$'.format(re.escape(image_name)))
+    for file_name in os.listdir(chart_directory):
+        match = pattern.match(file_name)
+        if match and int(match.group(1)) > page_total:
+            logger.info('...removing rating grid page {0}'.format(file_name))
+            os.remove(os.path.join(chart_directory, file_name))
+
+
+def create_rating_grid_by_selected_actor(ballots, rating_range, chart_directory, subject_rating_title,
+                                         panels_per_page, image_name='rating', chart_actors=None,
+                                         refresh_actors=None, chart_cache=None, progress=None):
+    """
+    Draws every actor's rating distribution as a panel of paginated grid figures with shared axes,
+    saved as ``<image_name>-by-actor-<page>.png``, instead of one figure per actor. The actors on
+    each page are listed in ``<image_name>-by-actor.json``, and pages numbered past the last one are
+    deleted. If a collection of chart actors is passed, only their panels are drawn. If a collection
+    of refresh actors is passed, only pages showing one of them, pages whose actors changed since
+    the last layout and missing pages are redrawn. If a
+    :class:`~ballotbleach.progress.ProgressReporter` is passed, each page advances its ``charts``
+    stage.
+    """
+    rating_values = get_rating_values(rating_range)
+    if isinstance(ballots, BallotColumns):
+        actors, counts = ballots.count_ratings_by_actor(rating_range)
+    else:
+        actors, counts = count_ratings_by_actor(ballots, rating_range)
+    panels = [(actor, counts[actor_index]) for actor_index, actor in enumerate(actors)
+              if chart_actors is None or actor in chart_actors]
+    categories_with_none = ['None'] + [str(value) for value in rating_values]
+    column_total = int(ceil(sqrt(panels_per_page)))
+    row_total = int(ceil(panels_per_page / column_total))
+    layout = [[str(actor) for actor, _ in panels[page_start:page_start + panels_per_page]]
+              for page_start in range(0, len(panels), panels_per_page)]
+    previous_layout = load_rating_grid_layout(chart_directory, image_name) if refresh_actors is not None else None
+    remove_rating_grid_pages(chart_directory, image_name, len(layout))
+    for page_index, page_start in enumerate(range(0, len(panels), panels_per_page), 1):
+        page_panels = panels[page_start:page_start + panels_per_page]
+        if progress is not None:
+            progress.advance('charts')
+        image_save_path = os.path.join(chart_directory, '{0}-by-actor-{1}.png'.format(image_name, page_index))
+        if (refresh_actors is not None and previous_layout is not None and page_index <= len(previous_layout)
+                and previous_layout[page_index - 1] == layout[page_index - 1] and os.path.exists(image_save_path)
+                and not any(actor in refresh_actors for actor, _ in page_panels)):
+            continue
+        page_data = list()
+        for actor, actor_counts in page_panels:
+            summary_data = summarize_rating_counts(actor_counts, rating_values)
+            total_submissions = summary_data.get('n', 0)
+            values = [round(int(count) / total_submissions * 100) if total_submissions else 0
+                      for count in actor_counts]
+            page_data.append((str(actor), values, summary_data))
+        if chart_cache is not None:
+            cache_key = get_cache_key('rating-grid', page_data, categories_with_none, subject_rating_title,
+                                      row_total, column_total)
+            if chart_cache.restore(cache_key, image_save_path):
+                logger.info('...reusing cached rating grid for {0}'.format(image_save_path))
+                continue
+        figure, axes_grid = plt.subplots(row_total, column_total, sharex=True, sharey=True, squeeze=False,
+                                         figsize=(2.5 * column_total, 2.5 * row_total))
+        y_coordinates = [len(categories_with_none) - index - 0.5 for index in range(len(categories_with_none))]
+        all_axes = [axes for axes_row in axes_grid for axes in axes_row]
+        for axes, (actor, values, summary_data) in zip(all_axes, page_data):
+            axes.barh(y_coordinates, values, align='center', color='#609cee', edgecolor='#FFFFFF')
+            axes.set_title('\n'.join(wrap(actor, 25)), fontsize=8)
+            axes.text(98, 0.1, build_summary_data_text(summary_data), horizontalalignment='right',
+                      fontsize=5, color='#47474B')
+        for axes in all_axes[len(page_data):]:
+            axes.set_visible(False)
+        first_axes = all_axes[0]
+        first_axes.set_xlim([0, 100])
+        first_axes.set_ylim([0, len(categories_with_none)])
+        first_axes.set_yticks(y_coordinates)
+        first_axes.set_yticklabels(categories_with_none, color='#47474B', fontsize=7)
+        first_axes.xaxis.set_major_formatter(ticker.FormatStrFormatter('%d%%'))
+        for axes in all_axes:
+            axes.tick_params(labelsize=7)
+        figure.suptitle(subject_rating_title)
+        figure.tight_layout()
+        logger.info('...saving rating grid at {0}'.format(image_save_path))
+        figure.savefig(image_save_path)
+        plt.close(figure)
+        if chart_cache is not None:
+            chart_cache.save(cache_key, image_save_path)
+    with open(get_rating_grid_layout_path(chart_directory, image_name), 'w') as layout_file:
+        json.dump(layout, layout_file)
+
+
+def get_other_label(top_actors, other_total):
+    """
+    Returns the label of the bar that adds up the actors outside the top ones: 'Other', or, if an
+    actor has that name, 'Other (<n> actors)' made unique the same way.
+    """
+    label = 'Other'
+    if label in top_actors:
+        label = 'Other ({0} actors)'.format(other_total)
+    while label in top_actors:
+        label = ''.join((label, '*',))
+    return label
+
+
+def get_actor_ranking(actor_counts, top_n=None):
+    """
+    Returns an ordered dictionary of vote counts per actor for the ranking chart: every actor by
+    name or, if ``top_n`` is set and there are more actors, the most selected actors followed by
+    one bar adding up the rest (see :func:`get_other_label`).
+    """
+    if top_n and len(actor_counts) > top_n:
+        top_actors = get_top_actors(actor_counts, top_n)
+        ranking = OrderedDict((actor, actor_counts[actor]) for actor in top_actors)
+        other_label = get_other_label(ranking, len(actor_counts) - top_n)
+        ranking[other_label] = sum(actor_counts.values()) - sum(ranking.values())
+        return ranking
+    return OrderedDict(sorted(actor_counts.items()))
 
 
-def create_actor_ranking(ballots, title, tick_format, save_path):
+def create_actor_ranking(ballots, title, tick_format, save_path, chart_cache=None, top_n=None):
     """
     Creates bar chart visualization that ranks the selected actors from most
-    selected to least.
+    selected to least. If ``top_n`` is set, only the most selected actors get a bar
+    and the rest are added up in an 'Other' bar.
     """
-    actor_ranking = defaultdict(int)
-    for ballot in ballots:
-        actor_ranking[ballot.selected_actor] += 1
-    total_ranking_submissions = 0
-    for actor in actor_ranking:
-        total_ranking_submissions += actor_ranking[actor]
-    sorted_ranking = OrderedDict(sorted(actor_ranking.items()))
+    sorted_ranking = get_actor_ranking(count_actors(ballots), top_n)
+    total_ranking_submissions = sum(sorted_ranking.values())
     categories = list()
     values = list()
     for actor in sorted_ranking:
@@ -153,22 +303,45 @@ def create_actor_ranking(ballots, title, tick_format, save_path):
         'n': total_ranking_submissions,
     }
     create_category_bar_chart(save_path, categories, values, summary_data,
-                              title, tick_format)
+                              title, tick_format, chart_cache)
 
 
 def create_word_cloud(ballots, chart_directory, image_name, mask_file,
-                      stop_words, word_counts=None):
+                      stop_words, word_counts=None, max_tracked_words=None, chart_cache=None):
     """
-    Generates a word cloud from given ballots.
+    Generates a word cloud from given ballots. If ``max_tracked_words`` is set, feedback is streamed
+    through a fixed-size :class:`~ballotbleach.sketch.SpaceSaving` sketch instead of being
+    concatenated, and the cloud is drawn from the sketch's word frequencies. If a
+    :class:`~ballotbleach.cache.ChartCache` is passed, clouds whose input and settings are unchanged
+    are copied from it.
     """
     if word_counts is None:
         word_counts=[25, 50, 100, 1000]
-    text = ''
-    for ballot in ballots:
-        text = ''.join((text, ballot.feedback,))
-    all_stop_words = STOPWORDS
-    all_stop_words |= set(stop_words)
+    all_stop_words = set(STOPWORDS)
+    all_stop_words |= set(stop_words or [])
+    frequencies = None
+    text = None
+    if max_tracked_words:
+        word_sketch = count_feedback_words(ballots, max_tracked_words, all_stop_words)
+        frequencies = word_sketch.get_frequencies()
+        logger.info('...{0} word counts over-estimated by at most {1} of {2} words'.format(
+            image_name, word_sketch.get_error_bound(), word_sketch.total))
+    cache_keys = dict()
+    if chart_cache is not None:
+        if frequencies is not None:
+            input_digest = get_cache_key('frequencies', sorted(frequencies.items()))
+        else:
+            input_digest = get_feedback_digest(ballots)
+        mask_digest = get_file_digest(mask_file)
+        for word_count in word_counts:
+            cache_keys[word_count] = get_cache_key('word-cloud', input_digest, sorted(all_stop_words),
+                                                   mask_digest, word_count)
     for word_count in word_counts:
+        image_name_with_count = '{0}-{1}.png'.format(image_name, str(word_count))
+        save_location = os.path.join(chart_directory, image_name_with_count)
+        if chart_cache is not None and chart_cache.restore(cache_keys[word_count], save_location):
+            logger.info('...reusing cached word cloud {0}'.format(image_name_with_count))
+            continue
         if mask_file:
             color_mask = imread(mask_file)
             image_colors = ImageColorGenerator(color_mask)
@@ -181,56 +354,116 @@ def create_word_cloud(ballots, chart_directory, image_name, mask_file,
             wc = WordCloud(background_color="white", max_words=word_count,
                            stopwords=all_stop_words,
                            max_font_size=80, random_state=42)
-        wc.generate(text)
+        if frequencies is not None:
+            if not frequencies:
+                continue
+            wc.generate_from_frequencies(frequencies)
+        else:
+            if text is None:
+                text = ''.join(ballot.feedback for ballot in ballots)
+            wc.generate(text)
         axis_image = plt.imshow(wc)
         plt.axis("off")
-        image_name_with_count = '{0}-{1}.png'.format(image_name, str(word_count))
         logger.info('...creating word cloud {0}'.format(image_name_with_count))
-        save_location = os.path.join(chart_directory, image_name_with_count)
         plt.savefig(save_location)
         plt.close()
+        if chart_cache is not None:
+            chart_cache.save(cache_keys[word_count], save_location)
 
 
-def create_word_cloud_by_selected_actor(ballots, chart_directory, mask_file, stop_words):
+def create_word_cloud_by_selected_actor(ballots, chart_directory, mask_file, stop_words,
+                                        selected_actors=None, max_tracked_words=None, chart_cache=None,
+                                        progress=None):
     """
-    Generates word cloud for each selected actor.
+    Generates word cloud for each selected actor. If a collection of selected actors is passed,
+    only their word clouds are generated. If a :class:`~ballotbleach.progress.ProgressReporter`
+    is passed, each actor advances its ``charts`` stage.
     """
     ballots_by_actor = defaultdict(list)
     word_counts = [25]
     for ballot in ballots:
-        ballots_by_actor[ballot.selected_actor].append(ballot)
+        if selected_actors is None or ballot.selected_actor in selected_actors:
+            ballots_by_actor[ballot.selected_actor].append(ballot)
     for actor in ballots_by_actor:
         simplified_actor_name = re.sub(r'[^a-zA-Z0-9]+', '', actor)
         image_name = ''.join((simplified_actor_name.lower(), '-wordcloud',))
         create_word_cloud(ballots_by_actor[actor], chart_directory, image_name,
-                          mask_file, stop_words, word_counts)
+                          mask_file, stop_words, word_counts, max_tracked_words, chart_cache)
+        if progress is not None:
+            progress.advance('charts')
 
 
-def save_charts(chart_directory, chart_options, clean_ballots):
+def save_charts(chart_directory, chart_options, clean_ballots, selected_actors=None, progress=None):
     """
-    Handles the creation of analysis charts.
+    Handles the creation of analysis charts. If a collection of selected actors is passed,
+    per-actor charts are only regenerated for those actors. If the ``chart_cache_directory`` option
+    is set, charts whose inputs are unchanged are copied from that cache instead of being rendered.
+    If the ``actor_ranking_top_n`` option is set, the ranking shows the most selected actors plus
+    an 'Other' bar, and per-actor charts are only created for those actors. If the
+    ``subject_rating_panels_per_page`` option is set, per-actor rating charts are drawn as panels
+    of paginated grid figures. If a :class:`~ballotbleach.progress.ProgressReporter` is passed,
+    charts are reported as a ``charts`` stage; a word cloud with all its sizes counts as one chart.
     """
     logger.info("Building charts...")
+    top_n = chart_options.get('actor_ranking_top_n')
+    top_actors = None
+    refresh_actors = selected_actors
+    actor_counts = count_actors(clean_ballots) if top_n or progress is not None else None
+    if top_n:
+        top_actors = set(get_top_actors(actor_counts, top_n))
+        selected_actors = top_actors if selected_actors is None else top_actors & set(selected_actors)
+    panels_per_page = chart_options.get('subject_rating_panels_per_page')
+    if progress is not None:
+        chart_actor_total = sum(1 for actor in actor_counts if selected_actors is None or actor in selected_actors)
+        if panels_per_page:
+            panel_total = sum(1 for actor in actor_counts if top_actors is None or actor in top_actors)
+            rating_chart_total = int(ceil(panel_total / panels_per_page))
+        else:
+            rating_chart_total = chart_actor_total
+        progress.start('charts', 3 + rating_chart_total + chart_actor_total)
+    chart_cache = None
+    if chart_options.get('chart_cache_directory'):
+        chart_cache = ChartCache(chart_options['chart_cache_directory'])
     # actor ranking image
     actor_ranking_image_file = ''.join((chart_options['actor_ranking_image_name'], '.png',))
     actor_ranking_image_path = os.path.join(chart_directory, actor_ranking_image_file)
     create_actor_ranking(clean_ballots,
                          chart_options['actor_ranking_title'],
                          chart_options['actor_ranking_tick_format'],
-                         actor_ranking_image_path)
+                         actor_ranking_image_path, chart_cache, top_n)
+    if progress is not None:
+        progress.advance('charts')
     # rating histogram
     rating_histogram_image_file = ''.join((chart_options['subject_rating_image_name'], '.png',))
     rating_histogram_image_path = os.path.join(chart_directory, rating_histogram_image_file)
     create_rating_histogram(clean_ballots, chart_options['subject_rating_range'],
                             chart_options['subject_rating_title'],
-                            rating_histogram_image_path)
+                            rating_histogram_image_path, chart_cache)
+    if progress is not None:
+        progress.advance('charts')
     # rating histograms for each actor's votes
-    create_rating_by_selected_actor(clean_ballots, chart_options['subject_rating_range'],
-                                    chart_directory, chart_options['subject_rating_title'])
+    if panels_per_page:
+        create_rating_grid_by_selected_actor(clean_ballots, chart_options['subject_rating_range'],
+                                             chart_directory, chart_options['subject_rating_title'],
+                                             panels_per_page, chart_options['subject_rating_image_name'],
+                                             top_actors, refresh_actors, chart_cache, progress)
+    else:
+        create_rating_by_selected_actor(clean_ballots, chart_options['subject_rating_range'],
+                                        chart_directory, chart_options['subject_rating_title'],
+                                        selected_actors, chart_cache, progress)
     # main word cloud
     create_word_cloud(clean_ballots, chart_directory, 'feedback-wordcloud',
-                      chart_options['mask_file'], chart_options['stop_words'])
+                      chart_options['mask_file'], chart_options['stop_words'],
+                      max_tracked_words=chart_options.get('word_cloud_max_tracked_words'),
+                      chart_cache=chart_cache)
+    if progress is not None:
+        progress.advance('charts')
     # word cloud for each actor's votes
     create_word_cloud_by_selected_actor(clean_ballots, chart_directory,
-                                        chart_options['mask_file'], chart_options['stop_words'])
+                                        chart_options['mask_file'], chart_options['stop_words'],
+                                        selected_actors,
+                                        chart_options.get('word_cloud_max_tracked_words'),
+                                        chart_cache, progress)
+    if progress is not None:
+        progress.finish('charts')
     logger.info("...chart-building completed.")
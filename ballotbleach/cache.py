@@ -0,0 +1,87 @@
+"""
+Content-addressed cache of rendered chart images.
+
+A chart's key is a hash of everything that determines its pixels: the aggregate it plots (counts,
+percentages, summary data or word frequencies), its title and tick format, and word cloud
+settings such as stop words, mask file contents and word count. When a cached image with the
+same key exists it is copied to the chart's path instead of being rendered again.
+
+Attributes:
+    CACHE_VERSION (int): Part of every key. Bump it when chart rendering code changes.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+CACHE_VERSION = 1
+
+
+def get_cache_key(kind, *parts):
+    """
+    Returns a hex digest identifying a chart of the passed kind rendered from the passed parts,
+    which must be JSON-serializable (other values are converted with ``str``).
+    """
+    content = json.dumps([CACHE_VERSION, kind, parts], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_file_digest(path):
+    """
+    Returns the SHA-256 hex digest of a file's contents, or None if no path is passed.
+    """
+    if not path:
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_feedback_digest(ballots):
+    """
+    Returns the SHA-256 hex digest of the ballots' concatenated feedback, computed without building
+    the concatenated text.
+    """
+    digest = hashlib.sha256()
+    for ballot in ballots:
+        digest.update(ballot.feedback.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ChartCache(object):
+    """
+    A directory of rendered chart images named by their keys.
+
+    Attributes:
+        directory (str): The cache directory. Created if missing.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, key, extension='.png'):
+        """
+        Returns the cache path for a key.
+        """
+        return os.path.join(self.directory, ''.join((key, extension,)))
+
+    def restore(self, key, image_save_path):
+        """
+        Copies the cached image for a key to ``image_save_path``. Returns False if there is none.
+        """
+        cached_path = self.get_path(key, os.path.splitext(image_save_path)[1])
+        if not os.path.exists(cached_path):
+            return False
+        shutil.copyfile(cached_path, image_save_path)
+        return True
+
+    def save(self, key, image_save_path):
+        """
+        Copies a freshly rendered image into the cache under a key.
+        """
+        cached_path = self.get_path(key, os.path.splitext(image_save_path)[1])
+        temporary_path = ''.join((cached_path, '.tmp',))
+        shutil.copyfile(image_save_path, temporary_path)
+        os.replace(temporary_path, cached_path)
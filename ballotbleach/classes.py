@@ -3,16 +3,26 @@ Ballot and Store classes.
 
 Attributes:
     DEFAULT_RISK_ASSESSMENTS (list): The default list of risk assessment functions.
+    BUFFER_SIZE (int): The default number of ballots a :class:`BallotBuffer` holds before it
+        adds them to its store.
 """
+from bisect import bisect_right
+from collections import Counter, OrderedDict
 import csv
 import os
 import re
+import threading
 from ballotbleach import risk
+from ballotbleach.columns import BallotColumns
+from ballotbleach.export import EXPORT_FORMATS, write_columnar
+from ballotbleach.parallel import score_risk_parallel
 
 
 DEFAULT_RISK_ASSESSMENTS = [risk.check_chain_stuffing, risk.check_verbosity,
                             risk.check_completion, risk.check_comment_duplication]
 
+BUFFER_SIZE = 1024
+
 
 class Ballot(object):
     """
@@ -21,7 +31,7 @@ class Ballot(object):
     def __init__(self, timestamp, subject_rating=None, selected_actor='None',
                  feedback=None):
         self.id = None
-        self._score_explanation = ''
+        self.flags = 0
         self.timestamp = timestamp
         self.subject_rating = subject_rating
         if not feedback:
@@ -60,34 +70,40 @@ class Ballot(object):
         """
         self.score = (self.score + amount)
 
+    def add_flag(self, flag):
+        """
+        Sets the passed rule bit flag (see :func:`~ballotbleach.risk.register_rule`) on the ballot.
+        """
+        self.flags |= flag
+
     def add_explanation(self, explanation):
         """
-        Add the passed explanatory detail to the ballot's risk score explanation.
+        Add the passed explanatory detail to the ballot's risk score explanation. The detail is
+        stored as a rule bit flag, registering a new rule if the name is unknown.
         """
-        if self._score_explanation:
-            self._score_explanation = ''.join((self._score_explanation, '+', explanation,))
-        else:
-            self._score_explanation = explanation
+        self.flags |= risk.get_rule_flag(explanation)
 
     @property
     def explanation(self):
         """
-        Returns the ballot's risk score explanation.
+        Returns the ballot's risk score explanation, rendered from its rule flags.
         """
-        if self._score_explanation:
-            return self._score_explanation
-        else:
-            return ''
+        return risk.render_flags(self.flags)
 
 
 class Store(object):
     """
-    A data store for ballots.
+    A data store for ballots. Ballots may be added from many producer threads at once: ids are
+    allocated and ballots appended under one lock, so ids stay unique and dense and the store
+    order matches id order. Producers should prefer :meth:`add_ballots` or a
+    :class:`BallotBuffer` from :meth:`get_buffer`, which take the lock once per batch.
 
     Attributes:
         _store (list): A list of ballots. Not intended for direct access.
         _counter (int): The count of persisted ballots. Used to provide an
           identifier to ballots saved in the store.
+        _actor_index (dict): Ballots grouped by selected actor. Not intended for direct access.
+        _lock (Lock): Guards the id counter, the ballot list and the actor index.
         risk_assessments (list): A list of risk assessment functions that are run on ballots.
             If no assessments are passed during initialization,
             it utilizes :data:`~ballotbleach.classes.DEFAULT_RISK_ASSESSMENTS`.
@@ -96,21 +112,58 @@ class Store(object):
     def __init__(self, risk_assessments=None):
         self._store = list()
         self._counter = 0
-        if not risk_assessments:
-            self.risk_assessments = DEFAULT_RISK_ASSESSMENTS
+        self._actor_index = dict()
+        self._lock = threading.Lock()
+        self.risk_assessments = risk_assessments if risk_assessments else DEFAULT_RISK_ASSESSMENTS
 
     def _increment_counter(self):
         self._counter += 1
         return self._counter
 
+    def _reserve_ids(self, count):
+        # Callers must hold the lock. Returns the first id of a dense range of ``count`` ids.
+        first_id = self._counter + 1
+        self._counter += count
+        return first_id
+
     def add_ballot(self, ballot):
         """
         Adds a ballot model to the store while providing it a unique integer identifier as its 'id' property.
         """
-        self._increment_counter()
-        new_id = self._counter
-        ballot.id = new_id
-        self._store.append(ballot)
+        with self._lock:
+            ballot.id = self._increment_counter()
+            self._store.append(ballot)
+            self._actor_index.setdefault(ballot.selected_actor, []).append(ballot)
+
+    def add_ballots(self, ballots):
+        """
+        Adds a batch of ballots, reserving a range of consecutive identifiers for them in one step.
+        The batch is kept together and in order in the store.
+        """
+        ballots = list(ballots)
+        with self._lock:
+            first_id = self._reserve_ids(len(ballots))
+            for ballot_id, ballot in enumerate(ballots, first_id):
+                ballot.id = ballot_id
+                self._actor_index.setdefault(ballot.selected_actor, []).append(ballot)
+            self._store.extend(ballots)
+
+    def get_buffer(self, buffer_size=BUFFER_SIZE):
+        """
+        Returns a new :class:`BallotBuffer` for one producer thread.
+        """
+        return BallotBuffer(self, buffer_size)
+
+    def restore_ballots(self, ballots):
+        """
+        Adds ballots that already have an id, such as ballots reloaded from a saved state. The
+        counter moves past the highest restored id so that later ballots get new identifiers.
+        """
+        with self._lock:
+            for ballot in ballots:
+                self._store.append(ballot)
+                self._actor_index.setdefault(ballot.selected_actor, []).append(ballot)
+                self._counter = max(self._counter, ballot.id)
 
     def get_ballots(self):
         """
@@ -118,6 +171,12 @@ class Store(object):
         """
         return self._store
 
+    def get_actor_ballots(self, selected_actor):
+        """
+        Returns the list of ballots that selected the passed actor, in store order.
+        """
+        return self._actor_index.get(selected_actor, [])
+
     def print_all_ballots(self):
         """
         Prints basic info about each ballot in store on command line.
@@ -136,13 +195,51 @@ class Store(object):
                 cleared_ballots.append(candidate_ballot)
         return cleared_ballots
 
-    def get_rows(self, cutoff_score):
+    def sweep_cutoffs(self, cutoff_scores):
+        """
+        Returns an ordered dictionary mapping each cutoff score (ascending) to the list of ballots under it.
+        Ballots are scanned once; because a ballot cleared at one cutoff is cleared at every higher cutoff,
+        each ballot is placed by a binary search over the sorted cutoffs. Ballots keep their store order.
+        """
+        sorted_cutoffs = sorted(set(cutoff_scores))
+        sweep = OrderedDict((cutoff_score, list()) for cutoff_score in sorted_cutoffs)
+        cleared_lists = list(sweep.values())
+        for ballot in self.get_ballots():
+            for cleared_ballots in cleared_lists[bisect_right(sorted_cutoffs, ballot.score):]:
+                cleared_ballots.append(ballot)
+        return sweep
+
+    def get_flags(self):
+        """
+        Returns a list with the rule bit flags of each ballot, in store order. Suitable as a column
+        for vectorized analysis.
+        """
+        return [ballot.flags for ballot in self._store]
+
+    def get_rule_counts(self):
+        """
+        Returns an ordered dictionary mapping each registered rule name to the number of ballots
+        that hit it. Distinct flag combinations are counted first, so the per-rule expansion
+        only touches each combination once.
+        """
+        combination_counts = Counter(ballot.flags for ballot in self._store)
+        rule_counts = OrderedDict((name, 0) for name in risk.RULE_NAMES)
+        for flags, count in combination_counts.items():
+            for index, name in enumerate(risk.RULE_NAMES):
+                if flags & (1 << index):
+                    rule_counts[name] += count
+        return rule_counts
+
+    def get_rows(self, cutoff_score, ballots=None):
         """
         Returns ballots under the cutoff score in a *row* format that is compatible with CSV-writing. If not cutoff
-        is passed, then all ballots are returned.
+        is passed, then all ballots are returned. If a list of ballots is passed, it is used instead of the
+        store's ballots.
         """
         rows = list()
-        for ballot in self.get_ballots():
+        if ballots is None:
+            ballots = self.get_ballots()
+        for ballot in ballots:
             if cutoff_score is None or ballot.score < cutoff_score:
                 row = [ballot.id, ballot.timestamp, ballot.subject_rating,
                        ballot.selected_actor, ballot.raw_feedback,
@@ -150,15 +247,96 @@ class Store(object):
                 rows.append(row)
         return rows
 
-    def to_csv(self, output_directory, output_file_name='ballots.csv', cutoff_score=None):
+    def to_csv(self, output_directory, output_file_name='ballots.csv', cutoff_score=None, ballots=None):
         """
-        Creates a CSV file with each ballot in the Store represented by a row of data.
+        Creates a CSV file with each ballot in the Store represented by a row of data. If a list of ballots
+        is passed, only those ballots are written.
         """
         output_csv = os.path.join(output_directory, output_file_name)
         with open(output_csv, 'w', newline='') as csv_file:
             ballot_writer = csv.writer(csv_file)
-            ballot_writer.writerows(self.get_rows(cutoff_score))
+            ballot_writer.writerows(self.get_rows(cutoff_score, ballots))
+
+    def publish_columns(self, cutoff_score=None):
+        """
+        Publishes the ballots under the cutoff score (all ballots if no cutoff is passed) to shared
+        memory and returns the owning :class:`~ballotbleach.columns.BallotColumns`. Pass its
+        ``get_handle()`` to worker processes and call ``unlink()`` when they are done.
+        """
+        return BallotColumns.publish(self.filter_ballots(cutoff_score))
+
+    def to_columnar(self, output_directory, export_format='parquet', output_file_name=None, cutoff_score=None):
+        """
+        Creates a Parquet or Arrow IPC file with the ballots under the cutoff score (all ballots if no
+        cutoff is passed) in typed columns. See :mod:`~ballotbleach.export`.
+        """
+        if output_file_name is None:
+            output_file_name = 'ballots.{0}'.format(EXPORT_FORMATS.get(export_format, export_format))
+        output_path = os.path.join(output_directory, output_file_name)
+        write_columnar(self.filter_ballots(cutoff_score), output_path, export_format)
+
+    def score_risk(self, workers=None, cutoff_score=None, progress=None):
+        """
+        Runs the risk assessments on the store's ballots. If more than one worker is requested,
+        ballots are partitioned by selected actor and scored in a process pool (see
+        :mod:`~ballotbleach.parallel`); the result is identical to serial scoring. If a cutoff
+        score is passed, ballots stop being scored once they reach it and are flagged as
+        *truncated* (see :func:`~ballotbleach.risk.run_assessments`). Progress is reported to the
+        passed :class:`~ballotbleach.progress.ProgressReporter`, if any.
+        """
+        if workers and workers > 1:
+            score_risk_parallel(self.get_ballots(), self.risk_assessments, workers, cutoff_score, progress)
+            return
+        risk.run_assessments(self.get_ballots(), self.risk_assessments, cutoff_score, progress)
+
+    def rescore_actors(self, selected_actors):
+        """
+        Resets and re-runs the risk assessments for the ballots of the passed actors only. Relies
+        on the assessments comparing ballots of the same actor, as the default assessments do.
+        """
+        for selected_actor in selected_actors:
+            actor_ballots = self.get_actor_ballots(selected_actor)
+            for ballot in actor_ballots:
+                ballot.score = 0
+                ballot.flags = 0
+            for assessment in self.risk_assessments:
+                assessment(actor_ballots)
 
-    def score_risk(self):
-        for assessment in self.risk_assessments:
-            assessment(self.get_ballots())
+
+class BallotBuffer(object):
+    """
+    Collects ballots from one producer thread and adds them to a store in batches with
+    :meth:`Store.add_ballots`, so producers contend for the store's lock once per batch rather than
+    once per ballot. Buffers are not shared between threads. Use as a context manager, or call
+    :meth:`flush` when the producer is done.
+
+    Attributes:
+        store (Store): The store ballots are added to.
+        buffer_size (int): The number of ballots collected before they are added.
+    """
+    def __init__(self, store, buffer_size=BUFFER_SIZE):
+        self.store = store
+        self.buffer_size = buffer_size
+        self._ballots = list()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def add_ballot(self, ballot):
+        """
+        Buffers a ballot, adding the buffered ballots to the store once the buffer is full.
+        """
+        self._ballots.append(ballot)
+        if len(self._ballots) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Adds the buffered ballots to the store. Ballots get their ids at this point.
+        """
+        if self._ballots:
+            ballots, self._ballots = self._ballots, list()
+            self.store.add_ballots(ballots)
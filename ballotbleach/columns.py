@@ -0,0 +1,173 @@
+"""
+Scored ballot columns published once to :mod:`multiprocessing.shared_memory`, so that scoring
+and chart worker processes can read them without pickling :class:`~ballotbleach.classes.Ballot`
+objects.
+
+The publishing process calls :meth:`BallotColumns.publish` and passes the small, picklable
+:meth:`~BallotColumns.get_handle` to workers, which call :meth:`BallotColumns.attach` to get
+NumPy views on the same memory. Workers should be started by the publishing process (for example
+with a process pool) so that they share its resource tracker. The publisher must call
+:meth:`~BallotColumns.unlink` when the workers are done.
+
+Attributes:
+    COLUMN_DTYPES (OrderedDict): The NumPy type of each numeric column. ``timestamp`` holds epoch
+        microseconds, ``subject_rating`` holds 0 for a missing rating and ``feedback_offsets``
+        holds the ``n + 1`` byte offsets of each ballot's feedback in the UTF-8 text buffer.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+import numpy as np
+import pytz
+from .stats import get_rating_values, rating_histograms
+
+COLUMN_DTYPES = OrderedDict((
+    ('timestamp', np.int64),
+    ('subject_rating', np.int16),
+    ('actor_code', np.int32),
+    ('score', np.int32),
+    ('flags', np.int64),
+    ('feedback_offsets', np.int64),
+))
+
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_AWARE_EPOCH = datetime(1970, 1, 1, tzinfo=pytz.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def get_epoch_microseconds(timestamp):
+    """
+    Returns a timestamp as integer microseconds since the epoch; naive timestamps are read as UTC.
+    """
+    epoch = _NAIVE_EPOCH if timestamp.tzinfo is None else _AWARE_EPOCH
+    return (timestamp - epoch) // _MICROSECOND
+
+
+def _create_block(size):
+    # Zero-size shared memory blocks are not allowed.
+    return shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+
+class BallotColumns(object):
+    """
+    Column views of scored ballots backed by shared memory.
+
+    Attributes:
+        size (int): The number of ballots.
+        actors (list): Selected actor names; ``actor_code`` indexes this list.
+        timestamp, subject_rating, actor_code, score, flags, feedback_offsets (ndarray): Column views.
+        feedback_buffer (ndarray): UTF-8 bytes of all feedback, concatenated.
+    """
+    def __init__(self, size, actors, blocks, text_size, owner=False):
+        self.size = size
+        self.actors = actors
+        self._blocks = blocks
+        self._text_size = text_size
+        self._owner = owner
+        for name, dtype in COLUMN_DTYPES.items():
+            length = size + 1 if name == 'feedback_offsets' else size
+            setattr(self, name, np.ndarray((length,), dtype=dtype, buffer=blocks[name].buf))
+        self.feedback_buffer = np.ndarray((text_size,), dtype=np.uint8, buffer=blocks['feedback'].buf)
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def publish(cls, ballots):
+        """
+        Copies the ballots' columns into new shared memory blocks and returns the owning instance.
+        """
+        size = len(ballots)
+        actor_codes = OrderedDict()
+        encoded_feedback = [ballot.feedback.encode('utf-8') for ballot in ballots]
+        text_size = sum(len(feedback) for feedback in encoded_feedback)
+        blocks = dict()
+        for name, dtype in COLUMN_DTYPES.items():
+            length = size + 1 if name == 'feedback_offsets' else size
+            blocks[name] = _create_block(length * np.dtype(dtype).itemsize)
+        blocks['feedback'] = _create_block(text_size)
+        columns = cls(size, [], blocks, text_size, owner=True)
+        for index, ballot in enumerate(ballots):
+            columns.timestamp[index] = get_epoch_microseconds(ballot.timestamp)
+            columns.subject_rating[index] = ballot.subject_rating or 0
+            columns.actor_code[index] = actor_codes.setdefault(ballot.selected_actor, len(actor_codes))
+            columns.score[index] = ballot.score
+            columns.flags[index] = ballot.flags
+        columns.actors.extend(actor_codes)
+        offset = 0
+        columns.feedback_offsets[0] = 0
+        for index, feedback in enumerate(encoded_feedback):
+            columns.feedback_buffer[offset:offset + len(feedback)] = np.frombuffer(feedback, dtype=np.uint8)
+            offset += len(feedback)
+            columns.feedback_offsets[index + 1] = offset
+        return columns
+
+    def get_handle(self):
+        """
+        Returns a small picklable dictionary that :meth:`attach` uses to map the same blocks.
+        """
+        return {
+            'size': self.size,
+            'actors': list(self.actors),
+            'text_size': self._text_size,
+            'blocks': {name: block.name for name, block in self._blocks.items()},
+        }
+
+    @classmethod
+    def attach(cls, handle):
+        """
+        Returns views on the shared memory blocks described by a handle, without copying them.
+        """
+        blocks = dict()
+        for name, block_name in handle['blocks'].items():
+            blocks[name] = shared_memory.SharedMemory(name=block_name)
+        return cls(handle['size'], handle['actors'], blocks, handle['text_size'])
+
+    def get_feedback(self, index):
+        """
+        Returns the feedback text of the ballot at ``index``.
+        """
+        start, stop = self.feedback_offsets[index], self.feedback_offsets[index + 1]
+        return self.feedback_buffer[start:stop].tobytes().decode('utf-8')
+
+    def get_rating_codes(self, rating_values):
+        """
+        Returns each ballot's rating code for the sorted ``rating_values`` (see
+        :mod:`~ballotbleach.stats`), found with a binary search instead of a Python loop. Ratings
+        that are not in ``rating_values`` get code 0.
+        """
+        values = np.asarray(rating_values, dtype=np.int64)
+        if not len(values):
+            return np.zeros(self.size, dtype=np.int64)
+        ratings = self.subject_rating.astype(np.int64)
+        positions = np.minimum(np.searchsorted(values, ratings), len(values) - 1)
+        return np.where(values[positions] == ratings, positions + 1, 0)
+
+    def count_ratings_by_actor(self, rating_range):
+        """
+        Returns the same ``(actors, counts)`` tuple as :func:`~ballotbleach.stats.count_ratings_by_actor`,
+        computed from the shared columns with one ``bincount``.
+        """
+        rating_values = get_rating_values(rating_range)
+        counts = rating_histograms(self.actor_code, self.get_rating_codes(rating_values),
+                                   len(self.actors), len(rating_values) + 1)
+        return list(self.actors), counts
+
+    def close(self):
+        """
+        Releases this process's views. Other processes keep theirs.
+        """
+        for name in COLUMN_DTYPES:
+            setattr(self, name, None)
+        self.feedback_buffer = None
+        for block in self._blocks.values():
+            block.close()
+
+    def unlink(self):
+        """
+        Closes and frees the shared memory blocks. Only the publishing instance may unlink.
+        """
+        self.close()
+        if self._owner:
+            for block in self._blocks.values():
+                block.unlink()
@@ -7,7 +7,9 @@ Attributes:
     logger (logger): Python logger.
 """
 import configparser
+import csv
 from datetime import datetime
+from functools import partial
 import json
 from logging import getLogger
 from logging import config as log_config
@@ -15,8 +17,16 @@ import os
 import click
 import pytz
 import xlrd
-from .classes import Ballot, Store
+from . import risk
+from .classes import Ballot, DEFAULT_RISK_ASSESSMENTS, Store
 from .analysis import save_charts
+from . import fingerprint
+from . import incremental
+from .progress import ProgressReporter, iterate, print_event
+from .service import SERVICE_HOST, SERVICE_PORT, serve
+from . import shard
+from .stream import STREAM_LOOKBACK_SECONDS, stream_ballots
+from .sweep import sweep_parameters, write_sweep_table
 
 logger = getLogger(__name__)
 
@@ -73,16 +83,22 @@ def row_to_ballot(row, tz_name=BALLOTBLEACH_TIMEZONE_NAME):
     return ballot
 
 
-def load_xlsx_ballots(filename, skip_first_row=True):
+def load_xlsx_ballots(filename, skip_first_row=True, start_row=None, store=None, progress=None):
     """
-    Creates :class:`~ballotbleach.classes.Ballot` classes from a passed Excel (xlsx) file.
+    Creates :class:`~ballotbleach.classes.Ballot` classes from a passed Excel (xlsx) file. If a
+    start row is passed, earlier rows are skipped; if a store is passed, ballots are added to it.
+    Parsed rows are reported as a ``load`` stage to the passed
+    :class:`~ballotbleach.progress.ProgressReporter`, if any.
     """
-    store = Store()
+    if store is None:
+        store = Store()
     book = xlrd.open_workbook(filename=filename)
     sheet = book.sheet_by_index(0)
     logger.info('Excel file - Total filled rows {0}'.format(sheet.nrows))
-    start_row = 1 if skip_first_row else 0
-    for row in range(start_row, sheet.nrows):
+    if start_row is None:
+        start_row = 1 if skip_first_row else 0
+    rows = range(start_row, sheet.nrows)
+    for row in iterate(progress, 'load', rows, len(rows)):
         ballot = row_to_ballot(sheet.row(row))
         store.add_ballot(ballot)
     return store
@@ -100,6 +116,34 @@ def dump_clean(input_file_path, output_file_directory,
     store.to_csv(output_file_directory, out_file_name, risk_cutoff)
 
 
+def update_incremental(input_file, output_directory, state_path, workers=None, progress=None):
+    """
+    Brings the ballots CSV in the output directory up to date with the rows appended to the input
+    file since the last run, using the state saved at ``state_path``. Runs in full, and saves a
+    new state, if there is no usable state or the new ballots are too old for the saved context.
+    Returns the set of selected actors whose ballots were added or changed score, or None after
+    a full run.
+    """
+    csv_path = os.path.join(output_directory, 'ballots.csv')
+    state = incremental.load_state(state_path)
+    if state is not None and os.path.exists(csv_path) and os.path.exists(incremental.get_feedback_path(csv_path)):
+        store = incremental.restore_store(state)
+        context_count = len(store.get_ballots())
+        load_xlsx_ballots(input_file, start_row=state['last_row'], store=store, progress=progress)
+        new_ballots = store.get_ballots()[context_count:]
+        logger.info('Incremental run - {0} new rows'.format(len(new_ballots)))
+        if incremental.can_apply(state, new_ballots):
+            state, changed_actors = incremental.apply_increment(state, store, csv_path)
+            incremental.save_state(state_path, state)
+            return changed_actors
+        logger.info('New ballots precede the saved context; running in full.')
+    store = load_xlsx_ballots(input_file, progress=progress)
+    store.score_risk(workers, progress=progress)
+    state = incremental.write_full(store, csv_path, len(store.get_ballots()) + 1)
+    incremental.save_state(state_path, state)
+    return None
+
+
 def get_chart_options(config_parser):
     """
     Returns a dictionary with configuration for chart generation.
@@ -113,6 +157,10 @@ def get_chart_options(config_parser):
         'subject_rating_range': [1, 2, 3, 4, 5],
         'mask_file': None,
         'stop_words': None,
+        'word_cloud_max_tracked_words': None,
+        'chart_cache_directory': None,
+        'actor_ranking_top_n': None,
+        'subject_rating_panels_per_page': None,
     }
     if config_parser.has_section('ballotbleach.charts'):
         section = config_parser['ballotbleach.charts']
@@ -124,45 +172,259 @@ def get_chart_options(config_parser):
             rating_range = json.loads(section['subject_rating_range'])
             del section['subject_rating_range']
             chart_options['subject_rating_range'] = rating_range
+        if 'actor_ranking_top_n' in section:
+            top_n = int(section['actor_ranking_top_n'])
+            del section['actor_ranking_top_n']
+            chart_options['actor_ranking_top_n'] = top_n
+        if 'subject_rating_panels_per_page' in section:
+            panels_per_page = int(section['subject_rating_panels_per_page'])
+            del section['subject_rating_panels_per_page']
+            chart_options['subject_rating_panels_per_page'] = panels_per_page
+        if 'word_cloud_max_tracked_words' in section:
+            max_tracked_words = int(section['word_cloud_max_tracked_words'])
+            del section['word_cloud_max_tracked_words']
+            chart_options['word_cloud_max_tracked_words'] = max_tracked_words
         for key, value in section.items():
             chart_options[key] = value
     return chart_options
 
 
-def analyze(chart_options, input_file, chart_directory, risk_cutoff):
+def parse_cutoffs(value):
+    """
+    Returns a list of integer risk cutoffs parsed from a single number, a comma-separated
+    string (``50,75,100``) or a JSON list (``[50, 75, 100]``). Returns None if no value is passed.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return [int(value)]
+    if isinstance(value, (list, tuple)):
+        return [int(cutoff) for cutoff in value]
+    value = value.strip()
+    if value.startswith('['):
+        return [int(cutoff) for cutoff in json.loads(value)]
+    return [int(cutoff) for cutoff in value.split(',') if cutoff.strip()]
+
+
+def write_rejection_table(store, sweep, output_directory, output_file_name='cutoff-rejections.csv'):
+    """
+    Writes a CSV table with the number of ballots each risk cutoff rejects and clears.
+    """
+    total_ballots = len(store.get_ballots())
+    os.makedirs(output_directory, exist_ok=True)
+    output_csv = os.path.join(output_directory, output_file_name)
+    with open(output_csv, 'w', newline='') as csv_file:
+        table_writer = csv.writer(csv_file)
+        table_writer.writerow(['cutoff', 'ballots', 'rejected', 'cleared'])
+        for cutoff, cleared_ballots in sweep.items():
+            table_writer.writerow([cutoff, total_ballots, total_ballots - len(cleared_ballots),
+                                   len(cleared_ballots)])
+
+
+def save_cutoff_sweep(store, cutoffs, output_directory, chart_directory, chart_options, write_csv=True,
+                      progress=None):
+    """
+    Writes a cleaned CSV (``clean-ballots-<cutoff>.csv``) and a chart set (``<chart_directory>/cutoff-<cutoff>``)
+    for each risk cutoff, plus a table of rejection counts per cutoff. The store is scored once
+    beforehand and split across all cutoffs in a single scan by :meth:`~ballotbleach.classes.Store.sweep_cutoffs`.
+    """
+    sweep = store.sweep_cutoffs(cutoffs)
+    write_rejection_table(store, sweep, output_directory)
+    for cutoff, cleared_ballots in sweep.items():
+        if write_csv:
+            store.to_csv(output_directory, 'clean-ballots-{0}.csv'.format(cutoff), ballots=cleared_ballots)
+            logger.info('Wrote CSV file with ballots under cutoff {0} to {1} directory'.format(cutoff,
+                                                                                           output_directory))
+        cutoff_chart_directory = os.path.join(chart_directory, 'cutoff-{0}'.format(cutoff))
+        os.makedirs(cutoff_chart_directory, exist_ok=True)
+        save_charts(cutoff_chart_directory, chart_options, cleared_ballots, progress=progress)
+
+
+def get_risk_assessments(config_parser, wave_label=None):
+    """
+    Returns the list of risk assessments set by the ``[ballotbleach]`` section: the defaults, plus
+    :func:`~ballotbleach.risk.check_submission_bursts` if ``burst_detection`` is on, configured by
+    ``burst_bin_seconds`` and ``burst_sensitivity``. If ``streaming_chain_detection`` is on,
+    :func:`~ballotbleach.risk.check_chain_stuffing_streaming` replaces the exact chain check, with a
+    sketch sized by ``streaming_chain_bucket_seconds``, ``streaming_chain_width`` and
+    ``streaming_chain_depth``. If ``fingerprint_index`` is set,
+    :func:`~ballotbleach.fingerprint.check_previous_waves` looks up feedback in that index, ignoring
+    fingerprints recorded under ``wave_label``.
+    """
+    risk_assessments = list(DEFAULT_RISK_ASSESSMENTS)
+    if not config_parser.has_section('ballotbleach'):
+        return risk_assessments
+    section = config_parser['ballotbleach']
+    if section.getboolean('streaming_chain_detection', fallback=False):
+        chain_assessment = partial(risk.check_chain_stuffing_streaming,
+                                   bucket_seconds=section.getfloat('streaming_chain_bucket_seconds', fallback=None),
+                                   width=section.getint('streaming_chain_width', fallback=None),
+                                   depth=section.getint('streaming_chain_depth', fallback=None))
+        risk_assessments[risk_assessments.index(risk.check_chain_stuffing)] = chain_assessment
+    if section.getboolean('burst_detection', fallback=False):
+        burst_assessment = partial(risk.check_submission_bursts,
+                                   bin_seconds=section.getint('burst_bin_seconds', fallback=None),
+                                   sensitivity=section.getfloat('burst_sensitivity', fallback=None))
+        risk_assessments.append(burst_assessment)
+    if 'fingerprint_index' in section:
+        risk_assessments.append(partial(fingerprint.check_previous_waves, index_path=section['fingerprint_index'],
+                                        wave_label=wave_label))
+    return risk_assessments
+
+
+def get_sweep_grid(config_parser):
+    """
+    Returns the parameter grid for the ``sweep`` action from the ``[ballotbleach.sweep]`` section.
+    Each key is a parameter name from :data:`~ballotbleach.sweep.DEFAULT_PARAMETERS` with a number
+    or a JSON list of numbers.
+    """
+    grid = dict()
+    if config_parser.has_section('ballotbleach.sweep'):
+        for key, value in config_parser['ballotbleach.sweep'].items():
+            grid[key] = json.loads(value)
+    return grid
+
+
+def get_early_exit_cutoff(cutoffs):
+    """
+    Returns the score at which scoring can stop for the passed list of cutoffs: the highest one,
+    since a ballot that reaches it is rejected at every cutoff. Returns None without cutoffs.
+    """
+    return max(cutoffs) if cutoffs else None
+
+
+def check_shard_options(action, shard_path, risk_assessments, early_exit):
+    """
+    Raises :class:`click.UsageError` if a sharded scoring action cannot run as configured: the
+    ``shard-summarize`` and ``shard-score`` actions need ``--shard``, and shards are only scored
+    with the default risk assessments and without ``early_exit``, so that the merged CSV is the
+    same as the one the ``full`` action writes.
+    """
+    if action in ('shard-summarize', 'shard-score') and not shard_path:
+        raise click.UsageError('The {0} action needs a --shard file.'.format(action))
+    if list(risk_assessments) != list(DEFAULT_RISK_ASSESSMENTS):
+        raise click.UsageError('Sharded scoring only applies the default risk assessments; turn off '
+                               'burst_detection, streaming_chain_detection and fingerprint_index.')
+    if early_exit:
+        raise click.UsageError('Sharded scoring does not support early_exit.')
+
+
+def check_incremental_options(cutoffs, export_format, risk_assessments, early_exit):
+    """
+    Raises :class:`click.UsageError` if an incremental ``full`` run cannot apply the configured
+    options: it writes one chart set, only updates *ballots.csv* and only rescores new ballots with
+    the default risk assessments, without ``early_exit``.
+    """
+    if cutoffs and len(cutoffs) > 1:
+        raise click.UsageError('Incremental runs take a single cutoff.')
+    if export_format:
+        raise click.UsageError('Incremental runs do not write {0} files; drop --export and '
+                               'export_format.'.format(export_format))
+    if list(risk_assessments) != list(DEFAULT_RISK_ASSESSMENTS):
+        raise click.UsageError('Incremental runs only apply the default risk assessments; turn off '
+                               'burst_detection, streaming_chain_detection and fingerprint_index.')
+    if early_exit:
+        raise click.UsageError('Incremental runs do not support early_exit.')
+
+
+def check_stream_options(risk_assessments):
+    """
+    Raises :class:`click.UsageError` if the ``stream`` action cannot apply the configured risk
+    assessments: streamed ballots are only scored with the default ones (see
+    :mod:`~ballotbleach.stream`).
+    """
+    if list(risk_assessments) != list(DEFAULT_RISK_ASSESSMENTS):
+        raise click.UsageError('The stream action only applies the default risk assessments; turn off '
+                               'burst_detection, streaming_chain_detection and fingerprint_index.')
+
+
+def analyze(chart_options, input_file, chart_directory, risk_cutoff, workers=None, risk_assessments=None,
+            early_exit=False, progress=None, output_directory=None):
     """
     Called by command line script per setup.py configuration. Writes out
     visualizations with statistics analyzing submitted surveys. By default,
     ballots at or exceeding the risk cutoff of 75 will **not** be considered
-    in analytical results.
+    in analytical results. If a list of cutoffs is passed, a chart set is written
+    for each cutoff, and the table of rejection counts goes to ``output_directory``
+    (the parent of the chart directory by default). With ``early_exit``, ballots
+    stop being scored once they are rejected at every cutoff. Progress is reported to the passed
+    :class:`~ballotbleach.progress.ProgressReporter`, if any.
     """
-    store = load_xlsx_ballots(input_file)
-    store.score_risk()
+    store = load_xlsx_ballots(input_file, store=Store(risk_assessments), progress=progress)
+    cutoffs = risk_cutoff if isinstance(risk_cutoff, (list, tuple)) else [risk_cutoff]
+    store.score_risk(workers, get_early_exit_cutoff([cutoff for cutoff in cutoffs if cutoff is not None])
+                     if early_exit else None, progress)
+    if isinstance(risk_cutoff, (list, tuple)) and len(risk_cutoff) > 1:
+        if output_directory is None:
+            output_directory = os.path.dirname(os.path.normpath(chart_directory)) or os.curdir
+        save_cutoff_sweep(store, risk_cutoff, output_directory, chart_directory, chart_options, write_csv=False,
+                          progress=progress)
+        return
+    if isinstance(risk_cutoff, (list, tuple)):
+        risk_cutoff = risk_cutoff[0]
     cleared_ballots = store.filter_ballots(risk_cutoff)
-    save_charts(chart_directory, chart_options, cleared_ballots)
+    save_charts(chart_directory, chart_options, cleared_ballots, progress=progress)
 
 @click.command()
 @click.argument('action', default='full')
 @click.option('--cutoff', default=None)
 @click.option('--conf', default='ballotbleach.ini')
 @click.option('--input', default='raw-ballots.xlsx')
-def run(action, cutoff, conf, input):
+@click.option('--workers', default=None, type=int)
+@click.option('--incremental', 'incremental_run', is_flag=True, default=False)
+@click.option('--export', 'export_format', default=None, type=click.Choice(['parquet', 'arrow']))
+@click.option('--progress', 'show_progress', is_flag=True, default=False)
+@click.option('--shards', 'shard_count', default=None, type=click.IntRange(min=1))
+@click.option('--shard', 'shard_path', default=None)
+def run(action, cutoff, conf, input, workers, incremental_run, export_format, show_progress, shard_count, shard_path):
     """
     Called by command line script per setup.py configuration.
     - Reads and transforms a source file into a ballot store
-    - Risk scores ballots in the store
-    - Writes out a CSV with *all* ballots and their risk scored.
+    - Risk scores ballots in the store, across ``--workers`` processes if more than one is set
+    - Writes out a CSV with *all* ballots and their risk scored, and a Parquet or Arrow file of
+      the same ballots if an export format is set.
     - If a cutoff is passed, writes out a CSV with *only* ballots above the cutoff.
     - Generates and saves basic analysis charts.
+    - If several cutoffs are passed (``--cutoff 50,75,100``), writes a cleaned CSV and chart set
+      per cutoff along with a table of rejection counts.
+
+    With ``--incremental``, the ``full`` action only loads and scores rows appended since the last
+    run and updates the CSV and the charts of the affected actors in place (see
+    :mod:`~ballotbleach.incremental`). It takes a single cutoff and no export format, and only
+    applies the default risk assessments.
+
+    The ``sweep`` action writes a table of rejection counts for every combination of chain window
+    and rule weights listed in the ``[ballotbleach.sweep]`` configuration section.
+
+    The ``serve`` action instead starts a local scoring service (see :mod:`~ballotbleach.service`)
+    that keeps the input ballots, if the input file exists, in a warm store.
+
+    With ``--progress``, rows parsed, ballots scored per assessment and charts rendered are
+    reported on standard error with their rate and estimated time left (see
+    :mod:`~ballotbleach.progress`).
+
+    The ``shard-split``, ``shard-summarize``, ``shard-score`` and ``shard-merge`` actions score a
+    survey in time shards on several nodes, and the ``shard`` action runs those steps locally in
+    ``--shards`` processes (see :mod:`~ballotbleach.shard`).
+
+    The ``stream`` action reads ballot records as JSON lines from stdin and writes risk-scored
+    records to stdout (see :mod:`~ballotbleach.stream`).
     """
     # First, handle configuration
     input_file = input
     output_directory = 'results'
+    service_options = {'host': SERVICE_HOST, 'port': SERVICE_PORT, 'socket_path': None}
+    state_file = None
+    early_exit = False
+    stream_lookback_seconds = STREAM_LOOKBACK_SECONDS
+    fingerprint_index = None
+    wave_label = None
+    progress = ProgressReporter([print_event]) if show_progress else None
     config_parser = configparser.ConfigParser()
     config_parser.read(conf)
     if config_parser.has_section('ballotbleach'):
         if cutoff is None:
-            cutoff = int(config_parser['ballotbleach']['risk_cutoff']) \
+            cutoff = config_parser['ballotbleach']['risk_cutoff'] \
                 if 'risk_cutoff' in config_parser['ballotbleach'] else None
         if 'log_level' in config_parser['ballotbleach']:
             LOGGER_CONFIG['loggers']['ballotbleach']['level'] = config_parser['ballotbleach']['log_level']
@@ -171,20 +433,108 @@ def run(action, cutoff, conf, input):
                 if 'input_file' in config_parser['ballotbleach'] else 'raw-ballots.xlsx'
         if 'output_directory' in config_parser['ballotbleach']:
             output_directory = config_parser['ballotbleach']['output_directory']
+        if workers is None and 'workers' in config_parser['ballotbleach']:
+            workers = int(config_parser['ballotbleach']['workers'])
+        if export_format is None and 'export_format' in config_parser['ballotbleach']:
+            export_format = config_parser['ballotbleach']['export_format']
+        if 'state_file' in config_parser['ballotbleach']:
+            state_file = config_parser['ballotbleach']['state_file']
+        early_exit = config_parser['ballotbleach'].getboolean('early_exit', fallback=False)
+        if 'stream_lookback_seconds' in config_parser['ballotbleach']:
+            stream_lookback_seconds = int(config_parser['ballotbleach']['stream_lookback_seconds'])
+        if 'fingerprint_index' in config_parser['ballotbleach']:
+            fingerprint_index = config_parser['ballotbleach']['fingerprint_index']
+            wave_label = config_parser['ballotbleach'].get('fingerprint_wave')
+            if not wave_label:
+                raise click.UsageError('fingerprint_index needs a fingerprint_wave label naming the survey wave.')
+        if 'service_host' in config_parser['ballotbleach']:
+            service_options['host'] = config_parser['ballotbleach']['service_host']
+        if 'service_port' in config_parser['ballotbleach']:
+            service_options['port'] = int(config_parser['ballotbleach']['service_port'])
+        if 'service_socket' in config_parser['ballotbleach']:
+            service_options['socket_path'] = config_parser['ballotbleach']['service_socket']
+    cutoffs = parse_cutoffs(cutoff)
+    cutoff = cutoffs[0] if cutoffs else None
     log_config.dictConfig(LOGGER_CONFIG)
     chart_directory = os.path.join(output_directory, 'charts')
+    shard_directory = os.path.join(output_directory, 'shards')
     chart_options = get_chart_options(config_parser)
+    risk_assessments = get_risk_assessments(config_parser, wave_label)
     logger.info('CONFIG')
     logger.info(chart_options)
+    if action in ('shard-split', 'shard-summarize', 'shard-score', 'shard'):
+        check_shard_options(action, shard_path, risk_assessments, early_exit)
+    if action == 'full' and incremental_run:
+        check_incremental_options(cutoffs, export_format, risk_assessments, early_exit)
+    if action == 'stream':
+        check_stream_options(risk_assessments)
     # Now, handle action
     if action == 'charts':
-        analyze(chart_options, input_file, chart_directory, cutoff)
+        analyze(chart_options, input_file, chart_directory, cutoffs, workers, risk_assessments, early_exit,
+                progress, output_directory)
+    elif action == 'full' and incremental_run:
+        if state_file is None:
+            state_file = os.path.join(output_directory, 'ballotbleach-state.json')
+        changed_actors = update_incremental(input_file, output_directory, state_file, workers, progress)
+        logger.info('Updated CSV file with risk-scored ballots in {0} directory'.format(output_directory))
+        csv_path = os.path.join(output_directory, 'ballots.csv')
+        all_ballots = incremental.read_csv_ballots(csv_path, incremental.get_feedback_path(csv_path))
+        cleared_ballots = [ballot for ballot in all_ballots if cutoff is None or ballot.score < cutoff]
+        save_charts(chart_directory, chart_options, cleared_ballots, changed_actors, progress)
     elif action == 'full':
-        store = load_xlsx_ballots(input_file)
-        store.score_risk()
+        store = load_xlsx_ballots(input_file, store=Store(risk_assessments), progress=progress)
+        store.score_risk(workers, get_early_exit_cutoff(cutoffs) if early_exit else None, progress)
         store.to_csv(output_directory)
         logger.info('Wrote CSV file with risk-scored ballots to {0} directory'.format(output_directory))
-        cleared_ballots = store.filter_ballots(cutoff)
-        save_charts(chart_directory, chart_options, cleared_ballots)
+        if fingerprint_index:
+            added = fingerprint.record_wave(store.get_ballots(), fingerprint_index, wave_label)
+            logger.info('Recorded {0} new feedback fingerprints in {1}'.format(added, fingerprint_index))
+        if export_format:
+            store.to_columnar(output_directory, export_format)
+            logger.info('Wrote {0} file with risk-scored ballots to {1} directory'.format(export_format,
+                                                                                      output_directory))
+        if cutoffs and len(cutoffs) > 1:
+            save_cutoff_sweep(store, cutoffs, output_directory, chart_directory, chart_options, progress=progress)
+        else:
+            cleared_ballots = store.filter_ballots(cutoff)
+            save_charts(chart_directory, chart_options, cleared_ballots, progress=progress)
+    elif action == 'sweep':
+        if any(assessment not in risk_assessments for assessment in DEFAULT_RISK_ASSESSMENTS):
+            raise click.UsageError('The sweep action models the exact chain check; turn off '
+                                   'streaming_chain_detection.')
+        extra_assessments = [assessment for assessment in risk_assessments
+                             if assessment not in DEFAULT_RISK_ASSESSMENTS]
+        store = load_xlsx_ballots(input_file, progress=progress)
+        rows = sweep_parameters(store.get_ballots(), get_sweep_grid(config_parser), cutoffs or [75],
+                                extra_assessments)
+        write_sweep_table(rows, output_directory)
+        logger.info('Wrote parameter sweep table to {0} directory'.format(output_directory))
+    elif action == 'serve':
+        store = Store(risk_assessments)
+        if os.path.exists(input_file):
+            load_xlsx_ballots(input_file, store=store, progress=progress)
+        serve(store, tz_name=BALLOTBLEACH_TIMEZONE_NAME, **service_options)
+    elif action == 'shard-split':
+        store = load_xlsx_ballots(input_file, progress=progress)
+        shard_paths = shard.split_shards(store.get_ballots(), shard_count or 1, shard_directory)
+        logger.info('Wrote {0} shard files to {1} directory'.format(len(shard_paths), shard_directory))
+    elif action == 'shard-summarize':
+        logger.info('Wrote shard summary {0}'.format(shard.summarize_shard(shard_path)))
+    elif action == 'shard-score':
+        summary_paths = shard.find_shard_files(os.path.dirname(shard_path) or os.curdir, '.earliest.json')
+        logger.info('Wrote scored shard {0}'.format(shard.score_shard(shard_path, summary_paths)))
+    elif action == 'shard-merge':
+        shard.merge_shards(shard.get_split_files(shard_directory, '.csv'),
+                           os.path.join(output_directory, 'ballots.csv'))
+        logger.info('Wrote CSV file with risk-scored ballots to {0} directory'.format(output_directory))
+    elif action == 'shard':
+        store = load_xlsx_ballots(input_file, progress=progress)
+        shard.score_sharded(store.get_ballots(), shard_count or workers or 1, shard_directory,
+                            os.path.join(output_directory, 'ballots.csv'), workers)
+        logger.info('Wrote CSV file with risk-scored ballots to {0} directory'.format(output_directory))
+    elif action == 'stream':
+        written = stream_ballots(click.get_text_stream('stdin'), click.get_text_stream('stdout'),
+                                 tz_name=BALLOTBLEACH_TIMEZONE_NAME, lookback_seconds=stream_lookback_seconds)
+        logger.info('Streamed {0} risk-scored ballots'.format(written))
     else:
         print('That command action is not supported.')
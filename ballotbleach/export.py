@@ -0,0 +1,112 @@
+"""
+Columnar export of scored ballots to Parquet or Arrow IPC files. Requires the optional
+``pyarrow`` dependency (``pip install ballotbleach[arrow]``).
+
+Each ballot becomes a row with typed columns: ``id`` (int64), ``timestamp`` (int64 epoch
+seconds), ``subject_rating`` (nullable int16), ``selected_actor`` (dictionary-encoded string),
+``feedback`` (normalized feedback), ``score`` (int32), ``flags`` (int64 rule bit flags) and one
+boolean ``rule_<name>`` column per registered risk rule.
+
+Attributes:
+    EXPORT_FORMATS (dict): File extension for each supported export format.
+    BATCH_SIZE (int): The number of ballots written per record batch.
+"""
+from . import risk
+
+EXPORT_FORMATS = {
+    'parquet': 'parquet',
+    'arrow': 'arrow',
+}
+BATCH_SIZE = 65536
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Columnar export requires pyarrow. Install it with "pip install pyarrow".')
+    return pyarrow
+
+
+def get_rule_column_name(rule_name):
+    """
+    Returns the column name for a risk rule's boolean hit column.
+    """
+    return ''.join(('rule_', rule_name.replace('-', '_'),))
+
+
+def get_schema(pa):
+    """
+    Returns the Arrow schema of exported ballots.
+    """
+    fields = [
+        pa.field('id', pa.int64(), nullable=False),
+        pa.field('timestamp', pa.int64()),
+        pa.field('subject_rating', pa.int16()),
+        pa.field('selected_actor', pa.dictionary(pa.int32(), pa.string())),
+        pa.field('feedback', pa.string()),
+        pa.field('score', pa.int32()),
+        pa.field('flags', pa.int64()),
+    ]
+    for rule_name in risk.RULE_NAMES:
+        fields.append(pa.field(get_rule_column_name(rule_name), pa.bool_()))
+    return pa.schema(fields)
+
+
+def _to_epoch(timestamp):
+    if hasattr(timestamp, 'timestamp'):
+        return int(timestamp.timestamp())
+    return None
+
+
+def build_record_batch(pa, schema, ballots, actor_dictionary, actor_codes):
+    """
+    Returns an Arrow record batch for a list of ballots. Actors are encoded against the shared
+    ``actor_dictionary`` array using ``actor_codes``, so every batch uses the same dictionary.
+    """
+    flags = [ballot.flags for ballot in ballots]
+    columns = [
+        pa.array([ballot.id for ballot in ballots], type=pa.int64()),
+        pa.array([_to_epoch(ballot.timestamp) for ballot in ballots], type=pa.int64()),
+        pa.array([ballot.subject_rating for ballot in ballots], type=pa.int16()),
+        pa.DictionaryArray.from_arrays(
+            pa.array([actor_codes[ballot.selected_actor] for ballot in ballots], type=pa.int32()),
+            actor_dictionary),
+        pa.array([ballot.raw_feedback for ballot in ballots], type=pa.string()),
+        pa.array([ballot.score for ballot in ballots], type=pa.int32()),
+        pa.array(flags, type=pa.int64()),
+    ]
+    for index in range(len(risk.RULE_NAMES)):
+        rule_flag = 1 << index
+        columns.append(pa.array([bool(flag & rule_flag) for flag in flags], type=pa.bool_()))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def write_columnar(ballots, output_path, export_format='parquet', batch_size=BATCH_SIZE):
+    """
+    Writes ballots to a Parquet or Arrow IPC file in record batches of ``batch_size`` ballots.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError('Unsupported export format "{0}".'.format(export_format))
+    pa = _import_pyarrow()
+    schema = get_schema(pa)
+    actor_codes = dict()
+    for ballot in ballots:
+        actor_codes.setdefault(ballot.selected_actor, len(actor_codes))
+    actor_dictionary = pa.array([str(actor) for actor in actor_codes], type=pa.string())
+    if export_format == 'parquet':
+        writer = pa.parquet.ParquetWriter(output_path, schema)
+    else:
+        writer = pa.ipc.new_file(output_path, schema)
+    try:
+        for start in range(0, len(ballots), batch_size):
+            batch = build_record_batch(pa, schema, ballots[start:start + batch_size],
+                                       actor_dictionary, actor_codes)
+            if export_format == 'parquet':
+                writer.write_table(pa.Table.from_batches([batch], schema=schema))
+            else:
+                writer.write_batch(batch)
+    finally:
+        writer.close()
@@ -0,0 +1,252 @@
+"""
+A persistent index of feedback fingerprints shared by survey waves.
+
+Scripted comments come back in later waves of a survey. Instead of reloading old workbooks,
+each wave's (selected actor, normalized feedback) groups are recorded as 64-bit fingerprints in an
+on-disk, memory-mapped, open-addressing hash table, and the ballots of a new wave are looked up
+in O(1) each. Every slot also keeps the id of the wave that first recorded the fingerprint, so
+scoring a wave that was already recorded does not match its own comments.
+
+Two different comments share a fingerprint with probability about 2^-64 per pair, so with
+``n`` recorded groups the chance of any false match in a wave of ``m`` ballots is at most about
+``n * m / 2^64``.
+
+The file is a 32-byte header (magic, version, capacity, count) followed by ``capacity`` slots of
+two little-endian 64-bit integers: the fingerprint (0 for an empty slot) and the wave id. The
+table doubles, into a new file that replaces the old one, when it would be more than
+:data:`INDEX_MAX_LOAD` full. One process should write to an index at a time.
+
+Attributes:
+    INDEX_MAGIC (bytes): The first bytes of an index file.
+    INDEX_VERSION (int): Version of the index file layout.
+    INDEX_INITIAL_CAPACITY (int): The number of slots of a new index. A power of two.
+    INDEX_MAX_LOAD (float): The highest share of used slots before the table grows.
+"""
+import hashlib
+import mmap
+import os
+import struct
+from . import risk
+
+INDEX_MAGIC = b'BBFPIDX\x00'
+INDEX_VERSION = 1
+INDEX_INITIAL_CAPACITY = 1 << 16
+INDEX_MAX_LOAD = 0.5
+
+_HEADER = struct.Struct('<8sIxxxxQQ')
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def get_fingerprint(selected_actor, feedback):
+    """
+    Returns the non-zero 64-bit fingerprint of a (selected actor, feedback) group.
+    """
+    return _hash64('\x00'.join((str(selected_actor), feedback))) or 1
+
+
+def get_normalized_feedback(ballot):
+    """
+    Returns a ballot's raw feedback (lowercase, without punctuation) with runs of white space
+    collapsed to one space, so a comment repeated with different case, punctuation or spacing
+    gets the same fingerprint.
+    """
+    return ' '.join(ballot.raw_feedback.split())
+
+
+def get_ballot_fingerprint(ballot):
+    """
+    Returns the fingerprint of a ballot's (selected actor, normalized feedback) group.
+    """
+    return get_fingerprint(ballot.selected_actor, get_normalized_feedback(ballot))
+
+
+def get_wave_id(wave_label):
+    """
+    Returns the non-zero 64-bit id of a wave label, such as ``'2016-spring'``.
+    """
+    return _hash64(str(wave_label)) or 1
+
+
+def _find_slot(slots, capacity, fingerprint):
+    # Returns the slot holding the fingerprint, or the empty slot where it would go.
+    mask = capacity - 1
+    slot = fingerprint & mask
+    while True:
+        stored = slots[2 * slot]
+        if stored == fingerprint or stored == 0:
+            return slot
+        slot = (slot + 1) & mask
+
+
+def _insert(slots, capacity, fingerprint, wave_id):
+    # Stores a fingerprint unless it is already there; returns 1 if it was added, else 0.
+    slot = _find_slot(slots, capacity, fingerprint)
+    if slots[2 * slot]:
+        return 0
+    slots[2 * slot] = fingerprint
+    slots[2 * slot + 1] = wave_id
+    return 1
+
+
+class FingerprintIndex(object):
+    """
+    A memory-mapped fingerprint hash table. Opened read-only, a missing file acts as an empty
+    index; opened writable, it is created. Use as a context manager or call :meth:`close`.
+
+    Attributes:
+        path (str): The index file path.
+        writable (bool): Whether fingerprints may be added.
+        capacity (int): The number of slots.
+    """
+    def __init__(self, path, writable=False, initial_capacity=INDEX_INITIAL_CAPACITY):
+        self.path = path
+        self.writable = writable
+        self.capacity = 0
+        self._count = 0
+        self._file = None
+        self._map = None
+        self._slots = None
+        if not os.path.exists(path):
+            if not writable:
+                return
+            self._create(path, initial_capacity)
+        self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, fingerprint):
+        return self.get_wave(fingerprint) is not None
+
+    @staticmethod
+    def _create(path, capacity, entries=()):
+        # Writes a table holding the passed (fingerprint, wave id) pairs next to the path, then
+        # replaces the path with it, so a failure never leaves a partly written index behind.
+        temporary_path = ''.join((path, '.tmp',))
+        with open(temporary_path, 'w+b') as index_file:
+            index_file.truncate(_HEADER.size + 16 * capacity)
+            with mmap.mmap(index_file.fileno(), 0) as index_map:
+                slots = memoryview(index_map)[_HEADER.size:].cast('Q')
+                count = 0
+                try:
+                    for fingerprint, wave_id in entries:
+                        count += _insert(slots, capacity, fingerprint, wave_id)
+                finally:
+                    slots.release()
+                _HEADER.pack_into(index_map, 0, INDEX_MAGIC, INDEX_VERSION, capacity, count)
+                index_map.flush()
+            os.fsync(index_file.fileno())
+        os.replace(temporary_path, path)
+
+    def _open(self):
+        self._file = open(self.path, 'r+b' if self.writable else 'rb')
+        access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+        self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+        magic, version, self.capacity, self._count = _HEADER.unpack_from(self._map)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise ValueError('{0} is not a version {1} fingerprint index.'.format(self.path, INDEX_VERSION))
+        self._slots = memoryview(self._map)[_HEADER.size:].cast('Q')
+
+    def get_wave(self, fingerprint):
+        """
+        Returns the id of the wave that first recorded a fingerprint, or None if it is not indexed.
+        """
+        if not self.capacity:
+            return None
+        slot = _find_slot(self._slots, self.capacity, fingerprint)
+        if self._slots[2 * slot] == 0:
+            return None
+        return self._slots[2 * slot + 1]
+
+    def _entries(self):
+        for slot in range(self.capacity):
+            if self._slots[2 * slot]:
+                yield self._slots[2 * slot], self._slots[2 * slot + 1]
+
+    def _reserve(self, additional):
+        capacity = self.capacity
+        while self._count + additional > capacity * INDEX_MAX_LOAD:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        self._create(self.path, capacity, self._entries())
+        self.close()
+        self._open()
+
+    def update(self, fingerprints, wave_id=1):
+        """
+        Records fingerprints for a wave and returns how many were new. Fingerprints already in the
+        index keep their first wave.
+        """
+        if not self.writable:
+            raise ValueError('The fingerprint index {0} was opened read-only.'.format(self.path))
+        fingerprints = set(fingerprints)
+        self._reserve(len(fingerprints))
+        added = sum(_insert(self._slots, self.capacity, fingerprint, wave_id) for fingerprint in fingerprints)
+        self._count += added
+        _HEADER.pack_into(self._map, 0, INDEX_MAGIC, INDEX_VERSION, self.capacity, self._count)
+        return added
+
+    def close(self):
+        """
+        Flushes and closes the index file.
+        """
+        if self._slots is not None:
+            self._slots.release()
+            self._slots = None
+        if self._map is not None:
+            if self.writable:
+                self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def is_indexed_feedback(ballot):
+    """
+    Returns True for ballots whose feedback is recorded in and looked up from the index: feedback
+    longer than three words, since short answers recur across waves without being scripted.
+    """
+    return not risk.is_short_feedback(ballot)
+
+
+def check_previous_waves(ballots, index_path, wave_label=None, progress=None):
+    """
+    Increases risk score if a ballot's feedback matches, for the same selected actor, a comment
+    recorded in the fingerprint index by another wave. Not one of the default assessments; add it
+    with :func:`functools.partial` to pass the index path and the current wave's label.
+    """
+    wave_id = get_wave_id(wave_label) if wave_label is not None else None
+    with FingerprintIndex(index_path) as index:
+        if not len(index):
+            return
+        for ballot in risk.track_scoring(progress, check_previous_waves, ballots):
+            if not is_indexed_feedback(ballot):
+                continue
+            recorded_wave_id = index.get_wave(get_ballot_fingerprint(ballot))
+            if recorded_wave_id is not None and recorded_wave_id != wave_id:
+                ballot.update_score(risk.PREVIOUS_WAVE_WEIGHT)
+                ballot.add_flag(risk.PREVIOUS_WAVE)
+
+
+def record_wave(ballots, index_path, wave_label=None):
+    """
+    Appends the fingerprints of the ballots' feedback to the index, creating it if needed, and
+    returns how many were new. Call it after the wave is scored.
+    """
+    wave_id = get_wave_id(wave_label) if wave_label is not None else 1
+    fingerprints = [get_ballot_fingerprint(ballot) for ballot in ballots if is_indexed_feedback(ballot)]
+    with FingerprintIndex(index_path, writable=True) as index:
+        return index.update(fingerprints, wave_id)
@@ -0,0 +1,265 @@
+"""
+Watermarked incremental re-runs over a workbook that only grows.
+
+A JSON state file records the last processed workbook row, the last ballot id, the latest
+timestamp, the byte offset in the ballots CSV where the *context* rows start, the context
+ballots themselves and the earliest timestamp of every (selected actor, raw feedback) group.
+The context holds every ballot from the first one with a timestamp within
+:data:`CONTEXT_WINDOWS` chain windows of the latest timestamp, which is all that chain
+stuffing detection needs near the boundary. Duplicate detection only needs the earliest
+timestamps.
+
+On a later run only the new rows are loaded, only context ballots within one window of the
+new ballots are rescored along with the new ballots, and the CSV is truncated at the context
+offset and rewritten from there. If new ballots are older than the context allows, the caller
+should fall back to a full run.
+
+The CSV only keeps normalized feedback, so the original feedback of every ballot, which the
+charts are drawn from, is appended to a JSON lines file next to it (see
+:func:`get_feedback_path`); the state records its end offset.
+
+Attributes:
+    STATE_VERSION (int): Version of the state file layout.
+    CONTEXT_WINDOWS (int): How many ``BALLOT_TIME_CUTOFF`` windows before the latest timestamp
+        are kept as context.
+"""
+import csv
+from datetime import datetime
+import json
+import os
+import pytz
+from . import risk
+from .classes import Ballot, Store
+from .records import ballot_to_record, record_to_ballot
+
+STATE_VERSION = 2
+CONTEXT_WINDOWS = 3
+
+
+def load_state(state_path):
+    """
+    Returns the state dictionary saved at ``state_path``, or None if there is no usable state.
+    """
+    if not state_path or not os.path.exists(state_path):
+        return None
+    with open(state_path) as state_file:
+        state = json.load(state_file)
+    if state.get('version') != STATE_VERSION:
+        return None
+    return state
+
+
+def save_state(state_path, state):
+    """
+    Writes the state dictionary to ``state_path``, replacing the previous file atomically.
+    """
+    temporary_path = ''.join((state_path, '.tmp',))
+    with open(temporary_path, 'w') as state_file:
+        json.dump(state, state_file)
+    os.replace(temporary_path, state_path)
+
+
+def _to_epoch(timestamp):
+    return timestamp.timestamp()
+
+
+def _from_epoch(epoch):
+    return datetime.fromtimestamp(epoch, tz=pytz.utc)
+
+
+def restore_store(state, risk_assessments=None):
+    """
+    Returns a store holding the state's context ballots with their ids, scores and rule flags.
+    """
+    store = Store(risk_assessments)
+    ballots = list()
+    for record in state['context']:
+        ballot = record_to_ballot(record)
+        ballot.id = record['id']
+        ballot.score = record['score']
+        ballot.flags = record['flags']
+        ballots.append(ballot)
+    store.restore_ballots(ballots)
+    store._counter = max(store._counter, state['last_id'])
+    return store
+
+
+def get_earliest_timestamps(state):
+    """
+    Returns the state's earliest timestamp per (selected actor, raw feedback) group.
+    """
+    return {(actor, feedback): _from_epoch(epoch) for actor, feedback, epoch in state['earliest']}
+
+
+def can_apply(state, new_ballots):
+    """
+    Returns True if the new ballots are recent enough for the saved context to score them exactly.
+    """
+    if not new_ballots:
+        return True
+    earliest_new = min(_to_epoch(ballot.timestamp) for ballot in new_ballots)
+    return earliest_new - 2 * risk.BALLOT_TIME_CUTOFF >= state['context_start']
+
+
+def get_feedback_path(csv_path):
+    """
+    Returns the path of the file with the original feedback of the ballots in a ballots CSV.
+    """
+    return ''.join((os.path.splitext(csv_path)[0], '.feedback.ndjson',))
+
+
+def _write_feedback(feedback_path, ballots, offset=None):
+    """
+    Appends the ballots' ids and original feedback to the feedback file, truncated at ``offset``
+    if one is passed and created otherwise, and returns the new end offset.
+    """
+    with open(feedback_path, 'w' if offset is None else 'r+', newline='') as feedback_file:
+        if offset is not None:
+            feedback_file.seek(offset)
+            feedback_file.truncate()
+        for ballot in ballots:
+            feedback_file.write(json.dumps([ballot.id, ballot.feedback]) + '\n')
+        return feedback_file.tell()
+
+
+def _write_rows(csv_file, store, ballots, tail_start_id):
+    """
+    Writes the ballots' CSV rows and returns the file offset of the row with ``tail_start_id``.
+    """
+    ballot_writer = csv.writer(csv_file)
+    tail_offset = None
+    for ballot in ballots:
+        if ballot.id == tail_start_id:
+            tail_offset = csv_file.tell()
+        ballot_writer.writerows(store.get_rows(None, [ballot]))
+    if tail_offset is None:
+        tail_offset = csv_file.tell()
+    return tail_offset
+
+
+def _build_state(store, ballots, earliest_timestamps, last_row, latest_epoch, csv_offset, tail_start_id,
+                 feedback_offset):
+    context_start = latest_epoch - CONTEXT_WINDOWS * risk.BALLOT_TIME_CUTOFF
+    context = list()
+    for ballot in ballots:
+        if tail_start_id is not None and ballot.id >= tail_start_id:
+            record = ballot_to_record(ballot)
+            record['flags'] = ballot.flags
+            context.append(record)
+    return {
+        'version': STATE_VERSION,
+        'last_row': last_row,
+        'last_id': store._counter,
+        'last_timestamp': latest_epoch,
+        'context_start': context_start,
+        'tail_start_id': tail_start_id,
+        'csv_offset': csv_offset,
+        'feedback_offset': feedback_offset,
+        'context': context,
+        'earliest': [[actor, feedback, _to_epoch(timestamp)]
+                     for (actor, feedback), timestamp in earliest_timestamps.items()],
+    }
+
+
+def _get_tail_start_id(ballots, latest_epoch):
+    context_start = latest_epoch - CONTEXT_WINDOWS * risk.BALLOT_TIME_CUTOFF
+    tail_ids = [ballot.id for ballot in ballots if _to_epoch(ballot.timestamp) >= context_start]
+    return min(tail_ids) if tail_ids else None
+
+
+def write_full(store, csv_path, last_row):
+    """
+    Writes the CSV and the feedback file of a fully scored store and returns the state for later
+    incremental runs. ``last_row`` is the index of the first workbook row that has not been processed.
+    """
+    ballots = store.get_ballots()
+    latest_epoch = max(_to_epoch(ballot.timestamp) for ballot in ballots) if ballots else 0
+    tail_start_id = _get_tail_start_id(ballots, latest_epoch)
+    with open(csv_path, 'w', newline='') as csv_file:
+        csv_offset = _write_rows(csv_file, store, ballots, tail_start_id)
+    feedback_offset = _write_feedback(get_feedback_path(csv_path), ballots)
+    earliest_timestamps = risk.update_earliest_feedback_timestamps(ballots)
+    return _build_state(store, ballots, earliest_timestamps, last_row, latest_epoch, csv_offset, tail_start_id,
+                        feedback_offset)
+
+
+def apply_increment(state, store, csv_path):
+    """
+    Scores the new ballots of a store built with :func:`restore_store` (the ballots after the
+    context), rescores the context ballots whose chain window the new ballots reach, rewrites the
+    CSV from the context offset and returns a tuple of the new state and the set of selected
+    actors whose ballots were added or changed score.
+    """
+    ballots = store.get_ballots()
+    context_count = len(state['context'])
+    context_ballots = ballots[:context_count]
+    new_ballots = ballots[context_count:]
+    if not new_ballots:
+        return state, set()
+    earliest_timestamps = risk.update_earliest_feedback_timestamps(new_ballots, get_earliest_timestamps(state))
+    earliest_new = min(ballot.timestamp for ballot in new_ballots)
+    window_start = _to_epoch(earliest_new) - risk.BALLOT_TIME_CUTOFF
+    rescored = set(ballot.id for ballot in new_ballots)
+    previous = dict()
+    for ballot in context_ballots:
+        previous[ballot.id] = (ballot.score, ballot.flags)
+        if _to_epoch(ballot.timestamp) >= window_start:
+            rescored.add(ballot.id)
+    for ballot in ballots:
+        ballot.score = 0
+        ballot.flags = 0
+    for assessment in store.risk_assessments:
+        if assessment is risk.check_comment_duplication:
+            risk.check_comment_duplication_by_earliest(ballots, earliest_timestamps)
+        else:
+            assessment(ballots)
+    changed_actors = set(ballot.selected_actor for ballot in new_ballots)
+    for ballot in context_ballots:
+        if ballot.id not in rescored:
+            ballot.score, ballot.flags = previous[ballot.id]
+        elif previous[ballot.id] != (ballot.score, ballot.flags):
+            changed_actors.add(ballot.selected_actor)
+    latest_epoch = max(state['last_timestamp'], max(_to_epoch(ballot.timestamp) for ballot in new_ballots))
+    tail_start_id = _get_tail_start_id(ballots, latest_epoch)
+    with open(csv_path, 'r+', newline='') as csv_file:
+        csv_file.seek(state['csv_offset'])
+        csv_file.truncate()
+        csv_offset = _write_rows(csv_file, store, ballots, tail_start_id)
+    feedback_offset = _write_feedback(get_feedback_path(csv_path), new_ballots, state['feedback_offset'])
+    last_row = state['last_row'] + len(new_ballots)
+    new_state = _build_state(store, ballots, earliest_timestamps, last_row, latest_epoch, csv_offset, tail_start_id,
+                             feedback_offset)
+    return new_state, changed_actors
+
+
+def read_feedback(feedback_path):
+    """
+    Returns a dictionary of the original feedback by ballot id saved in a feedback file.
+    """
+    feedback_by_id = dict()
+    with open(feedback_path, newline='') as feedback_file:
+        for line in feedback_file:
+            ballot_id, feedback = json.loads(line)
+            feedback_by_id[ballot_id] = feedback
+    return feedback_by_id
+
+
+def read_csv_ballots(csv_path, feedback_path=None):
+    """
+    Returns ballots read back from a ballots CSV written by :meth:`~ballotbleach.classes.Store.to_csv`.
+    Feedback is the normalized feedback stored in the CSV, or the original feedback if the path of
+    a feedback file written by an incremental run is passed; timestamps are kept as text.
+    """
+    feedback_by_id = read_feedback(feedback_path) if feedback_path else dict()
+    ballots = list()
+    with open(csv_path, newline='') as csv_file:
+        for row in csv.reader(csv_file):
+            ballot_id, timestamp, subject_rating, selected_actor, feedback, score, explanation = row
+            ballot = Ballot(timestamp, int(subject_rating) if subject_rating else None, selected_actor, feedback)
+            ballot.id = int(ballot_id)
+            ballot.feedback = feedback_by_id.get(ballot.id, ballot.feedback)
+            ballot.score = int(score)
+            for name in explanation.split('+') if explanation else []:
+                ballot.add_explanation(name)
+            ballots.append(ballot)
+    return ballots
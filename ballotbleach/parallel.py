@@ -0,0 +1,75 @@
+"""
+Actor-partitioned parallel risk scoring.
+
+The default risk assessments only compare ballots that share a ``selected_actor``
+(chain stuffing and comment duplication) or look at one ballot at a time (verbosity
+and completion), so scoring each actor's ballots separately gives the same result
+as scoring the whole store. Custom assessments that compare ballots across actors
+should not be scored in parallel.
+
+Attributes:
+    PARTITIONS_PER_WORKER (int): How many partitions are prepared for each worker process,
+        so that one large actor does not leave the other workers idle.
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+from .risk import run_assessments
+
+PARTITIONS_PER_WORKER = 4
+
+
+def partition_by_actor(ballots, partition_total):
+    """
+    Returns up to ``partition_total`` lists of ballots. Each actor's ballots are kept together
+    and in their original order; actors are assigned, largest first, to the partition with the
+    fewest ballots, which keeps the partitioning deterministic.
+    """
+    ballots_by_actor = OrderedDict()
+    for ballot in ballots:
+        ballots_by_actor.setdefault(ballot.selected_actor, []).append(ballot)
+    actor_groups = sorted(ballots_by_actor.values(), key=len, reverse=True)
+    partition_total = max(1, min(partition_total, len(actor_groups)))
+    partitions = [[] for _ in range(partition_total)]
+    sizes = [(0, index) for index in range(partition_total)]
+    for actor_group in actor_groups:
+        size, index = heapq.heappop(sizes)
+        partitions[index].extend(actor_group)
+        heapq.heappush(sizes, (size + len(actor_group), index))
+    return [partition for partition in partitions if partition]
+
+
+def score_partition(risk_assessments, ballots, cutoff_score=None):
+    """
+    Runs the risk assessments on one partition in a worker process, stopping early at the cutoff
+    score if one is passed (see :func:`~ballotbleach.risk.run_assessments`). Returns a list of
+    ``(id, score, flags)`` tuples.
+    """
+    run_assessments(ballots, risk_assessments, cutoff_score)
+    return [(ballot.id, ballot.score, ballot.flags) for ballot in ballots]
+
+
+def score_risk_parallel(ballots, risk_assessments, workers, cutoff_score=None, progress=None):
+    """
+    Scores ballots in a pool of ``workers`` processes, one actor partition per task, and merges
+    the scores and rule flags back onto the passed ballots by id. Rule flags are bit positions,
+    so custom rules must be registered at import time to mean the same thing in every process.
+    If a :class:`~ballotbleach.progress.ProgressReporter` is passed, merged ballots are reported
+    as a ``score`` stage.
+    """
+    partitions = partition_by_actor(ballots, workers * PARTITIONS_PER_WORKER)
+    ballots_by_id = {ballot.id: ballot for ballot in ballots}
+    if progress is not None:
+        progress.start('score', len(ballots))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(score_partition, [risk_assessments] * len(partitions), partitions,
+                               [cutoff_score] * len(partitions))
+        for partition_results in results:
+            for ballot_id, score, flags in partition_results:
+                ballot = ballots_by_id[ballot_id]
+                ballot.score = score
+                ballot.flags = flags
+            if progress is not None:
+                progress.advance('score', len(partition_results))
+    if progress is not None:
+        progress.finish('score')
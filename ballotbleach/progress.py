@@ -0,0 +1,171 @@
+"""
+Progress reporting for long runs.
+
+Long-running steps (loading rows, each risk assessment, rendering charts) take an optional
+:class:`ProgressReporter` and report *stages*. A stage starts with an optional total, advances
+by counts of work units and finishes. Each callback receives an event dictionary with:
+
+- ``stage`` (str): The stage name, such as ``'load'``, ``'score:check_chain_stuffing'`` or ``'charts'``.
+- ``kind`` (str): ``'start'``, ``'progress'`` or ``'finish'``.
+- ``done`` (int) and ``total`` (int or None): Units done and expected.
+- ``elapsed`` (float): Seconds since the stage started.
+- ``rate`` (float or None): Units per second so far.
+- ``eta`` (float or None): Estimated seconds left, if the total is known.
+
+Progress events are rate-limited to one per stage per ``interval_seconds``, and callers advance
+in batches (see :func:`iterate` and :func:`track`), so reporting costs little compared to the
+work itself.
+
+Attributes:
+    PROGRESS_INTERVAL_SECONDS (float): The shortest time between two progress events of a stage.
+        Default is 0.5.
+    PROGRESS_BATCH_SIZE (int): The number of items :func:`iterate` counts before advancing.
+        Default is 1000.
+"""
+import sys
+import time
+from datetime import timedelta
+
+PROGRESS_INTERVAL_SECONDS = 0.5
+PROGRESS_BATCH_SIZE = 1000
+
+
+class ProgressReporter(object):
+    """
+    Tracks stages of work and passes progress events to callbacks.
+
+    Attributes:
+        callbacks (list): Functions called with each event dictionary.
+        interval_seconds (float): The shortest time between two progress events of a stage.
+    """
+    def __init__(self, callbacks=None, interval_seconds=PROGRESS_INTERVAL_SECONDS):
+        self.callbacks = list(callbacks or [])
+        self.interval_seconds = interval_seconds
+        self._stages = dict()
+
+    def add_callback(self, callback):
+        """
+        Adds a function to be called with each event dictionary.
+        """
+        self.callbacks.append(callback)
+
+    def start(self, stage, total=None):
+        """
+        Starts (or restarts) a stage with an optional total number of units.
+        """
+        now = time.monotonic()
+        self._stages[stage] = {'done': 0, 'total': total, 'started': now, 'reported': now}
+        self._report(stage, 'start', now)
+
+    def advance(self, stage, count=1):
+        """
+        Adds ``count`` done units to a stage. An event is sent only if the last one for the stage
+        is at least ``interval_seconds`` old.
+        """
+        state = self._stages[stage]
+        state['done'] += count
+        now = time.monotonic()
+        if now - state['reported'] >= self.interval_seconds:
+            self._report(stage, 'progress', now)
+
+    def finish(self, stage):
+        """
+        Finishes a stage and sends its final event.
+        """
+        self._report(stage, 'finish', time.monotonic())
+        del self._stages[stage]
+
+    def get_event(self, stage, kind, now=None):
+        """
+        Returns the event dictionary for the current state of a stage.
+        """
+        state = self._stages[stage]
+        now = time.monotonic() if now is None else now
+        elapsed = now - state['started']
+        rate = state['done'] / elapsed if elapsed > 0 else None
+        eta = None
+        if rate and state['total'] is not None:
+            eta = max(state['total'] - state['done'], 0) / rate
+        return {
+            'stage': stage,
+            'kind': kind,
+            'done': state['done'],
+            'total': state['total'],
+            'elapsed': elapsed,
+            'rate': rate,
+            'eta': eta,
+        }
+
+    def _report(self, stage, kind, now):
+        self._stages[stage]['reported'] = now
+        if not self.callbacks:
+            return
+        event = self.get_event(stage, kind, now)
+        for callback in self.callbacks:
+            callback(event)
+
+
+def track(progress, stage, iterable, batch_size=PROGRESS_BATCH_SIZE):
+    """
+    Yields the items of an iterable, advancing a started stage once per ``batch_size`` items.
+    With no reporter, the items are yielded unchanged.
+    """
+    if progress is None:
+        for item in iterable:
+            yield item
+        return
+    pending = 0
+    for item in iterable:
+        yield item
+        pending += 1
+        if pending == batch_size:
+            progress.advance(stage, pending)
+            pending = 0
+    if pending:
+        progress.advance(stage, pending)
+
+
+def iterate(progress, stage, iterable, total=None, batch_size=PROGRESS_BATCH_SIZE):
+    """
+    Yields the items of an iterable inside a stage, advancing it once per ``batch_size`` items.
+    With no reporter, the items are yielded unchanged.
+    """
+    if progress is None:
+        for item in iterable:
+            yield item
+        return
+    progress.start(stage, total)
+    for item in track(progress, stage, iterable, batch_size):
+        yield item
+    progress.finish(stage)
+
+
+def format_event(event):
+    """
+    Returns a one-line description of an event, such as
+    ``'load: 12000/50000 (24%) 3400/s ETA 0:00:11'``.
+    """
+    parts = ['{0}:'.format(event['stage'])]
+    if event['total']:
+        parts.append('{0}/{1} ({2:.0%})'.format(event['done'], event['total'], event['done'] / event['total']))
+    else:
+        parts.append(str(event['done']))
+    if event['rate'] is not None:
+        parts.append('{0:.0f}/s'.format(event['rate']))
+    if event['kind'] == 'finish':
+        parts.append('done in {0}'.format(timedelta(seconds=round(event['elapsed']))))
+    elif event['eta'] is not None:
+        parts.append('ETA {0}'.format(timedelta(seconds=round(event['eta']))))
+    return ' '.join(parts)
+
+
+def print_event(event, stream=None):
+    """
+    Writes an event to ``stream`` (standard error by default) as a line of :func:`format_event`.
+    Start events are skipped.
+    """
+    if event['kind'] == 'start':
+        return
+    stream = sys.stderr if stream is None else stream
+    stream.write(format_event(event) + '\n')
+    stream.flush()
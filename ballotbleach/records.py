@@ -0,0 +1,56 @@
+"""
+Conversion between :class:`~ballotbleach.classes.Ballot` objects and plain dictionary records,
+as used for JSON input and output.
+
+Attributes:
+    RECORD_TIMEZONE_NAME (str): Timezone applied to record timestamps without one. Default is 'UTC'.
+"""
+from datetime import datetime
+from dateutil import parser as date_parser
+import pytz
+from .classes import Ballot
+
+RECORD_TIMEZONE_NAME = 'UTC'
+
+
+def parse_timestamp(value, tz_name=RECORD_TIMEZONE_NAME):
+    """
+    Returns a timezone-aware datetime from an epoch number (seconds) or an ISO 8601 string.
+    Naive values are localized to ``tz_name``.
+    """
+    if isinstance(value, datetime):
+        timestamp = value
+    elif isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=pytz.utc)
+    else:
+        timestamp = date_parser.parse(value)
+    if timestamp.tzinfo is None:
+        timestamp = pytz.timezone(tz_name).localize(timestamp)
+    return timestamp
+
+
+def record_to_ballot(record, tz_name=RECORD_TIMEZONE_NAME):
+    """
+    Creates a :class:`~ballotbleach.classes.Ballot` from a dictionary with a 'timestamp' key and
+    optional 'subject_rating', 'selected_actor' and 'feedback' keys.
+    """
+    subject_rating = record.get('subject_rating')
+    subject_rating = int(subject_rating) if subject_rating else None
+    selected_actor = record.get('selected_actor') or 'None'
+    return Ballot(parse_timestamp(record['timestamp'], tz_name), subject_rating, selected_actor,
+                  record.get('feedback'))
+
+
+def ballot_to_record(ballot):
+    """
+    Returns a JSON-serializable dictionary with the ballot's fields, risk score and explanation.
+    """
+    return {
+        'id': ballot.id,
+        'timestamp': ballot.timestamp.isoformat(),
+        'subject_rating': ballot.subject_rating,
+        'selected_actor': ballot.selected_actor,
+        'feedback': ballot.feedback,
+        'score': ballot.score,
+        'explanation': ballot.explanation,
+    }
@@ -1,9 +1,91 @@
+from bisect import bisect_left, bisect_right
+from collections import deque
 from datetime import datetime, timedelta
+import inspect
+import math
 import re
+from .progress import track
+from .sketch import ExpiringCountMin
 
 # In seconds. So, 420 is 7 minutes.
 BALLOT_TIME_CUTOFF = 420
 
+# Risk points added by each rule.
+CHAIN_EMPTY_WEIGHT = 100
+CHAIN_FEEDBACK_WEIGHT = 20
+SHORT_FEEDBACK_WEIGHT = 25
+INCOMPLETE_WEIGHT = 50
+DUPLICATE_WEIGHT = 75
+BURST_WEIGHT = 50
+PREVIOUS_WAVE_WEIGHT = 75
+
+# Submission burst detection (not a default assessment). Timestamps are binned
+# per actor; a bin is a burst when it holds at least BURST_MIN_COUNT ballots and
+# exceeds the mean of the previous BURST_BASELINE_BINS bins by BURST_SENSITIVITY
+# Poisson standard deviations.
+BURST_BIN_SECONDS = 300
+BURST_BASELINE_BINS = 12
+BURST_SENSITIVITY = 4.0
+BURST_MIN_COUNT = 10
+
+# Streaming chain stuffing detection (not a default assessment). Empty-feedback
+# ballots are counted per actor in an expiring count-min sketch of time buckets
+# of STREAM_BUCKET_SECONDS, each a STREAM_SKETCH_DEPTH x STREAM_SKETCH_WIDTH table.
+STREAM_BUCKET_SECONDS = 30
+STREAM_SKETCH_WIDTH = 1024
+STREAM_SKETCH_DEPTH = 4
+
+# Rule names in registration order. A rule's flag is the bit at its index, so a
+# ballot's rule hits fit in one integer and render in this order. Flags are stored
+# in exports and state files, so new rules must be registered after existing ones.
+RULE_NAMES = []
+_RULE_FLAGS = {}
+
+
+def register_rule(name):
+    """
+    Registers a risk rule name and returns its bit flag. Registering a name twice
+    returns the existing flag.
+    """
+    if name not in _RULE_FLAGS:
+        _RULE_FLAGS[name] = 1 << len(RULE_NAMES)
+        RULE_NAMES.append(name)
+    return _RULE_FLAGS[name]
+
+
+def get_rule_flag(name):
+    """
+    Returns the bit flag for a rule name, registering the rule if it is new.
+    """
+    flag = _RULE_FLAGS.get(name)
+    if flag is None:
+        flag = register_rule(name)
+    return flag
+
+
+def render_flags(flags):
+    """
+    Returns the '+'-joined names of the rules set in ``flags``, in registration order.
+    """
+    if not flags:
+        return ''
+    names = []
+    for index, name in enumerate(RULE_NAMES):
+        if flags & (1 << index):
+            names.append(name)
+    return '+'.join(names)
+
+
+CHAIN = register_rule('chain')
+SHORT_FEEDBACK = register_rule('short-feedback')
+INCOMPLETE_RATING = register_rule('incomplete-rating')
+INCOMPLETE_FEEDBACK = register_rule('incomplete-feedback')
+DUPLICATE = register_rule('duplicate')
+BURST = register_rule('burst')
+# Set when scoring stopped early because the ballot had already crossed the risk cutoff.
+TRUNCATED = register_rule('truncated')
+PREVIOUS_WAVE = register_rule('previous-wave')
+
 
 def is_near(timestamp, start, stop):
     if start <= timestamp <= stop:
@@ -29,27 +111,6 @@ def get_near_cutoffs(base, cutoff):
     return start, stop
 
 
-def get_comparison_ballots(ballot, ballots):
-    other_ballots = list(ballots)
-    other_ballots.remove(ballot)
-    return other_ballots
-
-
-def get_near_ballots(ballot, ballots, cutoff):
-    """
-    Returns a list of comparison ballots that were created within a
-    specified time interval before and after the creation of a "baseline" ballot
-    """
-    near_ballots = []
-    other_ballots = list(ballots)
-    other_ballots.remove(ballot)
-    start, stop = get_near_cutoffs(ballot.timestamp, cutoff)
-    for other_ballot in other_ballots:
-        if is_near(other_ballot.timestamp, start, stop):
-            near_ballots.append(other_ballot)
-    return near_ballots
-
-
 def has_empty_sibling_batch(ballot, comparison_ballots, qualifying_length=2):
     """
     Checks for ballots with the same 'selected_actor' answer and empty
@@ -69,65 +130,373 @@ def has_empty_sibling_batch(ballot, comparison_ballots, qualifying_length=2):
         return False
 
 
-def check_chain_stuffing(ballots):
+def get_empty_feedback_timestamps(ballots):
+    """
+    Returns a dictionary mapping each (truthy) selected actor to the sorted timestamps of its
+    ballots with empty feedback.
+    """
+    empty_timestamps = {}
+    for ballot in ballots:
+        if ballot.selected_actor and len(ballot.feedback) == 0:
+            empty_timestamps.setdefault(ballot.selected_actor, []).append(ballot.timestamp)
+    for timestamps in empty_timestamps.values():
+        timestamps.sort()
+    return empty_timestamps
+
+
+def count_empty_siblings(ballot, empty_timestamps, cutoff):
+    """
+    Returns the number of *other* ballots with the same selected actor and empty feedback that
+    were created within ``cutoff`` seconds of the ballot. Matches the batch built by
+    :func:`has_empty_sibling_batch` over the other ballots within ``cutoff`` seconds, in O(log n)
+    per ballot.
+    """
+    timestamps = empty_timestamps.get(ballot.selected_actor)
+    if not ballot.selected_actor or not timestamps:
+        return 0
+    start, stop = get_near_cutoffs(ballot.timestamp, cutoff)
+    sibling_count = bisect_right(timestamps, stop) - bisect_left(timestamps, start)
+    if len(ballot.feedback) == 0:
+        sibling_count -= 1
+    return sibling_count
+
+
+def check_chain_stuffing(ballots, targets=None, progress=None):
     """
     Increases the risk score for a ballot if it is member of a
     pattern of similar ballots submitted in a suspiciously short
-    amount of time.
+    amount of time. If a list of target ballots is passed, only those
+    are scored, still compared with all of the passed ballots.
     """
-    for ballot in ballots:
+    empty_timestamps = get_empty_feedback_timestamps(ballots)
+    for ballot in track_scoring(progress, check_chain_stuffing, ballots if targets is None else targets):
         risk_increment = 0
-        near_ballots = get_near_ballots(ballot, ballots, BALLOT_TIME_CUTOFF)
-        if has_empty_sibling_batch(ballot, near_ballots):
-            risk_increment = 100 if len(ballot.raw_feedback) == 0 else 20
+        if count_empty_siblings(ballot, empty_timestamps, BALLOT_TIME_CUTOFF) >= 2:
+            risk_increment = CHAIN_EMPTY_WEIGHT if len(ballot.raw_feedback) == 0 else CHAIN_FEEDBACK_WEIGHT
         if risk_increment > 0:
             ballot.update_score(risk_increment)
-            ballot.add_explanation('chain')
+            ballot.add_flag(CHAIN)
 
 
-def check_verbosity(ballots):
+def get_chain_sketch(bucket_seconds=None, width=None, depth=None, cutoff=BALLOT_TIME_CUTOFF):
+    """
+    Returns an empty :class:`~ballotbleach.sketch.ExpiringCountMin` with enough buckets to answer
+    chain window queries of ``cutoff`` seconds on either side of a ballot. Unset arguments use the
+    ``STREAM_*`` module settings.
+    """
+    bucket_seconds = bucket_seconds or STREAM_BUCKET_SECONDS
+    bucket_count = int(2 * cutoff // bucket_seconds) + 2
+    return ExpiringCountMin(bucket_seconds, bucket_count, width or STREAM_SKETCH_WIDTH,
+                            depth or STREAM_SKETCH_DEPTH)
+
+
+def _score_chain_estimate(ballot, seconds, chain_sketch, cutoff):
+    if not ballot.selected_actor:
+        return
+    sibling_count = chain_sketch.estimate(ballot.selected_actor, seconds - cutoff, seconds + cutoff)
+    if len(ballot.feedback) == 0:
+        sibling_count -= 1
+    if sibling_count >= 2:
+        ballot.update_score(CHAIN_EMPTY_WEIGHT if len(ballot.raw_feedback) == 0 else CHAIN_FEEDBACK_WEIGHT)
+        ballot.add_flag(CHAIN)
+
+
+def stream_chain_stuffing(ballots, bucket_seconds=None, width=None, depth=None):
+    """
+    Streaming variant of :func:`check_chain_stuffing` for an iterable of ballots in timestamp order.
+    Yields each ballot, scored, once the stream has moved :data:`BALLOT_TIME_CUTOFF` seconds past it.
+
+    The per-actor counts of empty-feedback ballots live in a fixed-size sketch (see
+    :func:`get_chain_sketch`) instead of a list of timestamps per actor; only the ballots awaiting
+    the end of their window are held. A sibling count never falls below the exact count of
+    :func:`has_empty_sibling_batch`, so every ballot the exact rule flags is flagged. A ballot can be
+    flagged when the exact rule would not: its count may include empty-feedback ballots of the
+    same actor up to ``bucket_seconds`` outside its window, and, with probability at most
+    ``exp(-depth)``, up to ``e / width`` times the empty-feedback ballots of all actors in the window.
+
+    Raises:
+        ValueError: If a ballot is older than the one before it.
+    """
+    chain_sketch = get_chain_sketch(bucket_seconds, width, depth)
+    pending = deque()
+    last_seconds = None
+    for ballot in ballots:
+        seconds = ballot.timestamp.timestamp()
+        if last_seconds is not None and seconds < last_seconds:
+            raise ValueError('Streaming chain detection needs ballots in timestamp order; '
+                             'ballot {0} is out of order.'.format(ballot.id))
+        last_seconds = seconds
+        while pending and pending[0][0] + BALLOT_TIME_CUTOFF < seconds:
+            pending_seconds, pending_ballot = pending.popleft()
+            _score_chain_estimate(pending_ballot, pending_seconds, chain_sketch, BALLOT_TIME_CUTOFF)
+            yield pending_ballot
+        if ballot.selected_actor and len(ballot.feedback) == 0:
+            chain_sketch.add(ballot.selected_actor, seconds)
+        pending.append((seconds, ballot))
+    while pending:
+        pending_seconds, pending_ballot = pending.popleft()
+        _score_chain_estimate(pending_ballot, pending_seconds, chain_sketch, BALLOT_TIME_CUTOFF)
+        yield pending_ballot
+
+
+def check_chain_stuffing_streaming(ballots, bucket_seconds=None, width=None, depth=None, progress=None):
+    """
+    Scores a list of ballots with :func:`stream_chain_stuffing`, in timestamp order. Not one of the
+    default assessments; use it in place of :func:`check_chain_stuffing`, with
+    :func:`functools.partial` to change the sketch size.
+    """
+    ordered_ballots = sorted(ballots, key=lambda ballot: ballot.timestamp)
+    for ballot in track_scoring(progress, check_chain_stuffing_streaming,
+                                stream_chain_stuffing(ordered_ballots, bucket_seconds, width, depth)):
+        pass
+
+
+def is_short_feedback(ballot):
+    """
+    Returns True if the ballot's feedback is empty or three words or less.
+    """
+    if ballot.raw_feedback:
+        word_count = len(re.findall(r'[\w]+', ballot.feedback))
+        if word_count > 3:
+            return False
+    return True
+
+
+def check_verbosity(ballots, progress=None):
     """
     Increases risk score if a ballot has feedback that
     is three words or less.
     """
-    for ballot in ballots:
-        if ballot.raw_feedback:
-            word_count = len(re.findall(r'[\w]+', ballot.feedback))
-            if word_count > 3:
-                continue
-        ballot.update_score(25)
-        ballot.add_explanation('short-feedback')
+    for ballot in track_scoring(progress, check_verbosity, ballots):
+        if is_short_feedback(ballot):
+            ballot.update_score(SHORT_FEEDBACK_WEIGHT)
+            ballot.add_flag(SHORT_FEEDBACK)
 
 
 
-def check_completion(ballots):
+def check_completion(ballots, progress=None):
     """
     Increases risk score if a ballot is missing either the subject rating
     or feedback.
     """
-    for ballot in ballots:
+    for ballot in track_scoring(progress, check_completion, ballots):
         if not ballot.subject_rating:
-            ballot.update_score(50)
-            ballot.add_explanation('incomplete-rating')
+            ballot.update_score(INCOMPLETE_WEIGHT)
+            ballot.add_flag(INCOMPLETE_RATING)
         if not ballot.raw_feedback:
-            ballot.update_score(50)
-            ballot.add_explanation('incomplete-feedback')
+            ballot.update_score(INCOMPLETE_WEIGHT)
+            ballot.add_flag(INCOMPLETE_FEEDBACK)
 
 
-def check_comment_duplication(ballots):
+def check_comment_duplication(ballots, targets=None, progress=None):
     """
     Increases risk score if a ballot's feedback matches the
-    content of a different ballot submitted at a later point for the same selected actor.
+    content of a different ballot submitted at an earlier point for the same selected actor.
+    If a list of target ballots is passed, only those are scored, still compared with all
+    of the passed ballots.
+    """
+    earliest_timestamps = update_earliest_feedback_timestamps(ballots)
+    check_comment_duplication_by_earliest(track_scoring(progress, check_comment_duplication,
+                                                        ballots if targets is None else targets),
+                                          earliest_timestamps)
+
+
+def get_feedback_key(ballot):
+    """
+    Returns the (selected actor, raw feedback) key used to group duplicate comments.
     """
+    return ballot.selected_actor, ballot.raw_feedback
+
+
+def update_earliest_feedback_timestamps(ballots, earliest_timestamps=None):
+    """
+    Returns a dictionary mapping each (selected actor, raw feedback) key to the earliest timestamp
+    seen for it. If a dictionary is passed, it is updated in place with the passed ballots.
+    """
+    if earliest_timestamps is None:
+        earliest_timestamps = {}
     for ballot in ballots:
         if ballot.raw_feedback:
-            other_ballots = get_comparison_ballots(ballot, ballots)
-            for comparison_ballot in other_ballots:
-                if ballot.raw_feedback == comparison_ballot.raw_feedback \
-                        and ballot.selected_actor == comparison_ballot.selected_actor \
-                        and ballot.timestamp > comparison_ballot.timestamp:
-                    ballot.update_score(75)
-                    ballot.add_explanation('duplicate')
-                    break
+            key = get_feedback_key(ballot)
+            earliest = earliest_timestamps.get(key)
+            if earliest is None or ballot.timestamp < earliest:
+                earliest_timestamps[key] = ballot.timestamp
+    return earliest_timestamps
+
+
+def check_comment_duplication_by_earliest(ballots, earliest_timestamps):
+    """
+    Same rule as :func:`check_comment_duplication`, but compares each ballot with a map of the
+    earliest timestamp per (selected actor, raw feedback) key instead of with the other ballots.
+    The map may cover ballots that are not passed, such as earlier runs or other shards.
+    """
+    for ballot in ballots:
+        if ballot.raw_feedback:
+            earliest = earliest_timestamps.get(get_feedback_key(ballot))
+            if earliest is not None and earliest < ballot.timestamp:
+                ballot.update_score(DUPLICATE_WEIGHT)
+                ballot.add_flag(DUPLICATE)
+
+
+def get_time_bin(timestamp, bin_seconds):
+    """
+    Returns the index of the fixed-width time bin holding a timestamp.
+    """
+    return int(timestamp.timestamp() // bin_seconds)
+
+
+def get_burst_bins(ballots, bin_seconds=None, baseline_bins=None, sensitivity=None, min_count=None):
+    """
+    Returns the set of (selected actor, time bin) pairs whose submission count is anomalous compared
+    with a rolling baseline: the mean count of the actor's previous ``baseline_bins`` bins, empty bins
+    included. Counting is a single pass over the ballots; only the distinct bins of each actor are
+    sorted. Unset arguments use the ``BURST_*`` module settings.
+    """
+    bin_seconds = bin_seconds or BURST_BIN_SECONDS
+    baseline_bins = baseline_bins or BURST_BASELINE_BINS
+    sensitivity = BURST_SENSITIVITY if sensitivity is None else sensitivity
+    min_count = BURST_MIN_COUNT if min_count is None else min_count
+    bin_counts = {}
+    for ballot in ballots:
+        key = (ballot.selected_actor, get_time_bin(ballot.timestamp, bin_seconds))
+        bin_counts[key] = bin_counts.get(key, 0) + 1
+    bins_by_actor = {}
+    for (selected_actor, time_bin), count in bin_counts.items():
+        bins_by_actor.setdefault(selected_actor, []).append((time_bin, count))
+    burst_bins = set()
+    for selected_actor, actor_bins in bins_by_actor.items():
+        actor_bins.sort()
+        window = deque()
+        window_total = 0
+        for time_bin, count in actor_bins:
+            while window and window[0][0] < time_bin - baseline_bins:
+                window_total -= window.popleft()[1]
+            baseline = window_total / baseline_bins
+            if count >= min_count and count > baseline + sensitivity * math.sqrt(max(baseline, 1)):
+                burst_bins.add((selected_actor, time_bin))
+            window.append((time_bin, count))
+            window_total += count
+    return burst_bins
+
+
+def check_submission_bursts(ballots, bin_seconds=None, baseline_bins=None, sensitivity=None, min_count=None,
+                            targets=None, progress=None):
+    """
+    Increases risk score if a ballot was submitted for its selected actor during a statistically
+    anomalous burst of submissions (see :func:`get_burst_bins`). Not one of the default
+    assessments; add it to a store's ``risk_assessments``, with :func:`functools.partial` to
+    change the bin width or sensitivity. If a list of target ballots is passed, only those are
+    scored, with bursts counted over all of the passed ballots.
+    """
+    bin_seconds = bin_seconds or BURST_BIN_SECONDS
+    burst_bins = get_burst_bins(ballots, bin_seconds, baseline_bins, sensitivity, min_count)
+    for ballot in track_scoring(progress, check_submission_bursts, ballots if targets is None else targets):
+        if (ballot.selected_actor, get_time_bin(ballot.timestamp, bin_seconds)) in burst_bins:
+            ballot.update_score(BURST_WEIGHT)
+            ballot.add_flag(BURST)
 
 
+# Relative cost of the built-in assessments, cheapest first, used to order them when scoring
+# stops at a cutoff. Assessments that compare ballots accept a ``targets`` list to score.
+ASSESSMENT_COSTS = {
+    check_completion: 1,
+    check_verbosity: 2,
+    check_chain_stuffing: 3,
+    check_submission_bursts: 4,
+    check_comment_duplication: 5,
+}
+TARGETED_ASSESSMENTS = (check_chain_stuffing, check_comment_duplication, check_submission_bursts)
+
+
+def get_assessment_cost(assessment):
+    """
+    Returns the relative cost of a built-in assessment (or a :func:`functools.partial` of one),
+    or None for other assessments.
+    """
+    return ASSESSMENT_COSTS.get(getattr(assessment, 'func', assessment))
+
+
+def get_assessment_name(assessment):
+    """
+    Returns the function name of an assessment or of the function behind a :func:`functools.partial`.
+    """
+    function = getattr(assessment, 'func', assessment)
+    return getattr(function, '__name__', type(function).__name__)
+
+
+def get_score_stage(assessment):
+    """
+    Returns the progress stage name of an assessment, such as ``'score:check_completion'``.
+    """
+    return 'score:{0}'.format(get_assessment_name(assessment))
+
+
+def track_scoring(progress, assessment, ballots):
+    """
+    Yields the ballots an assessment scores, advancing its progress stage in batches. Assessments
+    that take a ``progress`` keyword argument use it in their per-ballot loop.
+    """
+    return track(progress, get_score_stage(assessment), ballots)
+
+
+def accepts_progress(assessment):
+    """
+    Returns True if an assessment takes a ``progress`` keyword argument.
+    """
+    try:
+        return 'progress' in inspect.signature(assessment).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _run_assessment(assessment, ballots, targets, progress):
+    keywords = dict()
+    if progress is not None:
+        stage = get_score_stage(assessment)
+        progress.start(stage, len(targets))
+        if accepts_progress(assessment):
+            keywords['progress'] = progress
+    if targets is ballots:
+        assessment(ballots, **keywords)
+    elif getattr(assessment, 'func', assessment) in TARGETED_ASSESSMENTS:
+        assessment(ballots, targets=targets, **keywords)
+    else:
+        assessment(targets, **keywords)
+    if progress is not None:
+        if not keywords:
+            progress.advance(stage, len(targets))
+        progress.finish(stage)
+
+
+def run_assessments(ballots, risk_assessments, cutoff_score=None, progress=None):
+    """
+    Runs the risk assessments on the ballots. If a cutoff score is passed, the built-in
+    assessments run from cheapest to most expensive and a ballot that reaches the cutoff is left
+    out of the remaining ones and flagged as *truncated*; assessments that compare ballots still
+    see every ballot. Scores only grow, so the ballots under the cutoff, and their scores and
+    explanations, are the same as with a full run. Other assessments run last on every ballot.
+    If a :class:`~ballotbleach.progress.ProgressReporter` is passed, each assessment is reported
+    as a ``score:<name>`` stage counting the ballots it scored, in batches while it runs if it
+    takes a ``progress`` keyword argument.
+    """
+    if cutoff_score is None:
+        for assessment in risk_assessments:
+            _run_assessment(assessment, ballots, ballots, progress)
+        return
+    ordered = sorted((assessment for assessment in risk_assessments if get_assessment_cost(assessment)),
+                     key=get_assessment_cost)
+    targets = ballots
+    for index, assessment in enumerate(ordered):
+        _run_assessment(assessment, ballots, targets, progress)
+        if index < len(ordered) - 1:
+            remaining = list()
+            for ballot in targets:
+                if ballot.score >= cutoff_score:
+                    ballot.add_flag(TRUNCATED)
+                else:
+                    remaining.append(ballot)
+            if len(remaining) < len(targets):
+                targets = remaining
+    for assessment in risk_assessments:
+        if not get_assessment_cost(assessment):
+            _run_assessment(assessment, ballots, ballots, progress)
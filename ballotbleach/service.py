@@ -0,0 +1,176 @@
+"""
+A long-running local scoring service that keeps a warm, in-memory
+:class:`~ballotbleach.classes.Store`.
+
+The service speaks JSON over HTTP on localhost or on a Unix socket:
+
+- ``POST /ballots`` with ``{"ballots": [{"timestamp": ..., "subject_rating": ..., "selected_actor": ...,
+  "feedback": ...}, ...]}`` adds the ballots, rescores the actors they selected and returns the scored
+  batch as ``{"ballots": [...], "changed": [...]}``. ``changed`` lists previously stored ballots whose
+  score changed because of the batch.
+- ``GET /rules`` returns the per-rule hit counts of the store.
+- ``GET /health`` returns the number of stored ballots.
+
+Attributes:
+    SERVICE_HOST (str): Default host name. Default is '127.0.0.1'.
+    SERVICE_PORT (int): Default TCP port. Default is 8642.
+"""
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+from logging import getLogger
+import os
+import socketserver
+import threading
+from .classes import Store
+from .records import RECORD_TIMEZONE_NAME, ballot_to_record, record_to_ballot
+
+logger = getLogger(__name__)
+
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8642
+
+
+class ScoringService(object):
+    """
+    Holds a store and scores batches of ballot records against it. Batches are applied one at a
+    time, so the service is safe to call from the server's request threads.
+
+    Attributes:
+        store (Store): The warm ballot store.
+        tz_name (str): Timezone applied to record timestamps without one.
+    """
+    def __init__(self, store=None, tz_name=RECORD_TIMEZONE_NAME):
+        self.store = store if store is not None else Store()
+        self.tz_name = tz_name
+        self._lock = threading.Lock()
+
+    def score_batch(self, records):
+        """
+        Adds ballot records to the store, rescores the selected actors they touch and returns a
+        dictionary with the scored batch and the previously stored ballots whose score changed.
+        """
+        ballots = [record_to_ballot(record, self.tz_name) for record in records]
+        with self._lock:
+            selected_actors = list()
+            previous_scores = dict()
+            for ballot in ballots:
+                if ballot.selected_actor not in selected_actors:
+                    selected_actors.append(ballot.selected_actor)
+                    for stored_ballot in self.store.get_actor_ballots(ballot.selected_actor):
+                        previous_scores[stored_ballot.id] = (stored_ballot.score, stored_ballot.flags)
+            self.store.add_ballots(ballots)
+            self.store.rescore_actors(selected_actors)
+            changed = list()
+            for selected_actor in selected_actors:
+                for stored_ballot in self.store.get_actor_ballots(selected_actor):
+                    previous = previous_scores.get(stored_ballot.id)
+                    if previous is not None and previous != (stored_ballot.score, stored_ballot.flags):
+                        changed.append(ballot_to_record(stored_ballot))
+            return {
+                'ballots': [ballot_to_record(ballot) for ballot in ballots],
+                'changed': changed,
+            }
+
+    def get_rule_counts(self):
+        """
+        Returns the store's per-rule hit counts.
+        """
+        with self._lock:
+            return self.store.get_rule_counts()
+
+    def get_health(self):
+        """
+        Returns a dictionary with the service status and the number of stored ballots.
+        """
+        with self._lock:
+            return {'status': 'ok', 'ballots': len(self.store.get_ballots())}
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes JSON requests to the server's :class:`ScoringService`.
+    """
+    def _send_json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, self.server.service.get_health())
+        elif self.path == '/rules':
+            self._send_json(200, self.server.service.get_rule_counts())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/ballots':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            content = json.loads(self.rfile.read(length).decode('utf-8'))
+            records = content['ballots'] if isinstance(content, dict) else content
+            result = self.server.service.score_batch(records)
+        except (ValueError, KeyError, TypeError) as error:
+            self._send_json(400, {'error': str(error)})
+            return
+        self._send_json(200, result)
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return 'unix-socket'
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+class ScoringHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    Threaded HTTP server on a TCP host and port.
+    """
+    daemon_threads = True
+
+
+class ScoringUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Threaded HTTP server on a Unix socket.
+    """
+    daemon_threads = True
+
+
+def create_server(service, host=SERVICE_HOST, port=SERVICE_PORT, socket_path=None):
+    """
+    Returns a server bound to ``socket_path`` if passed, otherwise to ``host`` and ``port``.
+    Call ``serve_forever()`` on it to start handling requests.
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ScoringUnixServer(socket_path, ScoringRequestHandler)
+    else:
+        server = ScoringHTTPServer((host, port), ScoringRequestHandler)
+    server.service = service
+    return server
+
+
+def serve(store=None, host=SERVICE_HOST, port=SERVICE_PORT, socket_path=None, tz_name=RECORD_TIMEZONE_NAME):
+    """
+    Scores the passed store once, then serves it until interrupted.
+    """
+    service = ScoringService(store, tz_name)
+    service.store.score_risk()
+    server = create_server(service, host, port, socket_path)
+    logger.info('Scoring service listening on {0}'.format(socket_path or '{0}:{1}'.format(host, port)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,288 @@
+"""
+Time-sharded risk scoring for surveys too large for one machine.
+
+A survey is split into shards covering consecutive time ranges with about the same number of
+ballots. Each shard file also carries a *halo*: the ballots within
+:data:`~ballotbleach.risk.BALLOT_TIME_CUTOFF` seconds on either side of its range, so chain
+stuffing is checked exactly at the boundaries. Scoring then takes two rounds that can run on
+separate nodes or processes:
+
+1. :func:`summarize_shard` writes the earliest timestamp of every (selected actor, raw feedback)
+   group among the shard's own ballots to a small summary file.
+2. :func:`score_shard` reads every shard's summary, so duplicates are found across shards, scores
+   the shard's own ballots and writes them as CSV rows.
+
+:func:`merge_shards` then merges the shard CSV files by id into the same ``ballots.csv`` that
+:meth:`~ballotbleach.classes.Store.to_csv` writes for a single-node run. Shards are scored with
+the default risk assessments.
+
+Every split gets a random id, written in each shard header and summary and in a manifest listing
+its shards, so files left over from an earlier split are never scored or merged with it.
+
+Attributes:
+    SHARD_VERSION (int): Version of the shard, summary and manifest file layouts.
+    SHARD_MANIFEST_NAME (str): The file name of the manifest in the shard directory.
+    SHARD_EXTENSIONS (tuple): The extensions of the shard files, summaries and scored shards.
+"""
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from datetime import timedelta
+import heapq
+import json
+import os
+import re
+import uuid
+from . import risk
+from .classes import Store
+from .records import ballot_to_record, parse_timestamp, record_to_ballot
+
+SHARD_VERSION = 2
+SHARD_MANIFEST_NAME = 'shards.json'
+SHARD_EXTENSIONS = ('.ndjson', '.earliest.json', '.csv')
+
+
+def get_shard_boundaries(timestamps, shard_count):
+    """
+    Returns the sorted start timestamps of shards 2 to ``shard_count`` that split the sorted
+    ``timestamps`` into ranges of about the same size. Ballots with equal timestamps stay in one
+    shard, so fewer shards may result.
+    """
+    boundaries = list()
+    for shard_index in range(1, shard_count):
+        boundary = timestamps[len(timestamps) * shard_index // shard_count]
+        if boundary > timestamps[0] and (not boundaries or boundary > boundaries[-1]):
+            boundaries.append(boundary)
+    return boundaries
+
+
+def get_shard_path(shard_directory, shard_number, extension):
+    """
+    Returns the path of a shard's file with the passed extension, such as ``'.ndjson'``.
+    """
+    return os.path.join(shard_directory, 'shard-{0}{1}'.format(shard_number, extension))
+
+
+def find_shard_files(shard_directory, extension):
+    """
+    Returns the paths of the shard files with the passed extension in a directory, in shard order.
+    """
+    pattern = re.compile(r'^shard-(\d+){0}$'.format(re.escape(extension)))
+    numbered_paths = list()
+    for file_name in os.listdir(shard_directory):
+        match = pattern.match(file_name)
+        if match:
+            numbered_paths.append((int(match.group(1)), os.path.join(shard_directory, file_name)))
+    return [path for number, path in sorted(numbered_paths)]
+
+
+def remove_shard_files(shard_directory):
+    """
+    Removes the shard files, summaries, scored shards and manifest of an earlier split.
+    """
+    for extension in SHARD_EXTENSIONS:
+        for path in find_shard_files(shard_directory, extension):
+            os.remove(path)
+    manifest_path = os.path.join(shard_directory, SHARD_MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+
+def get_split_files(shard_directory, extension):
+    """
+    Returns the paths of the files with the passed extension of the shards listed in the manifest
+    of the last split, in shard order.
+
+    Raises:
+        ValueError: If there is no manifest or one of the files is missing.
+    """
+    manifest_path = os.path.join(shard_directory, SHARD_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise ValueError('No shard manifest in {0}; run shard-split first.'.format(shard_directory))
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest.get('version') != SHARD_VERSION:
+        raise ValueError('Unsupported shard manifest version in {0}.'.format(manifest_path))
+    paths = [get_shard_path(shard_directory, shard_number, extension)
+             for shard_number in range(1, manifest['shard_count'] + 1)]
+    missing = [os.path.basename(path) for path in paths if not os.path.exists(path)]
+    if missing:
+        raise ValueError('Missing shard files in {0}: {1}'.format(shard_directory, ', '.join(missing)))
+    return paths
+
+
+def split_shards(ballots, shard_count, shard_directory):
+    """
+    Writes the ballots, which must have ids, to up to ``shard_count`` shard files of JSON lines and
+    a manifest, and returns the shard paths. Files of an earlier split in the directory are
+    removed. The first line of a shard holds its split id, shard count and time range; each ballot
+    record has a ``halo`` key that is true for ballots belonging to a neighbouring shard.
+
+    Raises:
+        ValueError: If a ballot timestamp has no timezone, since it could not be written and read
+            back unchanged.
+    """
+    os.makedirs(shard_directory, exist_ok=True)
+    remove_shard_files(shard_directory)
+    ordered_ballots = sorted(ballots, key=lambda ballot: ballot.timestamp)
+    timestamps = [ballot.timestamp for ballot in ordered_ballots]
+    if not timestamps:
+        return list()
+    if any(timestamp.tzinfo is None for timestamp in timestamps):
+        raise ValueError('Sharded ballots need timezone-aware timestamps.')
+    boundaries = get_shard_boundaries(timestamps, shard_count)
+    starts = [None] + boundaries
+    stops = boundaries + [None]
+    halo_delta = timedelta(seconds=risk.BALLOT_TIME_CUTOFF)
+    split_id = uuid.uuid4().hex
+    shard_paths = list()
+    for shard_number, (start, stop) in enumerate(zip(starts, stops), 1):
+        own_start = 0 if start is None else bisect_left(timestamps, start)
+        own_stop = len(timestamps) if stop is None else bisect_left(timestamps, stop)
+        halo_start = 0 if start is None else bisect_left(timestamps, start - halo_delta)
+        halo_stop = len(timestamps) if stop is None else bisect_right(timestamps, stop + halo_delta)
+        shard_path = get_shard_path(shard_directory, shard_number, '.ndjson')
+        with open(shard_path, 'w') as shard_file:
+            header = {
+                'version': SHARD_VERSION,
+                'split': split_id,
+                'shard': shard_number,
+                'shard_count': len(starts),
+                'start': start.isoformat() if start is not None else None,
+                'stop': stop.isoformat() if stop is not None else None,
+            }
+            shard_file.write(json.dumps(header) + '\n')
+            for position in range(halo_start, halo_stop):
+                record = ballot_to_record(ordered_ballots[position])
+                del record['score'], record['explanation']
+                record['halo'] = not own_start <= position < own_stop
+                shard_file.write(json.dumps(record) + '\n')
+        shard_paths.append(shard_path)
+    manifest = {'version': SHARD_VERSION, 'split': split_id, 'shard_count': len(shard_paths)}
+    with open(os.path.join(shard_directory, SHARD_MANIFEST_NAME), 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    return shard_paths
+
+
+def read_shard(shard_path):
+    """
+    Returns a tuple of a shard's header, its own ballots and all of its ballots including the halo,
+    each in the shard file's order.
+    """
+    own_ballots = list()
+    all_ballots = list()
+    with open(shard_path) as shard_file:
+        header = json.loads(next(shard_file))
+        if header.get('version') != SHARD_VERSION:
+            raise ValueError('Unsupported shard file version in {0}.'.format(shard_path))
+        for line in shard_file:
+            record = json.loads(line)
+            ballot = record_to_ballot(record)
+            ballot.id = record['id']
+            all_ballots.append(ballot)
+            if not record['halo']:
+                own_ballots.append(ballot)
+    return header, own_ballots, all_ballots
+
+
+def summarize_shard(shard_path):
+    """
+    Writes the earliest timestamp of each (selected actor, raw feedback) group among the shard's
+    own ballots next to the shard file, and returns the summary path.
+    """
+    header, own_ballots, all_ballots = read_shard(shard_path)
+    earliest_timestamps = risk.update_earliest_feedback_timestamps(own_ballots)
+    summary_path = ''.join((os.path.splitext(shard_path)[0], '.earliest.json',))
+    summary = {
+        'version': SHARD_VERSION,
+        'split': header['split'],
+        'shard': header['shard'],
+        'earliest': [[actor, feedback, timestamp.isoformat()]
+                     for (actor, feedback), timestamp in earliest_timestamps.items()],
+    }
+    temporary_path = ''.join((summary_path, '.tmp',))
+    with open(temporary_path, 'w') as summary_file:
+        json.dump(summary, summary_file)
+    os.replace(temporary_path, summary_path)
+    return summary_path
+
+
+def load_earliest_timestamps(summary_paths, header=None):
+    """
+    Returns the earliest timestamp per (selected actor, raw feedback) group over several shard
+    summaries. If a shard header is passed, only the summaries of its split are used.
+
+    Raises:
+        ValueError: If a header is passed and the summary of one of its split's shards is missing.
+    """
+    earliest_timestamps = dict()
+    summarized_shards = set()
+    for summary_path in summary_paths:
+        with open(summary_path) as summary_file:
+            summary = json.load(summary_file)
+        if summary.get('version') != SHARD_VERSION:
+            raise ValueError('Unsupported shard summary version in {0}.'.format(summary_path))
+        if header is not None and summary['split'] != header['split']:
+            continue
+        summarized_shards.add(summary['shard'])
+        for actor, feedback, value in summary['earliest']:
+            timestamp = parse_timestamp(value)
+            earliest = earliest_timestamps.get((actor, feedback))
+            if earliest is None or timestamp < earliest:
+                earliest_timestamps[(actor, feedback)] = timestamp
+    if header is not None:
+        missing = sorted(set(range(1, header['shard_count'] + 1)) - summarized_shards)
+        if missing:
+            raise ValueError('Missing summaries of shards {0}; run shard-summarize for every shard.'.format(
+                ', '.join(str(shard_number) for shard_number in missing)))
+    return earliest_timestamps
+
+
+def score_shard(shard_path, summary_paths):
+    """
+    Scores a shard's own ballots against its halo and the duplicate groups of every shard summary,
+    writes them as CSV rows in id order next to the shard file and returns the CSV path.
+    Summaries of other splits are ignored.
+
+    Raises:
+        ValueError: If the summary of one of the split's shards is not among ``summary_paths``.
+    """
+    header, own_ballots, all_ballots = read_shard(shard_path)
+    earliest_timestamps = load_earliest_timestamps(summary_paths, header)
+    risk.check_chain_stuffing(all_ballots, targets=own_ballots)
+    risk.check_verbosity(own_ballots)
+    risk.check_completion(own_ballots)
+    risk.check_comment_duplication_by_earliest(own_ballots, earliest_timestamps)
+    own_ballots.sort(key=lambda ballot: ballot.id)
+    csv_path = ''.join((os.path.splitext(shard_path)[0], '.csv',))
+    with open(csv_path, 'w', newline='') as csv_file:
+        csv.writer(csv_file).writerows(Store().get_rows(None, own_ballots))
+    return csv_path
+
+
+def _read_rows(csv_path):
+    with open(csv_path, newline='') as csv_file:
+        for row in csv.reader(csv_file):
+            yield int(row[0]), row
+
+
+def merge_shards(csv_paths, output_csv):
+    """
+    Merges scored shard CSV files, each in id order, into one CSV in id order.
+    """
+    with open(output_csv, 'w', newline='') as csv_file:
+        table_writer = csv.writer(csv_file)
+        for ballot_id, row in heapq.merge(*[_read_rows(csv_path) for csv_path in csv_paths]):
+            table_writer.writerow(row)
+
+
+def score_sharded(ballots, shard_count, shard_directory, output_csv, workers=None):
+    """
+    Runs every step locally: splits the ballots into shards, summarizes and scores the shards in a
+    pool of ``workers`` processes (one per shard by default) and merges them into ``output_csv``.
+    """
+    shard_paths = split_shards(ballots, shard_count, shard_directory)
+    with ProcessPoolExecutor(max_workers=workers or len(shard_paths) or 1) as executor:
+        summary_paths = list(executor.map(summarize_shard, shard_paths))
+        csv_paths = list(executor.map(score_shard, shard_paths, [summary_paths] * len(shard_paths)))
+    merge_shards(csv_paths, output_csv)
@@ -0,0 +1,200 @@
+"""
+Fixed-memory summaries of ballot streams.
+"""
+import hashlib
+import math
+import re
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w[\w']*")
+
+
+class SpaceSaving(object):
+    """
+    Space-Saving heavy-hitters sketch. Tracks at most ``capacity`` items; when a new item arrives
+    and the sketch is full, the item with the lowest count (the oldest among ties) is replaced and
+    the new item inherits that count. Every tracked count over-estimates the true count by at most
+    its recorded error, which never exceeds ``total / capacity``, and every item whose true count is
+    above ``total / capacity`` is tracked. Updates are O(1) and the result is deterministic for a
+    given stream order.
+
+    Attributes:
+        capacity (int): The maximum number of tracked items.
+        total (int): The number of items added.
+    """
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError('Space-Saving capacity must be at least 1.')
+        self.capacity = capacity
+        self.total = 0
+        self._counts = dict()
+        self._errors = dict()
+        # count -> items with that count, in insertion order
+        self._buckets = dict()
+        self._min_count = 0
+
+    def _move(self, item, old_count, new_count):
+        if old_count:
+            bucket = self._buckets[old_count]
+            del bucket[item]
+            if not bucket:
+                del self._buckets[old_count]
+                if self._min_count == old_count:
+                    self._min_count = new_count
+        self._buckets.setdefault(new_count, dict())[item] = None
+        self._counts[item] = new_count
+
+    def add(self, item):
+        """
+        Counts one occurrence of ``item``.
+        """
+        self.total += 1
+        count = self._counts.get(item)
+        if count is not None:
+            self._move(item, count, count + 1)
+        elif len(self._counts) < self.capacity:
+            self._errors[item] = 0
+            self._move(item, 0, 1)
+            self._min_count = 1
+        else:
+            min_count = self._min_count
+            bucket = self._buckets[min_count]
+            evicted = next(iter(bucket))
+            del bucket[evicted]
+            del self._counts[evicted]
+            del self._errors[evicted]
+            if not bucket:
+                del self._buckets[min_count]
+            self._errors[item] = min_count
+            self._buckets.setdefault(min_count + 1, dict())[item] = None
+            self._counts[item] = min_count + 1
+            if min_count not in self._buckets:
+                self._min_count = min_count + 1
+
+    def update(self, items):
+        """
+        Counts each item of an iterable.
+        """
+        for item in items:
+            self.add(item)
+
+    def get_frequencies(self):
+        """
+        Returns a dictionary of the tracked items and their (over-estimated) counts.
+        """
+        return dict(self._counts)
+
+    def get_error(self, item):
+        """
+        Returns the maximum over-estimation of a tracked item's count, or None if it is not tracked.
+        """
+        return self._errors.get(item)
+
+    def get_error_bound(self):
+        """
+        Returns the maximum over-estimation of any count: 0 until the sketch is full, then the
+        lowest tracked count, which is at most ``total / capacity``.
+        """
+        if len(self._counts) < self.capacity:
+            return 0
+        return self._min_count
+
+
+class ExpiringCountMin(object):
+    """
+    Count-min sketch over a sliding time span. Time is cut into buckets of ``bucket_seconds``; a
+    ring of ``bucket_count`` buckets each holds a ``depth`` x ``width`` table of counters, and a
+    bucket is cleared when its ring slot is reused for a newer bucket. Memory is fixed at
+    ``bucket_count * depth * width`` counters, whatever the number of items or keys.
+
+    :meth:`estimate` never under-counts. For the keys added to the buckets overlapping a query
+    range, it over-counts by at most ``e / width`` times their total, with probability at least
+    ``1 - exp(-depth)``, plus the key's items in the parts of the first and last bucket outside the
+    range.
+
+    Attributes:
+        bucket_seconds (float): The width of a time bucket.
+        bucket_count (int): The number of buckets kept. The span is ``bucket_seconds * bucket_count``.
+        width (int): Counters per table row.
+        depth (int): Table rows, each with its own hash.
+    """
+    def __init__(self, bucket_seconds, bucket_count, width, depth):
+        if bucket_seconds <= 0 or bucket_count < 1 or width < 1 or depth < 1:
+            raise ValueError('Sketch bucket size, bucket count, width and depth must be positive.')
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = bucket_count
+        self.width = width
+        self.depth = depth
+        self._tables = np.zeros((bucket_count, depth, width), dtype=np.int64)
+        self._epochs = np.full(bucket_count, -1, dtype=np.int64)
+        self._rows = np.arange(depth)
+
+    @property
+    def nbytes(self):
+        """
+        The memory used by the counters, in bytes.
+        """
+        return self._tables.nbytes + self._epochs.nbytes
+
+    def get_epoch(self, seconds):
+        """
+        Returns the index of the time bucket holding a time in epoch seconds.
+        """
+        return int(seconds // self.bucket_seconds)
+
+    def _get_columns(self, key):
+        digest = hashlib.blake2b(str(key).encode('utf-8'), digest_size=4 * self.depth).digest()
+        return np.frombuffer(digest, dtype=np.uint32) % self.width
+
+    def add(self, key, seconds, count=1):
+        """
+        Counts ``count`` items of ``key`` at a time in epoch seconds. Expires the bucket that
+        previously used the same ring slot.
+        """
+        epoch = self.get_epoch(seconds)
+        slot = epoch % self.bucket_count
+        if self._epochs[slot] != epoch:
+            self._tables[slot] = 0
+            self._epochs[slot] = epoch
+        self._tables[slot, self._rows, self._get_columns(key)] += count
+
+    def estimate(self, key, start_seconds, stop_seconds):
+        """
+        Returns the estimated number of items of ``key`` between two times in epoch seconds. Only
+        buckets still in the ring are counted.
+        """
+        in_range = (self._epochs >= self.get_epoch(start_seconds)) & (self._epochs <= self.get_epoch(stop_seconds))
+        if not in_range.any():
+            return 0
+        row_totals = self._tables[:, self._rows, self._get_columns(key)][in_range].sum(axis=0)
+        return int(row_totals.min())
+
+
+def get_count_min_size(error_rate, failure_probability):
+    """
+    Returns the ``(width, depth)`` of a count-min table that over-counts by at most ``error_rate``
+    times the total count with probability at least ``1 - failure_probability``.
+    """
+    return int(math.ceil(math.e / error_rate)), int(math.ceil(math.log(1 / failure_probability)))
+
+
+def iter_words(text, stop_words=None):
+    """
+    Yields the lowercase words of a text, skipping stop words and numbers.
+    """
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word.isdigit() or (stop_words and word in stop_words):
+            continue
+        yield word
+
+
+def count_feedback_words(ballots, capacity, stop_words=None):
+    """
+    Streams the feedback of the passed ballots through a :class:`SpaceSaving` sketch of
+    ``capacity`` words and returns it. Feedback is never concatenated, so memory stays bounded
+    by the capacity.
+    """
+    sketch = SpaceSaving(capacity)
+    for ballot in ballots:
+        sketch.update(iter_words(ballot.feedback, stop_words))
+    return sketch
@@ -0,0 +1,131 @@
+"""
+Count-based statistics for ballot subject ratings and selected actors.
+
+Ratings are encoded as small integer codes so that histograms for every selected actor can be
+built with a single NumPy ``bincount``. Code 0 is reserved for missing or out-of-range ratings
+(charted as "None"), and code ``i + 1`` stands for ``rating_values[i]``. Summary statistics are then
+derived exactly from the counts, so memory for rating statistics is proportional to
+actors x rating range rather than to the number of ballots.
+
+Attributes:
+    CHUNK_SIZE (int): The number of ballots encoded per ``bincount`` pass.
+"""
+import heapq
+import numpy as np
+
+CHUNK_SIZE = 65536
+
+
+def get_rating_values(rating_range):
+    """
+    Returns the sorted, de-duplicated list of positive rating values in ``rating_range``.
+    """
+    return sorted(set(value for value in rating_range if value))
+
+
+def get_rating_code_lookup(rating_values):
+    """
+    Returns a dictionary mapping each rating value to its integer code.
+    """
+    return {value: code for code, value in enumerate(rating_values, 1)}
+
+
+def rating_histograms(actor_codes, rating_codes, actor_total, code_total):
+    """
+    Returns a 2D array of rating counts with one row per actor code and one column per rating code.
+
+    Arguments:
+        actor_codes (ndarray): Integer actor code for each ballot.
+        rating_codes (ndarray): Integer rating code for each ballot.
+        actor_total (int): The number of distinct actor codes.
+        code_total (int): The number of rating codes, including the "None" code 0.
+    """
+    flat_codes = np.asarray(actor_codes, dtype=np.int64) * code_total + np.asarray(rating_codes, dtype=np.int64)
+    counts = np.bincount(flat_codes, minlength=actor_total * code_total)
+    return counts.reshape(actor_total, code_total)
+
+
+def _add_counts(counts, actor_codes, rating_codes, actor_total):
+    code_total = counts.shape[1]
+    chunk_counts = rating_histograms(actor_codes, rating_codes, actor_total, code_total)
+    if actor_total > counts.shape[0]:
+        grown = np.zeros((actor_total, code_total), dtype=np.int64)
+        grown[:counts.shape[0]] = counts
+        counts = grown
+    counts += chunk_counts
+    return counts
+
+
+def count_ratings_by_actor(ballots, rating_range):
+    """
+    Returns a tuple of the selected actors (in order of first appearance) and a 2D array of rating
+    counts with a row for each of those actors. Ballots are encoded in chunks of
+    :data:`CHUNK_SIZE`, so no per-ballot list of ratings is kept.
+    """
+    rating_values = get_rating_values(rating_range)
+    code_lookup = get_rating_code_lookup(rating_values)
+    actor_lookup = dict()
+    counts = np.zeros((0, len(rating_values) + 1), dtype=np.int64)
+    actor_buffer = np.empty(CHUNK_SIZE, dtype=np.int64)
+    rating_buffer = np.empty(CHUNK_SIZE, dtype=np.int64)
+    filled = 0
+    for ballot in ballots:
+        actor_code = actor_lookup.setdefault(ballot.selected_actor, len(actor_lookup))
+        actor_buffer[filled] = actor_code
+        rating_buffer[filled] = code_lookup.get(ballot.subject_rating, 0) if ballot.subject_rating else 0
+        filled += 1
+        if filled == CHUNK_SIZE:
+            counts = _add_counts(counts, actor_buffer, rating_buffer, len(actor_lookup))
+            filled = 0
+    if filled or not actor_lookup:
+        counts = _add_counts(counts, actor_buffer[:filled], rating_buffer[:filled], len(actor_lookup))
+    return list(actor_lookup), counts
+
+
+def count_ratings(ballots, rating_range):
+    """
+    Returns a 1D array of rating counts for all passed ballots.
+    """
+    actors, counts = count_ratings_by_actor(ballots, rating_range)
+    return counts.sum(axis=0)
+
+
+def summarize_rating_counts(counts, rating_values):
+    """
+    Returns a summary dictionary with the number of votes ('n'), the mean rounded to one decimal
+    ('average') and the low median ('median') computed exactly from a row of rating counts.
+    Missing ratings count as 0, as in :func:`statistics.median_low` over the raw values.
+    Returns an empty dictionary if there are no votes.
+    """
+    values = [0] + list(rating_values)
+    counts = [int(count) for count in counts]
+    total_submissions = sum(counts)
+    if not total_submissions:
+        return dict()
+    value_sum = sum(count * value for count, value in zip(counts, values))
+    median_position = (total_submissions - 1) // 2
+    median_index = int(np.searchsorted(np.cumsum(counts), median_position, side='right'))
+    return {
+        'n': total_submissions,
+        'average': round(value_sum / total_submissions, 1),
+        'median': values[median_index],
+    }
+
+
+def count_actors(ballots):
+    """
+    Returns a dictionary with the number of ballots that selected each actor.
+    """
+    actor_counts = dict()
+    for ballot in ballots:
+        actor_counts[ballot.selected_actor] = actor_counts.get(ballot.selected_actor, 0) + 1
+    return actor_counts
+
+
+def get_top_actors(actor_counts, top_n):
+    """
+    Returns the ``top_n`` most selected actors, most selected first, using a heap selection rather
+    than a full sort. Ties are broken by actor name.
+    """
+    return [actor for actor, count in heapq.nsmallest(top_n, actor_counts.items(),
+                                                       key=lambda item: (-item[1], str(item[0])))]
@@ -0,0 +1,168 @@
+"""
+Newline-delimited JSON streaming: ballot records are read one per line, in timestamp order, and
+scored records are written one per line as soon as they are final.
+
+Only a bounded lookback is kept. Chain stuffing holds the times of empty-feedback ballots within
+:data:`~ballotbleach.risk.BALLOT_TIME_CUTOFF` of the ballots awaiting a decision, and a ballot is
+written once the stream has moved that far past it, so chain scores are the same as in a full
+run. Comment duplication remembers each (selected actor, raw feedback) group for
+``lookback_seconds`` after it was last seen, so duplicates further apart than that are missed.
+Verbosity and completion need no state. Other assessments, such as burst detection, are not
+applied; the ``stream`` action refuses a configuration that turns them on.
+
+Attributes:
+    STREAM_BATCH_SIZE (int): The number of scored records written per flush. Default is 500.
+    STREAM_FLUSH_SECONDS (float): The longest time finished records wait for a flush while input
+        keeps arriving. Default is 1.
+    STREAM_LOOKBACK_SECONDS (int): How long a feedback group is remembered for duplicate
+        detection. Default is 86400 (one day).
+"""
+from collections import deque, OrderedDict
+import json
+from logging import getLogger
+import time
+from . import risk
+from .records import RECORD_TIMEZONE_NAME, ballot_to_record, record_to_ballot
+
+STREAM_BATCH_SIZE = 500
+STREAM_FLUSH_SECONDS = 1.0
+STREAM_LOOKBACK_SECONDS = 86400
+
+logger = getLogger(__name__)
+
+
+class StreamScorer(object):
+    """
+    Scores time-ordered ballots with the default risk assessments and bounded state.
+
+    Attributes:
+        lookback_seconds (float): How long a feedback group is remembered for duplicate detection.
+    """
+    def __init__(self, lookback_seconds=STREAM_LOOKBACK_SECONDS):
+        self.lookback_seconds = lookback_seconds
+        self._counter = 0
+        self._last_seconds = None
+        # (seconds, ballot) pairs awaiting the end of their chain window
+        self._pending = deque()
+        # (seconds, selected actor) of empty-feedback ballots still inside a pending window,
+        # and their number per selected actor
+        self._empty_ballots = deque()
+        self._empty_counts = dict()
+        # feedback key -> [earliest timestamp, last seen seconds], least recently seen first
+        self._feedback_groups = OrderedDict()
+
+    def _score_duplication(self, ballot, seconds):
+        while self._feedback_groups:
+            key, (earliest, last_seen) = next(iter(self._feedback_groups.items()))
+            if last_seen >= seconds - self.lookback_seconds:
+                break
+            del self._feedback_groups[key]
+        if not ballot.raw_feedback:
+            return
+        key = risk.get_feedback_key(ballot)
+        group = self._feedback_groups.pop(key, None)
+        if group is None:
+            group = [ballot.timestamp, seconds]
+        elif group[0] < ballot.timestamp:
+            ballot.update_score(risk.DUPLICATE_WEIGHT)
+            ballot.add_flag(risk.DUPLICATE)
+        group[1] = seconds
+        self._feedback_groups[key] = group
+
+    def _finish(self, seconds, ballot):
+        while self._empty_ballots and self._empty_ballots[0][0] < seconds - risk.BALLOT_TIME_CUTOFF:
+            expired_actor = self._empty_ballots.popleft()[1]
+            self._empty_counts[expired_actor] -= 1
+            if not self._empty_counts[expired_actor]:
+                del self._empty_counts[expired_actor]
+        if not ballot.selected_actor:
+            return ballot
+        # Every ballot read so far is at most BALLOT_TIME_CUTOFF after this one.
+        sibling_count = self._empty_counts.get(ballot.selected_actor, 0) - (1 if len(ballot.feedback) == 0 else 0)
+        if sibling_count >= 2:
+            ballot.update_score(risk.CHAIN_EMPTY_WEIGHT if len(ballot.raw_feedback) == 0
+                                else risk.CHAIN_FEEDBACK_WEIGHT)
+            ballot.add_flag(risk.CHAIN)
+        return ballot
+
+    def add(self, ballot):
+        """
+        Scores a ballot and returns the list of ballots that are now final, in input order. Ballots
+        without an id are numbered in arrival order.
+
+        Raises:
+            ValueError: If the ballot is older than the one before it.
+        """
+        seconds = ballot.timestamp.timestamp()
+        if self._last_seconds is not None and seconds < self._last_seconds:
+            raise ValueError('Streamed ballots must be in timestamp order; ballot at {0} is out of '
+                             'order.'.format(ballot.timestamp.isoformat()))
+        self._last_seconds = seconds
+        finished = list()
+        while self._pending and self._pending[0][0] + risk.BALLOT_TIME_CUTOFF < seconds:
+            finished.append(self._finish(*self._pending.popleft()))
+        if ballot.id is None:
+            self._counter += 1
+            ballot.id = self._counter
+        risk.check_verbosity([ballot])
+        risk.check_completion([ballot])
+        self._score_duplication(ballot, seconds)
+        if ballot.selected_actor and len(ballot.feedback) == 0:
+            self._empty_ballots.append((seconds, ballot.selected_actor))
+            self._empty_counts[ballot.selected_actor] = self._empty_counts.get(ballot.selected_actor, 0) + 1
+        self._pending.append((seconds, ballot))
+        return finished
+
+    def flush(self):
+        """
+        Returns the remaining ballots, scored, at the end of the stream.
+        """
+        finished = [self._finish(*pending) for pending in self._pending]
+        self._pending.clear()
+        return finished
+
+
+def write_records(ballots, output_stream):
+    """
+    Writes ballots as JSON lines in one write call and flushes the stream. Error records
+    (dictionaries) are written as they are.
+    """
+    if ballots:
+        output_stream.write(''.join(json.dumps(ballot if isinstance(ballot, dict) else ballot_to_record(ballot)) + '\n'
+                                    for ballot in ballots))
+    output_stream.flush()
+
+
+def stream_ballots(input_stream, output_stream, tz_name=RECORD_TIMEZONE_NAME, batch_size=STREAM_BATCH_SIZE,
+                   lookback_seconds=STREAM_LOOKBACK_SECONDS, flush_seconds=STREAM_FLUSH_SECONDS):
+    """
+    Reads ballot records (see :func:`~ballotbleach.records.record_to_ballot`) as JSON lines from
+    ``input_stream`` and writes scored records (see :func:`~ballotbleach.records.ballot_to_record`)
+    to ``output_stream``. Finished records are written in batches of ``batch_size``, or after
+    ``flush_seconds`` if input keeps arriving more slowly. Blank lines are skipped. A line that is
+    not a valid record, or is older than the line before it, is logged and answered with an
+    ``{"error": ..., "line": ...}`` record, and the stream goes on. Returns the number of scored
+    records written.
+    """
+    scorer = StreamScorer(lookback_seconds)
+    batch = list()
+    written = 0
+    error_total = 0
+    last_flush = time.monotonic()
+    for line_number, line in enumerate(input_stream, 1):
+        if not line.strip():
+            continue
+        try:
+            batch.extend(scorer.add(record_to_ballot(json.loads(line), tz_name)))
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            logger.warning('Skipped stream line {0}: {1}'.format(line_number, error))
+            batch.append({'error': str(error), 'line': line_number})
+            error_total += 1
+        if len(batch) >= batch_size or (batch and time.monotonic() - last_flush >= flush_seconds):
+            write_records(batch, output_stream)
+            written += len(batch)
+            batch = list()
+            last_flush = time.monotonic()
+    batch.extend(scorer.flush())
+    write_records(batch, output_stream)
+    return written + len(batch) - error_total
@@ -0,0 +1,169 @@
+"""
+What-if sweeps over the risk scoring parameters.
+
+The per-ballot facts behind every rule are computed once: each actor's sorted empty-feedback
+timestamps (the chain neighbor structure), the duplicate groups and the verbosity and completion
+hits. Every parameter set is then scored with a few vectorized operations, so a sweep costs one
+scoring pass plus O(n log n) per distinct chain window. Other configured assessments, such as burst
+detection or the previous-wave check, have no sweep parameters: they run once and their points
+are added to every parameter set.
+
+Attributes:
+    DEFAULT_PARAMETERS (OrderedDict): The chain window in seconds and the rule weights used by
+        :mod:`~ballotbleach.risk`.
+"""
+from collections import OrderedDict
+import csv
+import itertools
+import os
+import numpy as np
+from . import risk
+from .columns import get_epoch_microseconds
+
+DEFAULT_PARAMETERS = OrderedDict((
+    ('window_seconds', risk.BALLOT_TIME_CUTOFF),
+    ('chain_empty_weight', risk.CHAIN_EMPTY_WEIGHT),
+    ('chain_feedback_weight', risk.CHAIN_FEEDBACK_WEIGHT),
+    ('short_feedback_weight', risk.SHORT_FEEDBACK_WEIGHT),
+    ('incomplete_weight', risk.INCOMPLETE_WEIGHT),
+    ('duplicate_weight', risk.DUPLICATE_WEIGHT),
+))
+
+def get_parameter_grid(grid):
+    """
+    Returns the list of parameter sets (ordered dictionaries) in the cartesian product of the passed
+    grid, which maps parameter names to a value or a list of values. Parameters missing from the
+    grid use :data:`DEFAULT_PARAMETERS`.
+    """
+    unknown = set(grid) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError('Unknown sweep parameters: {0}'.format(', '.join(sorted(unknown))))
+    value_lists = list()
+    for name, default in DEFAULT_PARAMETERS.items():
+        values = grid.get(name, default)
+        value_lists.append(values if isinstance(values, (list, tuple)) else [values])
+    return [OrderedDict(zip(DEFAULT_PARAMETERS, values)) for values in itertools.product(*value_lists)]
+
+
+class RiskFeatures(object):
+    """
+    The parameter-independent facts about a list of ballots needed to score them with any
+    window and weights.
+
+    Attributes:
+        size (int): The number of ballots.
+        empty_raw_feedback (ndarray): True where normalized feedback is empty.
+        short_feedback (ndarray): True where :func:`~ballotbleach.risk.is_short_feedback` holds.
+        missing_rating (ndarray): True where the subject rating is missing.
+        duplicate (ndarray): True where an earlier ballot for the actor has the same feedback.
+        extra_score (ndarray): The points of the passed extra assessments, which are not swept.
+    """
+    def __init__(self, ballots, extra_assessments=None):
+        self.size = len(ballots)
+        self.extra_score = self.get_extra_score(ballots, extra_assessments or [])
+        self._times = np.array([get_epoch_microseconds(ballot.timestamp) for ballot in ballots], dtype=np.int64)
+        self.empty_raw_feedback = np.array([not ballot.raw_feedback for ballot in ballots], dtype=bool)
+        self.short_feedback = np.array([risk.is_short_feedback(ballot) for ballot in ballots], dtype=bool)
+        self.missing_rating = np.array([not ballot.subject_rating for ballot in ballots], dtype=bool)
+        earliest_timestamps = risk.update_earliest_feedback_timestamps(ballots)
+        duplicate = list()
+        for ballot in ballots:
+            earliest = earliest_timestamps.get(risk.get_feedback_key(ballot)) if ballot.raw_feedback else None
+            duplicate.append(earliest is not None and earliest < ballot.timestamp)
+        self.duplicate = np.array(duplicate, dtype=bool)
+        # Chain neighbor structure: ballot positions and sorted empty-feedback times per actor.
+        self._actor_groups = list()
+        positions_by_actor = OrderedDict()
+        for position, ballot in enumerate(ballots):
+            if ballot.selected_actor:
+                positions_by_actor.setdefault(ballot.selected_actor, []).append(position)
+        empty_feedback = np.array([len(ballot.feedback) == 0 for ballot in ballots], dtype=bool)
+        for positions in positions_by_actor.values():
+            positions = np.array(positions, dtype=np.int64)
+            is_empty = empty_feedback[positions]
+            empty_times = np.sort(self._times[positions[is_empty]])
+            self._actor_groups.append((positions, is_empty, empty_times))
+        self._chain_hits = dict()
+
+    @staticmethod
+    def get_extra_score(ballots, extra_assessments):
+        """
+        Returns an integer array with the points the extra assessments give each ballot. The
+        ballots' scores and flags are left as they were.
+        """
+        if not extra_assessments:
+            return np.zeros(len(ballots), dtype=np.int64)
+        saved = [(ballot.score, ballot.flags) for ballot in ballots]
+        for ballot in ballots:
+            ballot.score = 0
+        risk.run_assessments(ballots, extra_assessments)
+        extra_score = np.array([ballot.score for ballot in ballots], dtype=np.int64)
+        for ballot, (score, flags) in zip(ballots, saved):
+            ballot.score, ballot.flags = score, flags
+        return extra_score
+
+    def get_chain_hits(self, window_seconds):
+        """
+        Returns a boolean array that is True where a ballot has at least two other empty-feedback
+        ballots for the same actor within ``window_seconds``.
+        """
+        if window_seconds not in self._chain_hits:
+            window = int(window_seconds * 1000000)
+            hits = np.zeros(self.size, dtype=bool)
+            for positions, is_empty, empty_times in self._actor_groups:
+                if not len(empty_times):
+                    continue
+                times = self._times[positions]
+                sibling_counts = (np.searchsorted(empty_times, times + window, side='right') -
+                                  np.searchsorted(empty_times, times - window, side='left') -
+                                  is_empty.astype(np.int64))
+                hits[positions] = sibling_counts >= 2
+            self._chain_hits[window_seconds] = hits
+        return self._chain_hits[window_seconds]
+
+    def score(self, parameters):
+        """
+        Returns an integer array with each ballot's risk score under the passed parameters.
+        """
+        parameters = dict(DEFAULT_PARAMETERS, **parameters)
+        chain_weights = np.where(self.empty_raw_feedback, parameters['chain_empty_weight'],
+                                 parameters['chain_feedback_weight'])
+        scores = np.where(self.get_chain_hits(parameters['window_seconds']), chain_weights, 0)
+        scores = scores + self.short_feedback * parameters['short_feedback_weight']
+        scores = scores + self.missing_rating * parameters['incomplete_weight']
+        scores = scores + self.empty_raw_feedback * parameters['incomplete_weight']
+        scores = scores + self.duplicate * parameters['duplicate_weight']
+        return scores + self.extra_score
+
+
+def sweep_parameters(ballots, grid, cutoffs, extra_assessments=None):
+    """
+    Returns a list of table rows (ordered dictionaries), one per parameter set and cutoff, with the
+    parameter values and the number of rejected and cleared ballots. The points of any extra
+    assessments, run once, are added to every parameter set.
+    """
+    features = RiskFeatures(ballots, extra_assessments)
+    rows = list()
+    for parameters in get_parameter_grid(grid):
+        scores = features.score(parameters)
+        for cutoff in sorted(cutoffs):
+            rejected = int(np.count_nonzero(scores >= cutoff))
+            row = OrderedDict(parameters)
+            row['cutoff'] = cutoff
+            row['rejected'] = rejected
+            row['cleared'] = features.size - rejected
+            rows.append(row)
+    return rows
+
+
+def write_sweep_table(rows, output_directory, output_file_name='parameter-sweep.csv'):
+    """
+    Writes the sweep rows to a CSV table with a header row.
+    """
+    output_csv = os.path.join(output_directory, output_file_name)
+    with open(output_csv, 'w', newline='') as csv_file:
+        table_writer = csv.writer(csv_file)
+        if rows:
+            table_writer.writerow(list(rows[0]))
+        for row in rows:
+            table_writer.writerow(list(row.values()))
@@ -18,7 +18,10 @@ setup(
     url='https://github.com/jga/ballotbleach',
     keywords="elections ballot voting data quality",
     packages=['ballotbleach'],
-    install_requires=['click', 'pytz', 'xlrd', 'python-dateutil'],
+    install_requires=['click', 'pytz', 'xlrd', 'python-dateutil', 'numpy'],
+    extras_require={
+        'arrow': ['pyarrow'],
+    },
     entry_points={
         'console_scripts': [
             'ballotbleach=ballotbleach.core:run',
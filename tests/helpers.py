@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+import random
+import pytz
+from ballotbleach import classes
+
+
+def build_store():
+    """
+    Returns a store of 120 ballots from five actors within one hour, with naive timestamps and a
+    mix of empty, short and long feedback and missing ratings.
+    """
+    store = classes.Store()
+    start = datetime(2016, 3, 1, 12, 0, 0)
+    feedback = ['', 'Trees, water, sidewalks', 'Affordability', '', 'Housing and transportation for all']
+    actors = ['Polk', 'Obama', 'Johnson', 'Lincoln', 'Roosevelt']
+    for index in range(120):
+        timestamp = start + timedelta(seconds=97 * index % 3600)
+        rating = None if index % 11 == 0 else index % 5 + 1
+        store.add_ballot(classes.Ballot(timestamp, rating, actors[index % 4 + index % 2], feedback[index % 5]))
+    return store
+
+
+def build_timed_store(ballot_count=1200, seed=4, max_gap_seconds=25):
+    """
+    Returns a store of ballots in timestamp order, with timezone-aware timestamps a random whole
+    number of seconds, below ``max_gap_seconds``, apart.
+    """
+    generator = random.Random(seed)
+    timestamp = pytz.timezone('America/Chicago').localize(datetime(2016, 3, 1, 8, 0, 0))
+    feedback = ['', 'Good', 'Trees, water, sidewalks and parks', 'Housing and transportation for all']
+    store = classes.Store()
+    for index in range(ballot_count):
+        timestamp += timedelta(seconds=generator.randrange(max_gap_seconds))
+        store.add_ballot(classes.Ballot(timestamp, generator.choice([None, 1, 3, 5]),
+                                        generator.choice(['Polk', 'Obama', 'Johnson', 'Lincoln']),
+                                        generator.choice(feedback)))
+    return store
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from ballotbleach import classes
+
+try:
+    from ballotbleach import analysis
+except ImportError:
+    analysis = None
+
+
+def build_ballots(actors):
+    start = datetime(2016, 3, 1, 12, 0, 0)
+    return [classes.Ballot(start + timedelta(minutes=index), index % 5 + 1, actor, 'Trees and parks')
+            for index, actor in enumerate(actors)]
+
+
+@unittest.skipIf(analysis is None, 'chart dependencies are not installed')
+class RatingGridTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.actors = ['Polk', 'Obama', 'Johnson', 'Lincoln', 'Roosevelt']
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def draw(self, actors, chart_actors=None, refresh_actors=None):
+        analysis.create_rating_grid_by_selected_actor(build_ballots(actors), [1, 2, 3, 4, 5], self.directory,
+                                                      'Rating', 2, chart_actors=chart_actors,
+                                                      refresh_actors=refresh_actors)
+
+    def get_pages(self):
+        return sorted(file_name for file_name in os.listdir(self.directory) if file_name.endswith('.png'))
+
+    def age_pages(self):
+        for file_name in self.get_pages():
+            os.utime(os.path.join(self.directory, file_name), (0, 0))
+
+    def get_redrawn_pages(self):
+        return [file_name for file_name in self.get_pages()
+                if os.stat(os.path.join(self.directory, file_name)).st_mtime > 0]
+
+    def test_pages_and_layout(self):
+        self.draw(self.actors)
+        self.assertEqual(self.get_pages(), ['rating-by-actor-1.png', 'rating-by-actor-2.png', 'rating-by-actor-3.png'])
+        self.assertEqual(analysis.load_rating_grid_layout(self.directory),
+                         [['Polk', 'Obama'], ['Johnson', 'Lincoln'], ['Roosevelt']])
+
+    def test_chart_actors(self):
+        self.draw(self.actors, chart_actors={'Obama', 'Lincoln'})
+        self.assertEqual(self.get_pages(), ['rating-by-actor-1.png'])
+        self.assertEqual(analysis.load_rating_grid_layout(self.directory), [['Obama', 'Lincoln']])
+
+    def test_refresh_only_redraws_changed_pages(self):
+        self.draw(self.actors)
+        self.age_pages()
+        self.draw(self.actors, refresh_actors={'Lincoln'})
+        self.assertEqual(self.get_redrawn_pages(), ['rating-by-actor-2.png'])
+
+    def test_refresh_redraws_shifted_pages_and_removes_extra_pages(self):
+        self.draw(self.actors)
+        self.age_pages()
+        self.draw(['Polk', 'Adams', 'Obama', 'Johnson'], refresh_actors={'Adams'})
+        self.assertEqual(self.get_pages(), ['rating-by-actor-1.png', 'rating-by-actor-2.png'])
+        self.assertEqual(self.get_redrawn_pages(), ['rating-by-actor-1.png', 'rating-by-actor-2.png'])
+        with open(analysis.get_rating_grid_layout_path(self.directory)) as layout_file:
+            self.assertEqual(json.load(layout_file), [['Polk', 'Adams'], ['Obama', 'Johnson']])
+
+    def test_refresh_without_layout_redraws_every_page(self):
+        self.draw(self.actors)
+        os.remove(analysis.get_rating_grid_layout_path(self.directory))
+        self.age_pages()
+        self.draw(self.actors, refresh_actors={'Lincoln'})
+        self.assertEqual(len(self.get_redrawn_pages()), 3)
+
+
+@unittest.skipIf(analysis is None, 'chart dependencies are not installed')
+class ActorRankingTests(unittest.TestCase):
+
+    def test_top_actors_and_other(self):
+        ranking = analysis.get_actor_ranking({'Polk': 5, 'Obama': 3, 'Johnson': 2, 'Lincoln': 1}, 2)
+        self.assertEqual(list(ranking.items()), [('Polk', 5), ('Obama', 3), ('Other', 3)])
+
+    def test_actor_named_other(self):
+        ranking = analysis.get_actor_ranking({'Other': 5, 'Obama': 3, 'Johnson': 2, 'Lincoln': 1}, 2)
+        self.assertEqual(list(ranking.items()), [('Other', 5), ('Obama', 3), ('Other (2 actors)', 3)])
+        self.assertEqual(sum(ranking.values()), 11)
+
+    def test_all_actors_by_name(self):
+        ranking = analysis.get_actor_ranking({'Polk': 5, 'Obama': 3}, 2)
+        self.assertEqual(list(ranking.items()), [('Obama', 3), ('Polk', 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
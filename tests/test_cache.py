@@ -0,0 +1,41 @@
+from datetime import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from ballotbleach import cache
+from ballotbleach import classes
+
+
+class ChartCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.chart_cache = cache.ChartCache(os.path.join(self.directory, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_keys_follow_inputs(self):
+        key = cache.get_cache_key('bar-chart', ['None', '1'], [10, 90], {'n': 10}, 'Rating', '%d%%')
+        self.assertEqual(key, cache.get_cache_key('bar-chart', ['None', '1'], [10, 90], {'n': 10}, 'Rating', '%d%%'))
+        self.assertNotEqual(key, cache.get_cache_key('bar-chart', ['None', '1'], [10, 90], {'n': 11}, 'Rating',
+                                                     '%d%%'))
+        self.assertNotEqual(key, cache.get_cache_key('bar-chart', ['None', '1'], [10, 90], {'n': 10}, 'Ratings',
+                                                     '%d%%'))
+
+    def test_feedback_digest_matches_concatenation(self):
+        ballots = [classes.Ballot(datetime.now(), 5, 'Polk', 'Trees, '), classes.Ballot(datetime.now(), 5, 'Polk', 'water')]
+        other_ballots = [classes.Ballot(datetime.now(), 5, 'Polk', 'Trees, water')]
+        self.assertEqual(cache.get_feedback_digest(ballots), cache.get_feedback_digest(other_ballots))
+
+    def test_save_and_restore(self):
+        image_path = os.path.join(self.directory, 'rating.png')
+        restored_path = os.path.join(self.directory, 'restored.png')
+        self.assertFalse(self.chart_cache.restore('abc', restored_path))
+        with open(image_path, 'wb') as image_file:
+            image_file.write(b'png')
+        self.chart_cache.save('abc', image_path)
+        self.assertTrue(self.chart_cache.restore('abc', restored_path))
+        with open(restored_path, 'rb') as image_file:
+            self.assertEqual(image_file.read(), b'png')
@@ -0,0 +1,169 @@
+from datetime import datetime
+import threading
+import time
+import unittest
+from ballotbleach import classes
+from ballotbleach import risk
+
+
+class SweepCutoffsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = classes.Store()
+        for score in (0, 100, 50, 75, 25):
+            ballot = classes.Ballot(datetime.now(), 5, 'Polk', 'Trees, water, sidewalks')
+            ballot.score = score
+            self.store.add_ballot(ballot)
+
+    def test_sweep_matches_filter(self):
+        sweep = self.store.sweep_cutoffs([100, 50, 75])
+        self.assertEqual(list(sweep), [50, 75, 100])
+        for cutoff, cleared_ballots in sweep.items():
+            self.assertEqual([ballot.id for ballot in cleared_ballots],
+                             [ballot.id for ballot in self.store.filter_ballots(cutoff)])
+
+    def test_sweep_keeps_store_order(self):
+        sweep = self.store.sweep_cutoffs([80])
+        self.assertEqual([ballot.id for ballot in sweep[80]], [1, 3, 4, 5])
+
+
+class RuleFlagTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = classes.Store()
+        self.store.add_ballot(classes.Ballot(datetime.now(), 5, 'Polk', 'Trees, water, sidewalks'))
+        self.store.add_ballot(classes.Ballot(datetime.now(), None, 'Polk', ''))
+        self.store.add_ballot(classes.Ballot(datetime.now(), 4, 'Polk', ''))
+
+    def test_explanation_rendered_from_flags(self):
+        ballot = self.store.get_ballots()[1]
+        ballot.add_flag(risk.INCOMPLETE_FEEDBACK)
+        ballot.add_flag(risk.CHAIN)
+        ballot.add_flag(risk.CHAIN)
+        self.assertEqual(ballot.explanation, 'chain+incomplete-feedback')
+        self.assertEqual(ballot.flags, risk.CHAIN | risk.INCOMPLETE_FEEDBACK)
+
+    def test_rule_counts(self):
+        risk.check_completion(self.store.get_ballots())
+        rule_counts = self.store.get_rule_counts()
+        self.assertEqual(rule_counts['incomplete-rating'], 1)
+        self.assertEqual(rule_counts['incomplete-feedback'], 2)
+        self.assertEqual(rule_counts['chain'], 0)
+        self.assertEqual(self.store.get_flags(),
+                         [0, risk.INCOMPLETE_RATING | risk.INCOMPLETE_FEEDBACK, risk.INCOMPLETE_FEEDBACK])
+
+
+class ConcurrentIngestionTests(unittest.TestCase):
+
+    producers = 8
+    batches = 50
+    batch_size = 40
+
+    def produce(self, store, producer, use_buffer):
+        actor = 'Actor {0}'.format(producer % 3)
+        if use_buffer:
+            with store.get_buffer(buffer_size=self.batch_size) as buffer:
+                for index in range(self.batches * self.batch_size):
+                    buffer.add_ballot(classes.Ballot(datetime.now(), 5, actor, 'Trees'))
+        else:
+            for batch in range(self.batches):
+                store.add_ballots([classes.Ballot(datetime.now(), 5, actor, 'Trees')
+                                   for index in range(self.batch_size - 1)])
+                store.add_ballot(classes.Ballot(datetime.now(), 5, actor, 'Trees'))
+
+    def run_producers(self, store, use_buffer):
+        threads = [threading.Thread(target=self.produce, args=(store, producer, use_buffer))
+                   for producer in range(self.producers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def assert_dense(self, store):
+        total = self.producers * self.batches * self.batch_size
+        self.assertEqual([ballot.id for ballot in store.get_ballots()], list(range(1, total + 1)))
+        indexed = sum(len(store.get_actor_ballots('Actor {0}'.format(actor))) for actor in range(3))
+        self.assertEqual(indexed, total)
+
+    def test_ids_unique_and_dense(self):
+        store = classes.Store()
+        self.run_producers(store, use_buffer=False)
+        self.assert_dense(store)
+
+    def test_buffers_unique_and_dense(self):
+        store = classes.Store()
+        self.run_producers(store, use_buffer=True)
+        self.assert_dense(store)
+        for actor in range(3):
+            actor_ids = [ballot.id for ballot in store.get_actor_ballots('Actor {0}'.format(actor))]
+            self.assertEqual(actor_ids, sorted(actor_ids))
+
+    def test_concurrent_batches_get_contiguous_ids(self):
+        store = classes.Store()
+        batch_ids = list()
+
+        def produce(producer):
+            for batch in range(self.batches):
+                ballots = [classes.Ballot(datetime.now(), 5, 'Polk', 'Trees') for index in range(self.batch_size)]
+                store.add_ballots(ballots)
+                batch_ids.append([ballot.id for ballot in ballots])
+
+        threads = [threading.Thread(target=produce, args=(producer,)) for producer in range(self.producers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for ids in batch_ids:
+            self.assertEqual(ids, list(range(ids[0], ids[0] + self.batch_size)))
+        self.assertEqual(sorted(ballot_id for ids in batch_ids for ballot_id in ids),
+                         list(range(1, self.producers * self.batches * self.batch_size + 1)))
+
+    def measure_throughput(self, producer_count, serialize):
+        # Producers wait on their source (simulated with a sleep) before each batch, as ingestion
+        # workers reading files or sockets do. With ``serialize``, they funnel through one lock
+        # held while reading and adding, as they had to when the store was not thread-safe.
+        total_batches = 32
+        source_latency = 0.01
+        store = classes.Store()
+        funnel = threading.Lock()
+
+        def read_and_add():
+            time.sleep(source_latency)
+            store.add_ballots([classes.Ballot(datetime.now(), 5, 'Polk', 'Trees') for index in range(200)])
+
+        def produce(batches):
+            for batch in range(batches):
+                if serialize:
+                    with funnel:
+                        read_and_add()
+                else:
+                    read_and_add()
+
+        threads = [threading.Thread(target=produce, args=(total_batches // producer_count,))
+                   for producer in range(producer_count)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        self.assertEqual([ballot.id for ballot in store.get_ballots()], list(range(1, total_batches * 200 + 1)))
+        return len(store.get_ballots()) / elapsed
+
+    def test_throughput_scales_with_producers(self):
+        single = self.measure_throughput(1, serialize=False)
+        self.assertGreater(self.measure_throughput(4, serialize=False), single * 2)
+        self.assertLess(self.measure_throughput(4, serialize=True), single * 1.5)
+
+    def test_buffer_adds_when_full_or_flushed(self):
+        store = classes.Store()
+        with store.get_buffer(buffer_size=3) as buffer:
+            ballots = [classes.Ballot(datetime.now(), 5, 'Polk', 'Trees') for index in range(5)]
+            for ballot in ballots[:2]:
+                buffer.add_ballot(ballot)
+            self.assertEqual(store.get_ballots(), [])
+            self.assertIsNone(ballots[0].id)
+            for ballot in ballots[2:]:
+                buffer.add_ballot(ballot)
+            self.assertEqual([ballot.id for ballot in store.get_ballots()], [1, 2, 3])
+        self.assertEqual([ballot.id for ballot in store.get_ballots()], [1, 2, 3, 4, 5])
@@ -0,0 +1,66 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import unittest
+import pytz
+from ballotbleach import columns
+from ballotbleach import stats
+from tests.helpers import build_store
+
+
+def count_in_worker(handle, rating_range):
+    shared_columns = columns.BallotColumns.attach(handle)
+    actors, counts = shared_columns.count_ratings_by_actor(rating_range)
+    scores = shared_columns.score.tolist()
+    feedback = shared_columns.get_feedback(1)
+    counts = counts.tolist()
+    shared_columns.close()
+    return actors, counts, scores, feedback
+
+
+class SharedColumnsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = build_store()
+        self.store.get_ballots()[1].feedback = 'Árboles, agua'
+        self.store.score_risk()
+        self.shared_columns = self.store.publish_columns()
+
+    def tearDown(self):
+        self.shared_columns.unlink()
+
+    def test_columns(self):
+        ballots = self.store.get_ballots()
+        self.assertEqual(len(self.shared_columns), len(ballots))
+        self.assertEqual(self.shared_columns.flags.tolist(), self.store.get_flags())
+        self.assertEqual([self.shared_columns.get_feedback(index) for index in range(len(ballots))],
+                         [ballot.feedback for ballot in ballots])
+
+    def test_worker_counts(self):
+        rating_range = [1, 2, 3, 4, 5]
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            actors, counts, scores, feedback = executor.submit(
+                count_in_worker, self.shared_columns.get_handle(), rating_range).result()
+        expected_actors, expected_counts = stats.count_ratings_by_actor(self.store.get_ballots(), rating_range)
+        self.assertEqual(actors, expected_actors)
+        self.assertEqual(counts, expected_counts.tolist())
+        self.assertEqual(scores, [ballot.score for ballot in self.store.get_ballots()])
+        self.assertEqual(feedback, 'Árboles, agua')
+
+    def test_negative_rating_codes(self):
+        ballots = self.store.get_ballots()[:6]
+        for ballot, rating in zip(ballots, [-2, -1, 1, 3, 7, None]):
+            ballot.subject_rating = rating
+        shared_columns = columns.BallotColumns.publish(ballots)
+        try:
+            self.assertEqual(shared_columns.get_rating_codes([-2, -1, 1, 2, 3]).tolist(), [1, 2, 3, 5, 0, 0])
+            rating_range = [-2, -1, 1, 2, 3]
+            actors, counts = shared_columns.count_ratings_by_actor(rating_range)
+            expected_actors, expected_counts = stats.count_ratings_by_actor(ballots, rating_range)
+            self.assertEqual(actors, expected_actors)
+            self.assertEqual(counts.tolist(), expected_counts.tolist())
+        finally:
+            shared_columns.unlink()
+
+    def test_epoch_microseconds(self):
+        self.assertEqual(columns.get_epoch_microseconds(datetime(1970, 1, 1, 0, 0, 1, 5)), 1000005)
+        self.assertEqual(columns.get_epoch_microseconds(datetime(1970, 1, 1, 1, tzinfo=pytz.utc)), 3600000000)
@@ -0,0 +1,142 @@
+"""
+Scaling tests for the risk assessments. Each assessment runs at increasing synthetic sizes on
+instrumented ballots that count every read of a ballot field and every timestamp comparison, and
+the growth exponent of that count is fitted on a log-log scale. A test fails when the fitted
+exponent exceeds the recorded baseline by more than the tolerance, or exceeds the n log n exponent
+over the same sizes by more than the tolerance; quadratic behavior fits an exponent close to 2.
+
+The counts do not depend on the machine or its load, so the fits are the same on every run.
+"""
+from datetime import datetime, timedelta
+import math
+import unittest
+from ballotbleach import classes
+from ballotbleach import risk
+
+SIZES = [500, 1000, 2000, 4000]
+TOLERANCE = 0.15
+# Fitted exponents recorded for the current implementation.
+BASELINE_EXPONENTS = {
+    'check_chain_stuffing': 1.14,
+    'check_verbosity': 1.0,
+    'check_completion': 1.0,
+    'check_comment_duplication': 1.01,
+}
+
+operation_count = [0]
+
+
+class CountingTimestamp(datetime):
+    """
+    A datetime that counts its comparisons.
+    """
+    def __lt__(self, other):
+        operation_count[0] += 1
+        return datetime.__lt__(self, other)
+
+    def __le__(self, other):
+        operation_count[0] += 1
+        return datetime.__le__(self, other)
+
+    def __gt__(self, other):
+        operation_count[0] += 1
+        return datetime.__gt__(self, other)
+
+    def __ge__(self, other):
+        operation_count[0] += 1
+        return datetime.__ge__(self, other)
+
+
+def counted_field(name):
+    attribute = '_{0}'.format(name)
+
+    def get_field(ballot):
+        operation_count[0] += 1
+        return getattr(ballot, attribute)
+
+    def set_field(ballot, value):
+        setattr(ballot, attribute, value)
+    return property(get_field, set_field)
+
+
+class CountingBallot(classes.Ballot):
+    """
+    A ballot that counts reads of its timestamp, rating, selected actor and feedback.
+    """
+    timestamp = counted_field('timestamp')
+    subject_rating = counted_field('subject_rating')
+    selected_actor = counted_field('selected_actor')
+    feedback = counted_field('feedback')
+
+
+def build_ballots(size):
+    start = CountingTimestamp(2016, 3, 1, 12, 0, 0)
+    feedback = ['', 'Trees, water, sidewalks', 'Affordability', '', 'Housing and transportation for all']
+    ballots = list()
+    for index in range(size):
+        timestamp = start + timedelta(seconds=30 * index)
+        ballot = CountingBallot(timestamp, index % 5 + 1, 'Actor {0}'.format(index % 7),
+                                '{0} {1}'.format(feedback[index % 5], index % 97) if index % 3 else '')
+        ballot.id = index + 1
+        ballots.append(ballot)
+    return ballots
+
+
+def fit_exponent(sizes, costs):
+    """
+    Returns the least-squares slope of log(cost) against log(size).
+    """
+    log_sizes = [math.log(size) for size in sizes]
+    log_costs = [math.log(cost) for cost in costs]
+    mean_size = sum(log_sizes) / len(log_sizes)
+    mean_cost = sum(log_costs) / len(log_costs)
+    covariance = sum((x - mean_size) * (y - mean_cost) for x, y in zip(log_sizes, log_costs))
+    variance = sum((x - mean_size) ** 2 for x in log_sizes)
+    return covariance / variance
+
+
+def count_operations(assessment, size):
+    ballots = build_ballots(size)
+    operation_count[0] = 0
+    assessment(ballots)
+    return operation_count[0]
+
+
+class AssessmentScalingTests(unittest.TestCase):
+
+    def assert_scaling(self, assessment):
+        costs = [count_operations(assessment, size) for size in SIZES]
+        exponent = fit_exponent(SIZES, costs)
+        n_log_n_exponent = fit_exponent(SIZES, [size * math.log(size) for size in SIZES])
+        baseline = BASELINE_EXPONENTS[assessment.__name__]
+        self.assertLessEqual(exponent, baseline + TOLERANCE,
+                             '{0} fitted exponent {1:.2f}'.format(assessment.__name__, exponent))
+        self.assertLessEqual(exponent, n_log_n_exponent + TOLERANCE,
+                             '{0} fitted exponent {1:.2f}'.format(assessment.__name__, exponent))
+
+    def test_chain_stuffing_scaling(self):
+        self.assert_scaling(risk.check_chain_stuffing)
+
+    def test_verbosity_scaling(self):
+        self.assert_scaling(risk.check_verbosity)
+
+    def test_completion_scaling(self):
+        self.assert_scaling(risk.check_completion)
+
+    def test_comment_duplication_scaling(self):
+        self.assert_scaling(risk.check_comment_duplication)
+
+    def test_counts_detect_quadratic_assessment(self):
+        def check_pairs(ballots):
+            for ballot in ballots:
+                for other_ballot in ballots:
+                    if other_ballot is not ballot and other_ballot.timestamp <= ballot.timestamp:
+                        pass
+        sizes = [100, 200, 400]
+        self.assertGreater(fit_exponent(sizes, [count_operations(check_pairs, size) for size in sizes]), 1.9)
+
+
+class FitExponentTests(unittest.TestCase):
+
+    def test_fit_detects_quadratic_growth(self):
+        self.assertAlmostEqual(fit_exponent(SIZES, [size ** 2 for size in SIZES]), 2.0)
@@ -0,0 +1,53 @@
+from datetime import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import pytz
+from ballotbleach import classes
+from ballotbleach import export
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class ColumnarExportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = classes.Store()
+        timestamp = datetime(2016, 3, 1, 12, 0, 0, tzinfo=pytz.utc)
+        self.store.add_ballot(classes.Ballot(timestamp, 5, 'Polk', 'Trees, water, sidewalks!'))
+        self.store.add_ballot(classes.Ballot(timestamp, None, 'Obama', ''))
+        self.store.add_ballot(classes.Ballot(timestamp, 3, 'Polk', ''))
+        self.store.score_risk()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_table(self, table):
+        self.assertEqual(table.column('id').to_pylist(), [1, 2, 3])
+        self.assertEqual(table.column('timestamp').to_pylist(), [1456833600] * 3)
+        self.assertEqual(table.column('subject_rating').to_pylist(), [5, None, 3])
+        self.assertTrue(pyarrow.types.is_dictionary(table.schema.field('selected_actor').type))
+        self.assertEqual(table.column('selected_actor').to_pylist(), ['Polk', 'Obama', 'Polk'])
+        self.assertEqual(table.column('feedback').to_pylist(), ['trees water sidewalks', '', ''])
+        self.assertEqual(table.column('score').to_pylist(), [ballot.score for ballot in self.store.get_ballots()])
+        self.assertEqual(table.column('flags').to_pylist(), self.store.get_flags())
+        self.assertEqual(table.column('rule_incomplete_rating').to_pylist(), [False, True, False])
+
+    def test_parquet(self):
+        self.store.to_columnar(self.directory, 'parquet')
+        self.check_table(pyarrow.parquet.read_table(os.path.join(self.directory, 'ballots.parquet')))
+
+    def test_arrow_batches(self):
+        export.write_columnar(self.store.get_ballots(), os.path.join(self.directory, 'ballots.arrow'),
+                              'arrow', batch_size=2)
+        reader = pyarrow.ipc.open_file(os.path.join(self.directory, 'ballots.arrow'))
+        self.assertEqual(reader.num_record_batches, 2)
+        self.check_table(reader.read_all())
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+from functools import partial
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from ballotbleach import classes
+from ballotbleach import fingerprint
+from ballotbleach import risk
+
+
+def build_wave(comments, start):
+    ballots = list()
+    for index, (actor, feedback) in enumerate(comments):
+        ballots.append(classes.Ballot(start + timedelta(minutes=10 * index), 5, actor, feedback))
+    return ballots
+
+
+class FingerprintIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.directory, 'feedback.idx')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_missing_index_is_empty(self):
+        with fingerprint.FingerprintIndex(self.index_path) as index:
+            self.assertEqual(len(index), 0)
+            self.assertNotIn(fingerprint.get_fingerprint('Polk', 'Trees and parks for everyone'), index)
+        self.assertFalse(os.path.exists(self.index_path))
+
+    def test_update_persists_and_grows(self):
+        generator = random.Random(3)
+        fingerprints = [generator.getrandbits(64) or 1 for _ in range(3000)]
+        with fingerprint.FingerprintIndex(self.index_path, writable=True, initial_capacity=16) as index:
+            self.assertEqual(index.update(fingerprints[:1000], 7), 1000)
+            self.assertEqual(index.update(fingerprints, 9), 2000)
+            self.assertEqual(index.update(fingerprints[:10], 11), 0)
+            self.assertGreaterEqual(index.capacity * fingerprint.INDEX_MAX_LOAD, len(fingerprints))
+        with fingerprint.FingerprintIndex(self.index_path) as index:
+            self.assertEqual(len(index), 3000)
+            self.assertEqual(index.get_wave(fingerprints[0]), 7)
+            self.assertEqual(index.get_wave(fingerprints[-1]), 9)
+            self.assertIsNone(index.get_wave(generator.getrandbits(64) or 1))
+            with self.assertRaises(ValueError):
+                index.update(fingerprints)
+
+    def test_failed_growth_keeps_index(self):
+        fingerprints = list(range(1, 9))
+        with fingerprint.FingerprintIndex(self.index_path, writable=True, initial_capacity=16) as index:
+            index.update(fingerprints, 7)
+            with mock.patch('ballotbleach.fingerprint._insert', side_effect=OSError('disk full')):
+                with self.assertRaises(OSError):
+                    index.update(range(100, 120), 9)
+        with fingerprint.FingerprintIndex(self.index_path) as index:
+            self.assertEqual(len(index), 8)
+            self.assertEqual(index.capacity, 16)
+            self.assertTrue(all(index.get_wave(value) == 7 for value in fingerprints))
+
+    def test_rejects_other_files(self):
+        with open(self.index_path, 'wb') as index_file:
+            index_file.write(b'\x00' * 64)
+        with self.assertRaises(ValueError):
+            fingerprint.FingerprintIndex(self.index_path)
+
+
+class CheckPreviousWavesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.directory, 'feedback.idx')
+        self.first_wave = build_wave([('Polk', 'Lower taxes and more parks downtown'),
+                                      ('Obama', 'Better buses on every single route'),
+                                      ('Polk', 'Good')], datetime(2016, 3, 1, 8))
+        self.second_wave = build_wave([('Polk', 'Lower taxes and more parks downtown'),
+                                       ('Obama', 'Lower taxes and more parks downtown'),
+                                       ('Obama', 'Better buses on every single route'),
+                                       ('Polk', 'Good'),
+                                       ('Polk', 'Housing for everyone who works here')], datetime(2016, 9, 1, 8))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_flags_feedback_from_previous_waves(self):
+        fingerprint.check_previous_waves(self.first_wave, self.index_path, 'spring')
+        self.assertEqual(fingerprint.record_wave(self.first_wave, self.index_path, 'spring'), 2)
+        fingerprint.check_previous_waves(self.second_wave, self.index_path, 'fall')
+        self.assertEqual([ballot.score for ballot in self.second_wave],
+                         [risk.PREVIOUS_WAVE_WEIGHT, 0, risk.PREVIOUS_WAVE_WEIGHT, 0, 0])
+        self.assertEqual(self.second_wave[0].explanation, 'previous-wave')
+        self.assertFalse(any(ballot.flags for ballot in self.first_wave))
+
+    def test_recorded_wave_does_not_match_itself(self):
+        fingerprint.record_wave(self.first_wave, self.index_path, 'spring')
+        self.assertEqual(fingerprint.record_wave(self.first_wave, self.index_path, 'spring'), 0)
+        fingerprint.check_previous_waves(self.first_wave, self.index_path, 'spring')
+        self.assertFalse(any(ballot.flags for ballot in self.first_wave))
+
+    def test_normalized_feedback_matches(self):
+        fingerprint.record_wave(self.first_wave, self.index_path, 'spring')
+        fall_wave = build_wave([('Polk', '  LOWER taxes,  and more parks -- downtown! ')], datetime(2016, 9, 1, 8))
+        fingerprint.check_previous_waves(fall_wave, self.index_path, 'fall')
+        self.assertTrue(fall_wave[0].flags & risk.PREVIOUS_WAVE)
+
+    def test_existing_rule_flags_are_unchanged(self):
+        self.assertEqual(risk.RULE_NAMES.index('truncated') + 1, risk.RULE_NAMES.index('previous-wave'))
+        self.assertEqual(risk.get_rule_flag('truncated'), 1 << 6)
+
+    def test_store_assessment(self):
+        fingerprint.record_wave(self.first_wave, self.index_path, 'spring')
+        assessment = partial(fingerprint.check_previous_waves, index_path=self.index_path, wave_label='fall')
+        store = classes.Store(list(classes.DEFAULT_RISK_ASSESSMENTS) + [assessment])
+        for ballot in self.second_wave:
+            store.add_ballot(ballot)
+        store.score_risk()
+        flagged = [ballot.id for ballot in store.get_ballots() if ballot.flags & risk.PREVIOUS_WAVE]
+        self.assertEqual(flagged, [1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
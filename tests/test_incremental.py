@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+import os
+import shutil
+import tempfile
+import unittest
+import pytz
+from ballotbleach import classes
+from ballotbleach import incremental
+
+
+def build_ballots():
+    start = datetime(2016, 3, 1, 12, 0, 0, tzinfo=pytz.utc)
+    feedback = ['', 'Trees, water, sidewalks', 'Affordability', '', 'Housing and transportation for all']
+    actors = ['Polk', 'Obama', 'Johnson']
+    ballots = list()
+    for index in range(90):
+        timestamp = start + timedelta(seconds=40 * index)
+        ballots.append(classes.Ballot(timestamp, index % 5 + 1, actors[index % 3], feedback[index % 5]))
+    return ballots
+
+
+class IncrementalRunTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.directory, 'ballots.csv')
+        self.state_path = os.path.join(self.directory, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_csv(self, path):
+        with open(path) as csv_file:
+            return csv_file.read()
+
+    def test_increments_match_full_run(self):
+        ballots = build_ballots()
+        store = classes.Store()
+        for ballot in ballots[:50]:
+            store.add_ballot(ballot)
+        store.score_risk()
+        incremental.save_state(self.state_path, incremental.write_full(store, self.csv_path, 51))
+        for batch in (ballots[50:53], ballots[53:90]):
+            state = incremental.load_state(self.state_path)
+            store = incremental.restore_store(state)
+            for ballot in batch:
+                store.add_ballot(classes.Ballot(ballot.timestamp, ballot.subject_rating,
+                                                ballot.selected_actor, ballot.feedback))
+            self.assertTrue(incremental.can_apply(state, batch))
+            state, changed_actors = incremental.apply_increment(state, store, self.csv_path)
+            incremental.save_state(self.state_path, state)
+        self.assertEqual(state['last_row'], 91)
+        self.assertLess(len(state['context']), 90)
+        full_store = classes.Store()
+        for ballot in build_ballots():
+            full_store.add_ballot(ballot)
+        full_store.score_risk()
+        full_store.to_csv(self.directory, 'full.csv')
+        self.assertEqual(self.read_csv(self.csv_path), self.read_csv(os.path.join(self.directory, 'full.csv')))
+        read_ballots = incremental.read_csv_ballots(self.csv_path, incremental.get_feedback_path(self.csv_path))
+        self.assertEqual([(ballot.id, ballot.feedback, ballot.score) for ballot in read_ballots],
+                         [(ballot.id, ballot.feedback, ballot.score) for ballot in full_store.get_ballots()])
+
+    def test_old_ballots_need_full_run(self):
+        ballots = build_ballots()
+        store = classes.Store()
+        for ballot in ballots[40:]:
+            store.add_ballot(ballot)
+        store.score_risk()
+        state = incremental.write_full(store, self.csv_path, 51)
+        self.assertFalse(incremental.can_apply(state, ballots[:1]))
+
+    def test_read_csv_ballots(self):
+        store = classes.Store()
+        for ballot in build_ballots()[:10]:
+            store.add_ballot(ballot)
+        store.score_risk()
+        store.to_csv(self.directory)
+        read_ballots = incremental.read_csv_ballots(self.csv_path)
+        self.assertEqual([(ballot.id, ballot.score, ballot.explanation) for ballot in read_ballots],
+                         [(ballot.id, ballot.score, ballot.explanation) for ballot in store.get_ballots()])
@@ -0,0 +1,34 @@
+import unittest
+from ballotbleach import parallel
+from tests.helpers import build_store
+
+
+class ParallelScoringTests(unittest.TestCase):
+
+    def test_partitions_keep_actors_together(self):
+        store = build_store()
+        partitions = parallel.partition_by_actor(store.get_ballots(), 3)
+        self.assertEqual(len(partitions), 3)
+        self.assertEqual(sum(len(partition) for partition in partitions), 120)
+        seen_actors = set()
+        for partition in partitions:
+            partition_actors = set(ballot.selected_actor for ballot in partition)
+            self.assertFalse(partition_actors & seen_actors)
+            seen_actors |= partition_actors
+
+    def test_parallel_matches_serial(self):
+        serial_store = build_store()
+        serial_store.score_risk()
+        parallel_store = build_store()
+        parallel_store.score_risk(workers=2)
+        self.assertEqual([(ballot.score, ballot.explanation) for ballot in parallel_store.get_ballots()],
+                         [(ballot.score, ballot.explanation) for ballot in serial_store.get_ballots()])
+        self.assertTrue(any(ballot.score for ballot in serial_store.get_ballots()))
+
+    def test_parallel_early_exit_matches_serial(self):
+        serial_store = build_store()
+        serial_store.score_risk(cutoff_score=75)
+        parallel_store = build_store()
+        parallel_store.score_risk(workers=2, cutoff_score=75)
+        self.assertEqual([(ballot.score, ballot.explanation) for ballot in parallel_store.get_ballots()],
+                         [(ballot.score, ballot.explanation) for ballot in serial_store.get_ballots()])
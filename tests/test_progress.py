@@ -0,0 +1,64 @@
+import io
+import unittest
+from ballotbleach import classes
+from ballotbleach import progress
+from tests.helpers import build_store, build_timed_store
+
+
+class ProgressReporterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.events = list()
+        self.reporter = progress.ProgressReporter([self.events.append], interval_seconds=0)
+
+    def test_iterate_batches_updates(self):
+        items = list(progress.iterate(self.reporter, 'load', range(2500), 2500, batch_size=1000))
+        self.assertEqual(items, list(range(2500)))
+        self.assertEqual([(event['kind'], event['done']) for event in self.events],
+                         [('start', 0), ('progress', 1000), ('progress', 2000), ('progress', 2500),
+                          ('finish', 2500)])
+        self.assertEqual(self.events[-1]['eta'], 0)
+
+    def test_rate_limited(self):
+        reporter = progress.ProgressReporter([self.events.append], interval_seconds=60)
+        reporter.start('charts', 10)
+        for index in range(10):
+            reporter.advance('charts')
+        reporter.finish('charts')
+        self.assertEqual([event['kind'] for event in self.events], ['start', 'finish'])
+        self.assertEqual(self.events[-1]['done'], 10)
+
+    def test_scoring_stages(self):
+        store = build_store()
+        store.score_risk(progress=self.reporter)
+        finished = [(event['stage'], event['done']) for event in self.events if event['kind'] == 'finish']
+        self.assertEqual(finished, [('score:{0}'.format(assessment.__name__), 120)
+                                    for assessment in classes.DEFAULT_RISK_ASSESSMENTS])
+
+    def test_scoring_stages_advance_while_running(self):
+        store = build_timed_store(2500)
+        store.score_risk(progress=self.reporter)
+        for assessment in classes.DEFAULT_RISK_ASSESSMENTS:
+            stage = 'score:{0}'.format(assessment.__name__)
+            self.assertEqual([(event['kind'], event['done']) for event in self.events if event['stage'] == stage],
+                             [('start', 0), ('progress', 1000), ('progress', 2000), ('progress', 2500),
+                              ('finish', 2500)])
+
+    def test_custom_assessment_stage(self):
+        store = build_store()
+        store.risk_assessments = [lambda ballots: None]
+        store.score_risk(progress=self.reporter)
+        self.assertEqual([(event['kind'], event['done']) for event in self.events],
+                         [('start', 0), ('progress', 120), ('finish', 120)])
+
+    def test_parallel_scoring_stage(self):
+        store = build_store()
+        store.score_risk(workers=2, progress=self.reporter)
+        self.assertEqual(self.events[-1]['stage'], 'score')
+        self.assertEqual(self.events[-1]['done'], 120)
+
+    def test_print_event(self):
+        stream = io.StringIO()
+        progress.print_event({'stage': 'load', 'kind': 'progress', 'done': 250, 'total': 1000, 'elapsed': 2.0,
+                              'rate': 125.0, 'eta': 6.0}, stream)
+        self.assertEqual(stream.getvalue(), 'load: 250/1000 (25%) 125/s ETA 0:00:06\n')
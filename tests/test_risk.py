@@ -1,7 +1,10 @@
-from datetime import datetime
+import copy
+from datetime import datetime, timedelta
+from functools import partial
 import unittest
 from ballotbleach import classes
 from ballotbleach import risk
+from tests.helpers import build_timed_store
 
 
 class TestStore(classes.Store):
@@ -135,3 +138,105 @@ class CheckCommentDuplicationTests(unittest.TestCase):
         self.assertTrue(results['8'] == 0)
         self.assertTrue(results['9'] == 0)
         self.assertTrue(results['10'] == 0)
+
+
+class CheckSubmissionBurstsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.store = classes.Store()
+        start = datetime(2016, 3, 1, 8, 0, 0)
+        # two ballots every 5 minutes for two hours, then 12 ballots in one 5 minute bin
+        for index in range(48):
+            self.store.add_ballot(classes.Ballot(start + timedelta(seconds=150 * index), 4, 'Polk', 'Steady'))
+        for index in range(12):
+            self.store.add_ballot(classes.Ballot(start + timedelta(seconds=7200 + 20 * index), 5, 'Polk', 'Burst'))
+        self.store.add_ballot(classes.Ballot(start + timedelta(seconds=7200), 5, 'Obama', 'Other actor'))
+
+    def test_burst_scoring(self):
+        ballots = self.store.get_ballots()
+        risk.check_submission_bursts(ballots)
+        results = {}
+        for ballot in ballots:
+            results[ballot.id] = ballot.score
+        self.assertEqual(sum(1 for score in results.values() if score), 12)
+        for ballot_id in range(49, 61):
+            self.assertEqual(results[ballot_id], risk.BURST_WEIGHT)
+        self.assertEqual(ballots[48].explanation, 'burst')
+        self.assertEqual(results[61], 0)
+
+    def test_burst_sensitivity(self):
+        ballots = self.store.get_ballots()
+        risk.check_submission_bursts(ballots, sensitivity=10)
+        self.assertFalse(any(ballot.score for ballot in ballots))
+
+
+class StreamChainStuffingTests(unittest.TestCase):
+
+    def setUp(self):
+        self.ballots = build_timed_store(2000, 5, max_gap_seconds=90).get_ballots()
+
+    def get_chain_ids(self, ballots):
+        return set(ballot.id for ballot in ballots if ballot.flags & risk.CHAIN)
+
+    def test_never_misses_exact_chains(self):
+        exact_ballots = copy.deepcopy(self.ballots)
+        risk.check_chain_stuffing(exact_ballots)
+        for width, bucket_seconds in ((1024, 30), (16, 60)):
+            streamed_ballots = list(risk.stream_chain_stuffing(copy.deepcopy(self.ballots), bucket_seconds, width))
+            self.assertEqual([ballot.id for ballot in streamed_ballots], [ballot.id for ballot in self.ballots])
+            self.assertTrue(self.get_chain_ids(exact_ballots) <= self.get_chain_ids(streamed_ballots))
+
+    def test_matches_exact_with_one_second_buckets(self):
+        # Whole-second timestamps line the window edges up with the buckets.
+        exact_ballots = copy.deepcopy(self.ballots)
+        risk.check_chain_stuffing(exact_ballots)
+        streamed_ballots = copy.deepcopy(self.ballots)
+        risk.check_chain_stuffing_streaming(streamed_ballots, bucket_seconds=1, width=4096)
+        self.assertEqual([ballot.score for ballot in streamed_ballots], [ballot.score for ballot in exact_ballots])
+
+    def test_out_of_order(self):
+        with self.assertRaises(ValueError):
+            list(risk.stream_chain_stuffing(list(reversed(self.ballots))))
+
+
+class RunAssessmentsEarlyExitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.ballots = build_timed_store(1500, 11).get_ballots()
+        self.risk_assessments = list(classes.DEFAULT_RISK_ASSESSMENTS) + [
+            partial(risk.check_submission_bursts, min_count=5)]
+
+    def get_cleared(self, ballots, cutoff_score):
+        return [(ballot.id, ballot.score, ballot.explanation) for ballot in ballots if ballot.score < cutoff_score]
+
+    def test_cleared_ballots_unchanged(self):
+        full_ballots = copy.deepcopy(self.ballots)
+        risk.run_assessments(full_ballots, self.risk_assessments)
+        for cutoff_score in (25, 75, 100, 150):
+            early_ballots = copy.deepcopy(self.ballots)
+            risk.run_assessments(early_ballots, self.risk_assessments, cutoff_score)
+            self.assertEqual(self.get_cleared(early_ballots, cutoff_score),
+                             self.get_cleared(full_ballots, cutoff_score))
+            for early_ballot, full_ballot in zip(early_ballots, full_ballots):
+                if early_ballot.flags & risk.TRUNCATED:
+                    self.assertGreaterEqual(early_ballot.score, cutoff_score)
+                    self.assertLessEqual(early_ballot.score, full_ballot.score)
+
+    def test_truncated_explanation(self):
+        ballots = copy.deepcopy(self.ballots)
+        risk.run_assessments(ballots, self.risk_assessments, 75)
+        truncated = [ballot for ballot in ballots if ballot.flags & risk.TRUNCATED]
+        self.assertTrue(truncated)
+        self.assertTrue(all(ballot.explanation.endswith('truncated') for ballot in truncated))
+
+    def test_cheap_assessments_run_before_chain(self):
+        ordered = sorted(self.risk_assessments, key=risk.get_assessment_cost)
+        self.assertEqual([risk.get_assessment_name(assessment) for assessment in ordered],
+                         ['check_completion', 'check_verbosity', 'check_chain_stuffing',
+                          'check_submission_bursts', 'check_comment_duplication'])
+
+    def test_custom_assessments_run_on_every_ballot(self):
+        seen = list()
+        ballots = copy.deepcopy(self.ballots)
+        risk.run_assessments(ballots, [risk.check_completion, risk.check_verbosity, seen.extend], 75)
+        self.assertEqual(len(seen), len(ballots))
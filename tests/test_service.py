@@ -0,0 +1,50 @@
+import http.client
+import json
+import threading
+import unittest
+from ballotbleach import service
+
+
+class ScoringServiceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = service.create_server(service.ScoringService(), port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def request(self, method, path, content=None):
+        connection = http.client.HTTPConnection(*self.server.server_address)
+        body = json.dumps(content) if content is not None else None
+        connection.request(method, path, body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        result = json.loads(response.read().decode('utf-8'))
+        connection.close()
+        return response.status, result
+
+    def test_score_batches(self):
+        status, result = self.request('POST', '/ballots', {'ballots': [
+            {'timestamp': '2016-03-01T12:00:00', 'subject_rating': 4, 'selected_actor': 'Polk',
+             'feedback': 'Trees, water and sidewalks'},
+            {'timestamp': '2016-03-01T12:01:00', 'subject_rating': 4, 'selected_actor': 'Polk', 'feedback': ''},
+        ]})
+        self.assertEqual(status, 200)
+        self.assertEqual([(ballot['id'], ballot['score']) for ballot in result['ballots']], [(1, 0), (2, 75)])
+        status, result = self.request('POST', '/ballots', {'ballots': [
+            {'timestamp': 1456833780, 'subject_rating': 4, 'selected_actor': 'Polk', 'feedback': ''},
+            {'timestamp': '2016-03-01T12:04:00Z', 'subject_rating': 5, 'selected_actor': 'Polk'},
+        ]})
+        self.assertEqual(result['ballots'][0]['explanation'], 'chain+short-feedback+incomplete-feedback')
+        self.assertEqual([ballot['id'] for ballot in result['changed']], [1, 2])
+        status, result = self.request('GET', '/rules')
+        self.assertEqual(result['chain'], 4)
+        status, result = self.request('GET', '/health')
+        self.assertEqual(result['ballots'], 4)
+
+    def test_bad_request(self):
+        status, result = self.request('POST', '/ballots', {'ballots': [{'feedback': 'No timestamp'}]})
+        self.assertEqual(status, 400)
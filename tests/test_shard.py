@@ -0,0 +1,92 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import filecmp
+import os
+import shutil
+import tempfile
+import unittest
+from ballotbleach import classes
+from ballotbleach import risk
+from ballotbleach import shard
+from ballotbleach.records import parse_timestamp
+from tests.helpers import build_timed_store
+
+
+class ShardTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.shard_directory = os.path.join(self.directory, 'shards')
+        self.full_csv = os.path.join(self.directory, 'full.csv')
+        store = build_timed_store()
+        store.score_risk()
+        store.to_csv(self.directory, 'full.csv')
+        self.ballots = build_timed_store().get_ballots()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_sharded_matches_full(self):
+        sharded_csv = os.path.join(self.directory, 'sharded.csv')
+        shard.score_sharded(self.ballots, 4, self.shard_directory, sharded_csv, workers=2)
+        self.assertEqual(len(shard.find_shard_files(self.shard_directory, '.csv')), 4)
+        self.assertTrue(filecmp.cmp(self.full_csv, sharded_csv, shallow=False))
+
+    def test_steps_in_separate_processes(self):
+        shard_paths = shard.split_shards(self.ballots, 3, self.shard_directory)
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            list(executor.map(shard.summarize_shard, shard_paths))
+            summary_paths = shard.find_shard_files(self.shard_directory, '.earliest.json')
+            list(executor.map(shard.score_shard, shard_paths, [summary_paths] * len(shard_paths)))
+        merged_csv = os.path.join(self.directory, 'ballots.csv')
+        shard.merge_shards(shard.find_shard_files(self.shard_directory, '.csv'), merged_csv)
+        self.assertTrue(filecmp.cmp(self.full_csv, merged_csv, shallow=False))
+
+    def test_resplit_removes_old_shards(self):
+        shard.split_shards(self.ballots, 4, self.shard_directory)
+        shard_paths = shard.split_shards(self.ballots, 2, self.shard_directory)
+        self.assertEqual(shard.find_shard_files(self.shard_directory, '.ndjson'), shard_paths)
+        summary_paths = [shard.summarize_shard(shard_path) for shard_path in shard_paths]
+        for shard_path in shard_paths:
+            shard.score_shard(shard_path, summary_paths)
+        merged_csv = os.path.join(self.directory, 'ballots.csv')
+        shard.merge_shards(shard.get_split_files(self.shard_directory, '.csv'), merged_csv)
+        self.assertTrue(filecmp.cmp(self.full_csv, merged_csv, shallow=False))
+
+    def test_merge_needs_every_scored_shard(self):
+        shard_paths = shard.split_shards(self.ballots, 3, self.shard_directory)
+        summary_paths = [shard.summarize_shard(shard_path) for shard_path in shard_paths]
+        shard.score_shard(shard_paths[0], summary_paths)
+        with self.assertRaises(ValueError):
+            shard.get_split_files(self.shard_directory, '.csv')
+
+    def test_score_needs_every_summary(self):
+        shard_paths = shard.split_shards(self.ballots, 3, self.shard_directory)
+        summary_paths = [shard.summarize_shard(shard_path) for shard_path in shard_paths[:2]]
+        with self.assertRaises(ValueError):
+            shard.score_shard(shard_paths[0], summary_paths)
+
+    def test_score_ignores_summaries_of_other_splits(self):
+        old_directory = os.path.join(self.directory, 'old')
+        old_summary_paths = [shard.summarize_shard(shard_path)
+                             for shard_path in shard.split_shards(self.ballots, 3, old_directory)]
+        shard_paths = shard.split_shards(self.ballots, 3, self.shard_directory)
+        summary_paths = [shard.summarize_shard(shard_path) for shard_path in shard_paths[1:]]
+        with self.assertRaises(ValueError):
+            shard.score_shard(shard_paths[0], old_summary_paths[:1] + summary_paths)
+
+    def test_halo(self):
+        shard_paths = shard.split_shards(self.ballots, 3, self.shard_directory)
+        header, own_ballots, all_ballots = shard.read_shard(shard_paths[1])
+        self.assertEqual(header['shard'], 2)
+        start, stop = parse_timestamp(header['start']), parse_timestamp(header['stop'])
+        halo = timedelta(seconds=risk.BALLOT_TIME_CUTOFF)
+        self.assertTrue(all(start <= ballot.timestamp < stop for ballot in own_ballots))
+        halo_ballots = [ballot for ballot in all_ballots if ballot not in own_ballots]
+        self.assertTrue(halo_ballots)
+        self.assertTrue(all(start - halo <= ballot.timestamp < start or stop <= ballot.timestamp <= stop + halo
+                            for ballot in halo_ballots))
+
+    def test_naive_timestamps(self):
+        with self.assertRaises(ValueError):
+            shard.split_shards([classes.Ballot(datetime(2016, 3, 1), 5, 'Polk', 'Trees')], 2, self.shard_directory)
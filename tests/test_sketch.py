@@ -0,0 +1,62 @@
+from collections import Counter
+from datetime import datetime
+import random
+import unittest
+from ballotbleach import classes
+from ballotbleach import sketch
+
+
+class SpaceSavingTests(unittest.TestCase):
+
+    def setUp(self):
+        generator = random.Random(7)
+        self.stream = ['heavy'] * 300 + ['common'] * 150 + ['word{0}'.format(generator.randint(0, 400))
+                                                          for _ in range(600)]
+        generator.shuffle(self.stream)
+
+    def test_error_bounds(self):
+        space_saving = sketch.SpaceSaving(20)
+        space_saving.update(self.stream)
+        true_counts = Counter(self.stream)
+        frequencies = space_saving.get_frequencies()
+        self.assertEqual(len(frequencies), 20)
+        self.assertEqual(space_saving.total, len(self.stream))
+        self.assertLessEqual(space_saving.get_error_bound(), len(self.stream) / 20)
+        for word, count in frequencies.items():
+            self.assertGreaterEqual(count, true_counts[word])
+            self.assertLessEqual(count - space_saving.get_error(word), true_counts[word])
+        self.assertIn('heavy', frequencies)
+        self.assertIn('common', frequencies)
+
+    def test_exact_under_capacity(self):
+        space_saving = sketch.SpaceSaving(1000)
+        space_saving.update(self.stream)
+        self.assertEqual(space_saving.get_frequencies(), dict(Counter(self.stream)))
+        self.assertEqual(space_saving.get_error_bound(), 0)
+
+    def test_feedback_words(self):
+        ballots = [classes.Ballot(datetime.now(), 5, 'Polk', 'Trees, water and 3 sidewalks'),
+                   classes.Ballot(datetime.now(), 4, 'Polk', "Trees aren't cheap")]
+        word_sketch = sketch.count_feedback_words(ballots, 10, stop_words={'and'})
+        self.assertEqual(word_sketch.get_frequencies(),
+                         {'trees': 2, 'water': 1, 'sidewalks': 1, "aren't": 1, 'cheap': 1})
+
+
+class ExpiringCountMinTests(unittest.TestCase):
+
+    def test_counts_and_expiry(self):
+        count_min = sketch.ExpiringCountMin(10, 3, 64, 4)
+        size = count_min.nbytes
+        count_min.add('Polk', 5)
+        count_min.add('Polk', 15, count=2)
+        count_min.add('Obama', 15)
+        self.assertEqual(count_min.estimate('Polk', 0, 29), 3)
+        self.assertEqual(count_min.estimate('Polk', 10, 19), 2)
+        self.assertGreaterEqual(count_min.estimate('Obama', 0, 29), 1)
+        # the bucket of time 35 reuses the ring slot of time 5
+        count_min.add('Polk', 35)
+        self.assertEqual(count_min.estimate('Polk', 0, 39), 3)
+        self.assertEqual(count_min.nbytes, size)
+
+    def test_count_min_size(self):
+        self.assertEqual(sketch.get_count_min_size(0.01, 0.01), (272, 5))
@@ -0,0 +1,65 @@
+from datetime import datetime
+from statistics import mean, median_low
+import unittest
+from ballotbleach import classes
+from ballotbleach import stats
+
+
+class RatingCountTests(unittest.TestCase):
+
+    def setUp(self):
+        self.rating_range = [1, 2, 3, 4, 5]
+        self.ballots = [
+            classes.Ballot(datetime.now(), 5, 'Polk', 'Trees'),
+            classes.Ballot(datetime.now(), 4, 'Polk', 'Water'),
+            classes.Ballot(datetime.now(), None, 'Polk', 'Sidewalks'),
+            classes.Ballot(datetime.now(), 9, 'Obama', 'Out of range'),
+            classes.Ballot(datetime.now(), 2, 'Obama', 'Housing'),
+            classes.Ballot(datetime.now(), 2, 'Johnson', 'Growth'),
+        ]
+
+    def test_counts_by_actor(self):
+        actors, counts = stats.count_ratings_by_actor(self.ballots, self.rating_range)
+        self.assertEqual(actors, ['Polk', 'Obama', 'Johnson'])
+        self.assertEqual(counts.tolist(), [[1, 0, 0, 0, 1, 1],
+                                           [1, 0, 1, 0, 0, 0],
+                                           [0, 0, 1, 0, 0, 0]])
+
+    def test_counts_across_chunks(self):
+        original_chunk_size = stats.CHUNK_SIZE
+        stats.CHUNK_SIZE = 4
+        try:
+            actors, counts = stats.count_ratings_by_actor(self.ballots, self.rating_range)
+        finally:
+            stats.CHUNK_SIZE = original_chunk_size
+        self.assertEqual(counts.sum(), len(self.ballots))
+        self.assertEqual(counts[2].tolist(), [0, 0, 1, 0, 0, 0])
+
+    def test_summary_matches_statistics(self):
+        all_values = list()
+        for ballot in self.ballots:
+            rating = ballot.subject_rating
+            all_values.append(rating if rating in self.rating_range else 0)
+        counts = stats.count_ratings(self.ballots, self.rating_range)
+        summary = stats.summarize_rating_counts(counts, self.rating_range)
+        self.assertEqual(summary['n'], len(all_values))
+        self.assertEqual(summary['average'], round(mean(all_values), 1))
+        self.assertEqual(summary['median'], median_low(all_values))
+
+    def test_empty_summary(self):
+        counts = stats.count_ratings([], self.rating_range)
+        self.assertEqual(counts.tolist(), [0, 0, 0, 0, 0, 0])
+        self.assertEqual(stats.summarize_rating_counts(counts, self.rating_range), {})
+
+
+class TopActorTests(unittest.TestCase):
+
+    def test_top_actors(self):
+        actor_counts = {'Polk': 3, 'Obama': 7, 'Johnson': 3, 'Lincoln': 1}
+        self.assertEqual(stats.get_top_actors(actor_counts, 2), ['Obama', 'Johnson'])
+        self.assertEqual(stats.get_top_actors(actor_counts, 10), ['Obama', 'Johnson', 'Polk', 'Lincoln'])
+
+    def test_count_actors(self):
+        ballots = [classes.Ballot(datetime.now(), 5, 'Polk', ''), classes.Ballot(datetime.now(), 4, 'Polk', ''),
+                   classes.Ballot(datetime.now(), 4, 'Obama', '')]
+        self.assertEqual(stats.count_actors(ballots), {'Polk': 2, 'Obama': 1})
@@ -0,0 +1,75 @@
+import io
+import json
+import unittest
+from ballotbleach import classes
+from ballotbleach import records
+from ballotbleach import stream
+from tests.helpers import build_timed_store
+
+
+class CountingStream(io.StringIO):
+
+    def __init__(self):
+        super(CountingStream, self).__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+        super(CountingStream, self).flush()
+
+
+class StreamBallotsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.records = list()
+        for ballot in build_timed_store(600, 2).get_ballots():
+            record = records.ballot_to_record(ballot)
+            del record['id'], record['score'], record['explanation']
+            self.records.append(record)
+
+    def run_stream(self, stream_records, **options):
+        input_stream = io.StringIO(''.join(json.dumps(record) + '\n' for record in stream_records))
+        output_stream = CountingStream()
+        written = stream.stream_ballots(input_stream, output_stream, **options)
+        return written, output_stream, [json.loads(line) for line in output_stream.getvalue().splitlines()]
+
+    def test_matches_store_scoring(self):
+        store = classes.Store()
+        store.add_ballots([records.record_to_ballot(record) for record in self.records])
+        store.score_risk()
+        written, output_stream, scored_records = self.run_stream(self.records)
+        self.assertEqual(written, len(self.records))
+        self.assertEqual([(record['id'], record['score'], record['explanation']) for record in scored_records],
+                         [(ballot.id, ballot.score, ballot.explanation) for ballot in store.get_ballots()])
+
+    def test_batched_flushes(self):
+        written, output_stream, scored_records = self.run_stream(self.records, batch_size=100)
+        self.assertEqual(len(scored_records), len(self.records))
+        self.assertLessEqual(output_stream.flushes, len(self.records) // 100 + 1)
+
+    def test_lookback_limits_duplicates(self):
+        stream_records = [
+            {'timestamp': '2016-03-01T08:00:00', 'selected_actor': 'Polk', 'feedback': 'Trees and water'},
+            {'timestamp': '2016-03-01T09:00:00', 'selected_actor': 'Polk', 'feedback': 'Trees and water'},
+            {'timestamp': '2016-03-01T12:00:00', 'selected_actor': 'Polk', 'feedback': 'Trees and water'},
+        ]
+        written, output_stream, scored_records = self.run_stream(stream_records, lookback_seconds=5400)
+        self.assertEqual(['duplicate' in record['explanation'] for record in scored_records], [False, True, False])
+
+    def test_out_of_order(self):
+        scorer = stream.StreamScorer()
+        scorer.add(records.record_to_ballot(self.records[1]))
+        with self.assertRaises(ValueError):
+            scorer.add(records.record_to_ballot(self.records[0]))
+
+    def test_bad_lines_are_reported_and_skipped(self):
+        lines = [json.dumps(self.records[0]), '{"timestamp": ', json.dumps({'feedback': 'No time'}),
+                 json.dumps(['not', 'a', 'record']), json.dumps(self.records[2]), json.dumps(self.records[1])]
+        input_stream = io.StringIO('\n'.join(lines) + '\n')
+        output_stream = CountingStream()
+        with self.assertLogs('ballotbleach.stream', 'WARNING'):
+            written = stream.stream_ballots(input_stream, output_stream)
+        output_records = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+        self.assertEqual(written, 2)
+        self.assertEqual([record['line'] for record in output_records if 'error' in record], [2, 3, 4, 6])
+        self.assertEqual([record['id'] for record in output_records if 'error' not in record], [1, 2])
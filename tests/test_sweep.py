@@ -0,0 +1,54 @@
+from functools import partial
+import unittest
+from ballotbleach import risk
+from ballotbleach import sweep
+from tests.helpers import build_store
+
+
+class ParameterSweepTests(unittest.TestCase):
+
+    def test_default_parameters_match_scoring(self):
+        store = build_store()
+        features = sweep.RiskFeatures(store.get_ballots())
+        store.score_risk()
+        self.assertEqual(features.score({}).tolist(), [ballot.score for ballot in store.get_ballots()])
+
+    def test_window_matches_scoring(self):
+        store = build_store()
+        features = sweep.RiskFeatures(store.get_ballots())
+        original_cutoff = risk.BALLOT_TIME_CUTOFF
+        risk.BALLOT_TIME_CUTOFF = 150
+        try:
+            store.score_risk()
+        finally:
+            risk.BALLOT_TIME_CUTOFF = original_cutoff
+        self.assertEqual(features.score({'window_seconds': 150}).tolist(),
+                         [ballot.score for ballot in store.get_ballots()])
+
+    def test_sweep_rows(self):
+        store = build_store()
+        rows = sweep.sweep_parameters(store.get_ballots(), {'window_seconds': [60, 420],
+                                                            'duplicate_weight': [0, 75]}, [100, 75])
+        self.assertEqual(len(rows), 8)
+        self.assertEqual([row['cutoff'] for row in rows[:2]], [75, 100])
+        self.assertEqual(rows[0]['rejected'] + rows[0]['cleared'], 120)
+        store.score_risk()
+        default_row = [row for row in rows if row['window_seconds'] == 420 and row['duplicate_weight'] == 75
+                       and row['cutoff'] == 75][0]
+        self.assertEqual(default_row['cleared'], len(store.filter_ballots(75)))
+
+    def test_extra_assessments_match_scoring(self):
+        extra_assessments = [partial(risk.check_submission_bursts, bin_seconds=600, min_count=3, sensitivity=0)]
+        store = build_store()
+        features = sweep.RiskFeatures(store.get_ballots(), extra_assessments)
+        self.assertFalse(any(ballot.score or ballot.flags for ballot in store.get_ballots()))
+        self.assertTrue(features.extra_score.any())
+        store.risk_assessments = list(store.risk_assessments) + extra_assessments
+        store.score_risk()
+        self.assertEqual(features.score({}).tolist(), [ballot.score for ballot in store.get_ballots()])
+        rows = sweep.sweep_parameters(build_store().get_ballots(), {}, [75], extra_assessments)
+        self.assertEqual(rows[0]['cleared'], len(store.filter_ballots(75)))
+
+    def test_unknown_parameter(self):
+        with self.assertRaises(ValueError):
+            sweep.get_parameter_grid({'chain_weight': [1]})